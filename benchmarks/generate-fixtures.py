@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+
+import sys
+import click
+import csv
+import gzip
+import ipaddress
+import json
+import os
+import random
+
+
+IPV4_BLOCKS = [1, 2, 3, 4, 6, 8, 16]
+
+
+class Topology:
+
+    def __init__(self, rng, n_ases, regions, lacnic_share):
+        self.rng = rng
+        self.ases = []
+        self.country = {}
+        self.registry = {}
+        self.providers = {}
+        self.tier1 = []
+        cc_rir = [(cc, rir) for rir, ccs in regions.items() for cc in ccs]
+        lacnic = [(cc, 'lacnic') for cc in regions['lacnic']]
+        for i in range(n_ases):
+            if i < n_ases // 2:
+                asn = str(1000 + i)
+            else:
+                asn = str(262144 + i)
+            if rng.random() < lacnic_share:
+                cc, rir = rng.choice(lacnic)
+            else:
+                cc, rir = rng.choice(cc_rir)
+            self.ases.append(asn)
+            self.country[asn] = cc
+            self.registry[asn] = rir
+        n_tier1 = min(15, max(2, n_ases // 100))
+        n_transit = max(1, n_ases // 10)
+        self.tier1 = self.ases[:n_tier1]
+        self.transit = self.ases[n_tier1:n_tier1 + n_transit]
+        self.stubs = self.ases[n_tier1 + n_transit:]
+        for i, asn in enumerate(self.transit):
+            above = self.tier1 + self.transit[:max(1, i)]
+            self.providers[asn] = rng.sample(above, min(len(above), rng.randint(1, 2)))
+        for asn in self.stubs:
+            self.providers[asn] = rng.sample(self.transit, min(len(self.transit), rng.randint(1, 3)))
+
+    def chain(self, origin):
+        chain = [origin]
+        cur = origin
+        while cur in self.providers:
+            cur = self.rng.choice(self.providers[cur])
+            chain.append(cur)
+        return chain
+
+    def path(self, peer, origin):
+        chain = self.chain(origin)
+        if peer in chain:
+            chain = chain[:chain.index(peer)]
+        path = [peer] + chain[::-1]
+        r = self.rng.random()
+        if r < 0.05:
+            path += [origin] * self.rng.randint(1, 3)
+        elif r < 0.0505:
+            path[-1] = '{' + origin + '}'
+        return path
+
+
+def allocate(topo, n_prefixes, v6_share):
+    rng = topo.rng
+    origins = topo.transit + topo.stubs
+    next4 = int(ipaddress.IPv4Address('16.0.0.0'))
+    next6 = int(ipaddress.IPv6Address('2001:1000::'))
+    delegated = []
+    prefixes = []
+    i = 0
+    while len(prefixes) < n_prefixes:
+        asn = origins[i % len(origins)]
+        i += 1
+        cc = topo.country[asn]
+        rir = topo.registry[asn]
+        if rng.random() < v6_share:
+            delegated.append([rir, cc, 'ipv6', str(ipaddress.IPv6Address(next6)), '32'])
+            for k in range(rng.randint(1, 4)):
+                prefixes.append((str(ipaddress.IPv6Address(next6 + (k << 80))) + '/48', 'ipv6', asn))
+            next6 += 1 << 96
+        else:
+            blocks = rng.choice(IPV4_BLOCKS)
+            delegated.append([rir, cc, 'ipv4', str(ipaddress.IPv4Address(next4)), str(blocks * 256)])
+            for k in range(blocks):
+                prefixes.append((str(ipaddress.IPv4Address(next4 + k * 256)) + '/24', 'ipv4', asn))
+            next4 += blocks * 256
+    return delegated, prefixes[:n_prefixes]
+
+
+def write_delegated(path, date, topo, delegated):
+    with open(path, 'w') as f:
+        f.write("2|nro|{d}|{n}|19830101|{d}|+0000\n".format(d=date, n=len(delegated) + len(topo.ases)))
+        f.write("nro|*|asn|*|{n}|summary\n".format(n=len(topo.ases)))
+        for asn in topo.ases:
+            f.write("{r}|{cc}|asn|{a}|1|20000101|allocated|x\n".format(r=topo.registry[asn], cc=topo.country[asn], a=asn))
+        for row in delegated:
+            f.write("|".join(row) + "|20000101|allocated|x\n")
+
+
+def write_elems(path, topo, prefixes, peers, as_data):
+    rows = 0
+    with gzip.open(path, 'wt') as f:
+        for prefix, v, origin in prefixes:
+            for peer in peers:
+                hops = topo.path(peer, origin)
+                f.write(prefix + '|' + ' '.join(hops) + '\n')
+                rows += 1
+                if as_data is not None:
+                    prevs = set([origin])
+                    for asn in hops[-2::-1]:
+                        if asn not in prevs:
+                            data = as_data.setdefault(asn, (set(), set(), set()))
+                            data[0].update(prevs)
+                            data[1 if v == 'ipv4' else 2].add(prefix)
+                            prevs.add(asn)
+    return rows
+
+
+def write_pch(path, topo, prefixes, peers, v):
+    rows = 0
+    with gzip.open(path, 'wt') as f:
+        f.write("BGP table version is 0, local router ID is 0.0.0.0\n")
+        f.write("   Network          Next Hop            Metric LocPrf Weight Path\n")
+        for prefix, pv, origin in prefixes:
+            if pv != v:
+                continue
+            first = True
+            for peer in peers:
+                hops = topo.path(peer, origin)
+                if first:
+                    head = '*> ' + prefix
+                    first = False
+                else:
+                    head = '*  '
+                f.write(head.ljust(61) + ' '.join(hops) + ' i\n')
+                rows += 1
+        f.write("\nDisplayed  {n} routes and {n} total paths\n".format(n=rows))
+    return rows
+
+
+def write_as_data(path, topo, prefixes, as_data):
+    origins = {}
+    for prefix, v, origin in prefixes:
+        data = origins.setdefault(origin, ([], []))
+        data[0 if v == 'ipv4' else 1].append(prefix)
+    with open(path, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow([
+            "as", "cc", "downstream_ases",
+            "ipv4_prefixes", "ipv4_downstream_prefixes",
+            "ipv6_prefixes", "ipv6_downstream_prefixes"
+        ])
+        for asn in topo.ases:
+            ds = as_data.get(asn, (set(), set(), set()))
+            own = origins.get(asn, ([], []))
+            w.writerow([
+                asn,
+                topo.country[asn],
+                " ".join(ds[0]),
+                " ".join(own[0]),
+                " ".join(ds[1]),
+                " ".join(own[1]),
+                " ".join(ds[2])
+            ])
+
+
+@click.command()
+@click.option('--date', default='20240101', help='date used to name the fixtures')
+@click.option('--paths', default=1000000, help='number of collector paths (elems) to generate')
+@click.option('--peers', default=20, help='collector peers per prefix')
+@click.option('--pch-peers', default=8, help='ixp peers per prefix in the pch dumps')
+@click.option('--v6-share', default=0.15, help='share of ipv6 allocations')
+@click.option('--lacnic-share', default=0.3, help='share of ases registered in lacnic')
+@click.option('--seed', default=1, help='random seed')
+@click.option('--dst', default='benchmarks/fixtures', help='directory where the fixtures are stored')
+def main(date, paths, peers, pch_peers, v6_share, lacnic_share, seed, dst):
+    rng = random.Random(seed)
+    os.makedirs(dst, exist_ok=True)
+    with open(os.path.join(sys.path[0], '../regions.json')) as json_file:
+        regions = json.load(json_file)
+    n_prefixes = max(1, paths // peers)
+    topo = Topology(rng, max(100, n_prefixes // 4), regions, lacnic_share)
+    print("* Allocating {n} prefixes for {a} ASes".format(n=n_prefixes, a=len(topo.ases)))
+    delegated, prefixes = allocate(topo, n_prefixes, v6_share)
+    write_delegated("{dir}/delegated-{date}.csv".format(dir=dst, date=date), date, topo, delegated)
+    collector_peers = (topo.tier1 + topo.transit)[:peers]
+    print("* Writing collector elems")
+    as_data = {}
+    rows = write_elems("{dir}/elems-{date}.txt.gz".format(dir=dst, date=date), topo, prefixes, collector_peers, as_data)
+    print("* {n} elems written".format(n=rows))
+    print("* Writing PCH dumps")
+    ixp_peers = rng.sample(topo.transit + topo.stubs, min(pch_peers, len(topo.transit + topo.stubs)))
+    for v in ['4', '6']:
+        pchpath = "{dir}/IPv{v}_daily_snapshots/route-collector.bench.pch.net-ipv{v}_bgp_routes.{date}.gz".format(dir=dst, v=v, date=date)
+        os.makedirs(os.path.dirname(pchpath), exist_ok=True)
+        write_pch(pchpath, topo, prefixes, ixp_peers, 'ipv' + v)
+    print("* Writing as-data")
+    write_as_data("{dir}/as-data-{date}.csv".format(dir=dst, date=date), topo, prefixes, as_data)
+    with open("{dir}/ixp-summary-{date}.csv".format(dir=dst, date=date), 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(["country", "ixp_count"])
+        for cc in regions['lacnic']:
+            w.writerow([cc, rng.randint(0, 5)])
+    print("- DONE!")
+
+
+if __name__ == '__main__':
+    main()
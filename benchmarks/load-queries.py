@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+
+import sys
+import click
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import quote, urlparse
+
+import numpy as np
+
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.query import read_rows
+
+
+def query_paths(source, date, mix, count, seed):
+    # request paths drawn from the keys of the day's tables
+    keys = {
+        'asn': [row['as'] for row in read_rows("{dir}/as-data-{date}.csv".format(dir=source, date=date))],
+        'prefix': [row['prefix'] + '/' + row['length'] for row in read_rows("{dir}/prefix-data-{date}.csv".format(dir=source, date=date))],
+        'country': [row['country'] for row in read_rows("{dir}/country-data-{date}.csv".format(dir=source, date=date))]
+    }
+    rng = random.Random(seed)
+    kinds = [kind for kind in mix if keys[kind]]
+    paths = []
+    for i in range(count):
+        kind = rng.choice(kinds)
+        paths.append((kind, "/{date}/{kind}/{key}".format(date=date, kind=kind, key=quote(rng.choice(keys[kind])))))
+    return paths
+
+
+def client(url, paths, results):
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80)
+    for kind, path in paths:
+        started = time.perf_counter()
+        conn.request('GET', path)
+        response = conn.getresponse()
+        response.read()
+        results.append((kind, time.perf_counter() - started, int(response.getheader('X-Elapsed-Us', '0')) / 1e6, response.status))
+    conn.close()
+
+
+def percentiles(seconds):
+    ms = np.array(seconds) * 1000
+    return {p: round(float(np.percentile(ms, q)), 3) for p, q in [('p50', 50), ('p90', 90), ('p99', 99), ('max', 100)]}
+
+
+@click.command()
+@click.option('--url', default='http://127.0.0.1:8080', help='address of serve-queries.py')
+@click.option('--date', default='20240101', help='date queried')
+@click.option('--source', default='data', help='directory of the tables the queried keys are drawn from')
+@click.option('--mix', default='asn,prefix,country', help='comma separated query kinds, drawn with the same probability')
+@click.option('--requests', default=10000, help='requests sent')
+@click.option('--concurrency', default=4, help='clients, each with its own keep-alive connection')
+@click.option('--seed', default=0, help='seed of the drawn keys')
+@click.option('--output', default=None, help='JSON file where the results are written')
+def main(url, date, source, mix, requests, concurrency, seed, output):
+    url = urlparse(url)
+    paths = query_paths(source, date, mix.split(','), requests, seed)
+    # the first request loads the date, so it is not measured
+    client(url, paths[:1], [])
+    results = []
+    threads = [threading.Thread(target=client, args=(url, paths[i::concurrency], results)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    data = {
+        'requests': len(results), 'concurrency': concurrency, 'seconds': round(seconds, 3),
+        'requests_per_second': round(len(results) / seconds, 1),
+        'errors': sum(1 for r in results if r[3] != 200), 'kinds': {}
+    }
+    for kind in sorted(set(r[0] for r in results)):
+        selected = [r for r in results if r[0] == kind]
+        data['kinds'][kind] = {
+            'requests': len(selected),
+            'client_ms': percentiles([r[1] for r in selected]),
+            'server_ms': percentiles([r[2] for r in selected])
+        }
+    print("* {n} requests in {s:.1f}s ({r:.0f} requests/s, {e} errors)".format(
+        n=data['requests'], s=seconds, r=data['requests_per_second'], e=data['errors']))
+    for kind, st in data['kinds'].items():
+        print("  {k:<8} client p50 {c[p50]}ms p99 {c[p99]}ms, server p50 {s[p50]}ms p99 {s[p99]}ms".format(
+            k=kind, c=st['client_ms'], s=st['server_ms']))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(data, f, indent=2)
+    print("- DONE!")
+
+
+if __name__ == '__main__':
+    main()
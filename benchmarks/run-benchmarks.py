@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+
+import sys
+import click
+import csv
+import gzip
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.instrumentation import RunReport
+from bgplac.scripts import ROOT, load_script
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def read_elems(path):
+    elems = []
+    with gzip.open(path, 'rt') as f:
+        for line in f:
+            prefix, aspath = line.rstrip('\n').split('|')
+            elems.append((prefix, aspath))
+    return elems
+
+
+def bench_ribs(report, fixtures, work, date):
+    ribs = load_script('collector-scripts/process-ribs.py')
+    with report.stage('load_delegated') as st:
+        catalog = ribs.load_delegated("{dir}/delegated-{date}.csv".format(dir=fixtures, date=date))
+        st.items = len(catalog)
+    elems = read_elems("{dir}/elems-{date}.txt.gz".format(dir=fixtures, date=date))
+    countries = ribs.load_countries('lacnic')
+    result = ribs.RoutingDatabase(countries, catalog)
+    with report.stage('RoutingDatabase.add_path') as st:
+        for prefix, aspath in elems:
+            if '.' in prefix:
+                v = 'ipv4'
+            else:
+                v = 'ipv6'
+            st.lap('parse')
+            prefix_cc = catalog.get_pfx(v, prefix)
+            st.lap('lookup')
+            if prefix_cc in countries:
+                result.add_path(prefix, prefix_cc, aspath.split(), v)
+            st.lap('add_path')
+        st.items = len(elems)
+    with report.stage('create_datasets') as st:
+        ribs.create_datasets(date, work, result)
+        st.items = len(result.pfxs) + len(result.ases)
+    return catalog
+
+
+def bench_lookups(report, fixtures, date, catalog):
+    # distinct prefixes, so the scalar path cannot reuse its last lookup
+    prefixes = {'ipv4': set(), 'ipv6': set()}
+    for prefix, aspath in read_elems("{dir}/elems-{date}.txt.gz".format(dir=fixtures, date=date)):
+        prefixes['ipv4' if '.' in prefix else 'ipv6'].add(prefix)
+    prefixes = {v: sorted(pfxs) for v, pfxs in prefixes.items()}
+    with report.stage('get_pfx') as st:
+        for v, pfxs in prefixes.items():
+            for prefix in pfxs:
+                catalog.get_pfx(v, prefix)
+            st.items += len(pfxs)
+    with report.stage('get_pfxs') as st:
+        for v, pfxs in prefixes.items():
+            catalog.get_pfxs(v, pfxs)
+            st.items += len(pfxs)
+
+
+def bench_ixp(report, fixtures, work, date, catalog):
+    bgp = load_script('ixp-scripts/get-bgp-table.py')
+    table = load_script('ixp-scripts/process-bgp-table.py')
+    url = "file://" + os.path.abspath(fixtures) + "/IPv%s_daily_snapshots/route-collector.bench.pch.net-ipv%s_bgp_routes." + date + ".gz"
+    outfile = "{dir}/bgp-table-bench-{date}.csv".format(dir=work, date=date)
+    with open(outfile, 'w', newline='') as fcsv, report.stage('process_pch') as st:
+        writer = csv.writer(fcsv)
+        writer.writerow(["prefix", "prefix_cc", "as_path", "as_path_cc"])
+        st.items += bgp.process_pch(url, '4', catalog, writer)
+        st.items += bgp.process_pch(url, '6', catalog, writer)
+    with open(os.path.join(ROOT, 'regions.json')) as rirfile:
+        regions = json.load(rirfile)
+    cctorir = {}
+    for rir, countries in regions.items():
+        for cc in countries:
+            cctorir[cc] = rir
+    rows = []
+    with open(outfile, newline='') as csvfile:
+        for row in csv.DictReader(csvfile, delimiter=',', quoting=csv.QUOTE_NONE):
+            rows.append((row['prefix'], row['as_path'].split(), row['as_path_cc'].split()))
+    routing = table.RoutingTable('lacnic', cctorir)
+    with report.stage('RoutingTable.add_path') as st:
+        for pfx, asn_path, cc_path in rows:
+            routing.add_path(pfx, asn_path, cc_path)
+        st.items = len(rows)
+
+
+def bench_ases(report, fixtures, date, catalog):
+    ases = load_script('collector-scripts/process-as-data.py')
+    with report.stage('process_ases') as st:
+        result = ases.process_ases("{dir}/as-data-{date}.csv".format(dir=fixtures, date=date), catalog, ases.RegionCatalog(), 'lacnic')
+        st.items = len(result.upstream_ases)
+
+
+def bench_summaries(report, fixtures, work, date):
+    shutil.copy("{dir}/ixp-summary-{date}.csv".format(dir=fixtures, date=date), work)
+    for name, script in [
+        ('process-country-data', 'collector-scripts/process-country-data.py'),
+        ('process-prefix-data', 'collector-scripts/process-prefix-data.py'),
+        ('get-routing-stats', 'collector-scripts/get-routing-stats.py')
+    ]:
+        module = load_script(script)
+        params = {p.name: p.default for p in module.main.params}
+        params.update(date=date, source=work)
+        with report.stage(name):
+            module.main.callback(**params)
+
+
+def compare(current, baseline):
+    print("{n:<28} {b:>12} {c:>12} {r:>8}".format(n='stage', b=baseline['label'], c=current['label'], r='ratio'))
+    for name, st in current['stages'].items():
+        if name not in baseline['stages']:
+            continue
+        base = baseline['stages'][name]['seconds']
+        ratio = st['seconds'] / base if base > 0 else float('nan')
+        print("{n:<28} {b:>11.3f}s {c:>11.3f}s {r:>7.2f}x".format(n=name, b=base, c=st['seconds'], r=ratio))
+
+
+@click.command()
+@click.option('--date', default='20240101', help='date of the fixtures')
+@click.option('--fixtures', default='benchmarks/fixtures', help='directory where the fixtures are stored')
+@click.option('--results', default='benchmarks/results', help='directory where the results are stored')
+@click.option('--label', default=None, help='name of the result set. Default: current commit')
+@click.option('--compare-with', default=None, help='label of a stored result set to compare with')
+def main(date, fixtures, results, label, compare_with):
+    commit = git_commit()
+    if not label:
+        label = commit
+    report = RunReport('run-benchmarks', date)
+    work = tempfile.mkdtemp(prefix='bgplac-bench-')
+    cwd = os.getcwd()
+    fixtures = os.path.abspath(fixtures)
+    results = os.path.abspath(results)
+    try:
+        # process_pch downloads to the working directory
+        os.chdir(work)
+        catalog = bench_ribs(report, fixtures, work, date)
+        bench_lookups(report, fixtures, date, catalog)
+        bench_ixp(report, fixtures, work, date, catalog)
+        bench_ases(report, fixtures, date, catalog)
+        bench_summaries(report, fixtures, work, date)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work)
+    data = report.to_dict()
+    data['label'] = label
+    data['commit'] = commit
+    data['python'] = platform.python_version()
+    data['created'] = datetime.now().isoformat(timespec='seconds')
+    os.makedirs(results, exist_ok=True)
+    with open("{dir}/{label}.json".format(dir=results, label=label), 'w') as f:
+        json.dump(data, f, indent=2)
+    for name, st in data['stages'].items():
+        rate = '' if st['items_per_second'] is None else " ({0:.0f} items/s)".format(st['items_per_second'])
+        print("* {n}: {s:.3f}s{r}".format(n=name, s=st['seconds'], r=rate))
+    if compare_with:
+        with open("{dir}/{label}.json".format(dir=results, label=compare_with)) as f:
+            compare(data, json.load(f))
+    print("- DONE!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import gzip
+import random
+
+from bgplac.delegated import prefix_range
+
+
+# Anomalies are counted per kind with a bounded random sample of each; the
+# full list is only streamed to a compressed side file when one is given.
+KINDS = ['as_set_origin', 'non_numeric_hop', 'reserved_asn', 'loop', 'bogon_prefix']
+
+RESERVED_ASNS = [
+    (0, 0), (23456, 23456), (64496, 131071), (4200000000, 4294967295)
+]
+BOGONS = {
+    'ipv4': [
+        '0.0.0.0/8', '10.0.0.0/8', '100.64.0.0/10', '127.0.0.0/8', '169.254.0.0/16', '172.16.0.0/12',
+        '192.0.0.0/24', '192.0.2.0/24', '192.168.0.0/16', '198.18.0.0/15', '198.51.100.0/24',
+        '203.0.113.0/24', '224.0.0.0/4', '240.0.0.0/4'
+    ],
+    'ipv6': ['::/8', '100::/64', '2001:db8::/32', 'fc00::/7', 'fe80::/10', 'fec0::/10', 'ff00::/8']
+}
+BOGON_RANGES = {v: [prefix_range(v, p) for p in prefixes] for v, prefixes in BOGONS.items()}
+
+# per distinct path: bit i for KINDS[i], and 0x80 once it has been checked
+CHECKED = 0x80
+
+
+def reserved(asn):
+    for low, high in RESERVED_ASNS:
+        if low <= asn <= high:
+            return True
+    return False
+
+
+def is_bogon(v, prefix):
+    start, end = prefix_range(v, prefix)
+    for low, high in BOGON_RANGES[v]:
+        if low <= start and end <= high:
+            return True
+    return False
+
+
+def path_kinds(path):
+    kinds = []
+    if not path[-1].isdigit():
+        kinds.append('as_set_origin')
+    if not all(asn.isdigit() for asn in path[:-1]):
+        kinds.append('non_numeric_hop')
+    asns = [int(asn) for asn in path if asn.isdigit()]
+    if any(reserved(asn) for asn in asns):
+        kinds.append('reserved_asn')
+    hops = [asn for i, asn in enumerate(asns) if i == 0 or asn != asns[i - 1]]
+    if len(set(hops)) < len(hops):
+        kinds.append('loop')
+    return kinds
+
+
+class AnomalyLog:
+
+    def __init__(self, sample=20, path=None, seed=0):
+        self.sample = sample
+        self.counts = dict.fromkeys(KINDS, 0)
+        self.samples = {kind: [] for kind in KINDS}
+        self.random = random.Random(seed)
+        self.flags = bytearray()
+        self.out = gzip.open(path, 'wt') if path else None
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def add(self, kind, prefix, path):
+        self.counts[kind] += 1
+        line = prefix + '|' + ' '.join(path)
+        # reservoir sampling keeps every line with the same probability
+        samples = self.samples[kind]
+        if len(samples) < self.sample:
+            samples.append(line)
+        else:
+            i = self.random.randrange(self.counts[kind])
+            if i < self.sample:
+                samples[i] = line
+        if self.out is not None:
+            self.out.write(kind + '|' + line + '\n')
+
+    def check_path(self, prefix, path, pid):
+        # each distinct path is classified once
+        if pid >= len(self.flags):
+            self.flags.extend(bytes(pid + 1 - len(self.flags)))
+        flags = self.flags[pid]
+        if not flags & CHECKED:
+            flags = CHECKED
+            for kind in path_kinds(path):
+                flags |= 1 << KINDS.index(kind)
+            self.flags[pid] = flags
+        if flags != CHECKED:
+            for i, kind in enumerate(KINDS):
+                if flags & 1 << i:
+                    self.add(kind, prefix, path)
+
+    def check_prefix(self, v, prefix, path):
+        if is_bogon(v, prefix):
+            self.add('bogon_prefix', prefix, path)
+
+    def sample_rows(self):
+        for kind in KINDS:
+            for line in self.samples[kind]:
+                prefix, _, path = line.partition('|')
+                yield [kind, prefix, path]
+
+    def close(self):
+        if self.out is not None:
+            self.out.close()
+            self.out = None
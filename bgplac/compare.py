@@ -0,0 +1,48 @@
+import pandas as pd
+
+from bgplac.summaries import ASN_COLUMNS
+from bgplac.tables import input_path
+
+
+# Differences between the country-data and as-data of a reduced run (some
+# peers or prefixes left out) and those of a full run, per set column: how
+# many (entity, member) pairs of the full run are kept and how many are new.
+DATASETS = {
+    'country-data': ('country', ASN_COLUMNS),
+    'as-data': ('as', ['downstream_ases', 'ipv4_prefixes', 'ipv4_downstream_prefixes', 'ipv6_prefixes', 'ipv6_downstream_prefixes'])
+}
+COLUMNS = ['dataset', 'column', 'full', 'reduced', 'common', 'recall', 'precision', 'changed', 'min_recall']
+
+
+def read_pairs(path, key, columns):
+    # 'NA' is Namibia
+    df = pd.read_csv(input_path(path), dtype=str, keep_default_na=False, na_filter=False)
+    pairs = {}
+    for column in columns:
+        members = df[column].str.split().explode().dropna()
+        pairs[column] = pd.DataFrame({key: df[key].to_numpy()[members.index], 'member': members.to_numpy()})
+    return pairs
+
+
+def column_diff(full, reduced, key):
+    both = full.merge(reduced, how='outer', on=[key, 'member'], indicator=True)
+    per_key = pd.crosstab(both[key], both['_merge']).reindex(columns=['left_only', 'right_only', 'both'], fill_value=0)
+    common = int(per_key['both'].sum())
+    in_full = per_key['left_only'] + per_key['both']
+    recalls = (per_key['both'] / in_full)[in_full > 0]
+    return [
+        len(full), len(reduced), common,
+        round(common / len(full), 4) if len(full) else 1.0,
+        round(common / len(reduced), 4) if len(reduced) else 1.0,
+        int(((per_key['left_only'] > 0) | (per_key['right_only'] > 0)).sum()),
+        round(float(recalls.min()), 4) if len(recalls) else 1.0
+    ]
+
+
+def diff_rows(full_dir, reduced_dir, date):
+    for dataset, (key, columns) in DATASETS.items():
+        name = "/{n}-{date}.csv".format(n=dataset, date=date)
+        full = read_pairs(full_dir + name, key, columns)
+        reduced = read_pairs(reduced_dir + name, key, columns)
+        for column in columns:
+            yield [dataset, column] + column_diff(full[column], reduced[column], key)
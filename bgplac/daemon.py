@@ -0,0 +1,244 @@
+import json
+import os
+import re
+import shutil
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from bgplac import delegated
+from bgplac.fetch import ArtifactCache
+from bgplac.pipeline import file_hash
+from bgplac.scripts import LOADED, load_script, run_script
+from bgplac.sources import lacnic_url, pch_url
+
+
+# Files dropped in the watched directory, by name:
+#   delegated-<date>.csv                          the catalog of that date
+#   <collector>/<bview|rib>.<date>.<time>.<gz|bz2>  a collector RIB dump
+#   <ixp>/rib.<date>.<time>.bz2                   a lacnic ixp route server RIB
+#   route-collector.<ixp>.pch.net-ipv<v>_bgp_routes.<y>.<m>.<d>.gz  a PCH table
+# A file is taken once its size and mtime did not change between two scans.
+DELEGATED = re.compile(r'^delegated-(\d{8})\.csv$')
+RIB = re.compile(r'^(?:bview|rib)\.(\d{8})\.(\d{4})\.(?:gz|bz2)$')
+PCH = re.compile(r'^route-collector\.([\w-]+)\.pch\.net-ipv([46])_bgp_routes\.(\d{4})\.(\d{2})\.(\d{2})\.gz$')
+DONE = ['processed', 'failed']
+SCRIPTS = [
+    'collector-scripts/process-ribs.py', 'collector-scripts/process-country-data.py',
+    'collector-scripts/process-prefix-data.py', 'collector-scripts/process-as-data.py',
+    'ixp-scripts/get-bgp-table.py', 'ixp-scripts/process-bgp-table.py'
+]
+
+# state handed to the workers: the loaded catalogs and the run options
+SHARED = {}
+
+
+def preload():
+    # script imports are paid once per process, not once per job
+    for path in SCRIPTS:
+        if path not in LOADED:
+            LOADED[path] = load_script(path)
+
+
+def init_worker(shared):
+    preload()
+    SHARED.update(shared)
+    delegated.WARM.clear()
+    delegated.WARM.update(shared['catalogs'])
+
+
+def ribs_job(date, files):
+    source = SHARED['source']
+    run_script(
+        'collector-scripts/process-ribs.py', date=date, source=source, region=SHARED['region'],
+        collectors=','.join(SHARED['collectors']), ribs=','.join(files)
+    )
+    if SHARED['region'] == 'all':
+        return
+    run_script('collector-scripts/process-country-data.py', date=date, source=source, region=SHARED['region'])
+    run_script('collector-scripts/process-prefix-data.py', date=date, source=source)
+    run_script('collector-scripts/process-as-data.py', date=date, source=source, region=SHARED['region'])
+
+
+def ixp_job(date, ixp):
+    source = SHARED['source']
+    run_script(
+        'ixp-scripts/get-bgp-table.py', date=date, ixp=ixp, dst=source, delegated_src=source,
+        ixp_data=SHARED['ixp_data']
+    )
+    run_script('ixp-scripts/process-bgp-table.py', date=date, ixp=ixp, src=source)
+
+
+def run_job(job, *args):
+    # the job's seconds, or the traceback of its failure
+    started = time.time()
+    try:
+        job(*args)
+    except BaseException:
+        return None, traceback.format_exc()
+    return time.time() - started, None
+
+
+class Daemon:
+
+    def __init__(self, drop, source, region, collectors, ixp_data, workers=2, catalogs=2):
+        self.drop = drop
+        self.source = source
+        self.region = region
+        self.collectors = collectors
+        self.workers = workers
+        self.keep = catalogs
+        with open(ixp_data) as f:
+            self.ixpdata = json.load(f)
+        self.cache = ArtifactCache()
+        self.sizes = {}
+        self.taken = set()
+        self.ribs = {}
+        self.pch = {}
+        self.ixps = set()
+        self.futures = {}
+        self.catalogs = {}
+        self.shared = {
+            'source': source, 'region': region, 'collectors': collectors,
+            'ixp_data': os.path.abspath(ixp_data), 'catalogs': {}
+        }
+        self.pool = None
+        os.makedirs(source, exist_ok=True)
+        preload()
+
+    def catalog(self, date):
+        # loads the catalog of a date once it is in source, dropping the oldest
+        path = "{dir}/delegated-{date}.csv".format(dir=self.source, date=date)
+        if not os.path.exists(path):
+            return False
+        if date not in self.catalogs:
+            self.catalogs[date] = (delegated.catalog_key(path), delegated.load_delegated(path))
+            for old in sorted(self.catalogs)[:-self.keep]:
+                del self.catalogs[old]
+            print("* Catalog {date} loaded ({n} kept)".format(date=date, n=len(self.catalogs)))
+            self.swap()
+        return True
+
+    def swap(self):
+        # workers get the catalogs when they start, so a new catalog is
+        # swapped in with a new pool; jobs running on the old one finish
+        # with the catalog they started with
+        old = self.pool
+        self.shared['catalogs'] = dict(self.catalogs.values())
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(self.shared,))
+        if old is not None:
+            old.shutdown(wait=False)
+
+    def scan(self, settle=True):
+        # files whose size and mtime are the same as in the previous scan
+        ready = []
+        sizes = {}
+        present = set()
+        for directory, dirs, files in os.walk(self.drop):
+            if directory == self.drop:
+                dirs[:] = [d for d in dirs if d not in DONE]
+            for name in files:
+                path = os.path.join(directory, name)
+                present.add(path)
+                if path in self.taken:
+                    continue
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                sizes[path] = (st.st_size, st.st_mtime_ns)
+                if not settle or self.sizes.get(path) == sizes[path]:
+                    ready.append(path)
+        self.sizes = sizes
+        self.taken &= present
+        return sorted(ready)
+
+    def take(self, path):
+        name = os.path.basename(path)
+        parent = os.path.basename(os.path.dirname(path)) if os.path.dirname(path) != self.drop else None
+        self.taken.add(path)
+        match = DELEGATED.match(name)
+        if match:
+            date = match.group(1)
+            shutil.move(path, "{dir}/delegated-{date}.csv".format(dir=self.source, date=date))
+            print("* New delegated " + date)
+            # a snapshot published again replaces the loaded one
+            self.catalogs.pop(date, None)
+            self.catalog(date)
+            return True
+        match = PCH.match(name)
+        if match and match.group(1) in self.ixpdata:
+            ixp, v, date = match.group(1), match.group(2), ''.join(match.groups()[2:])
+            self.store(pch_url(ixp, date) % (v, v), path)
+            families = self.pch.setdefault((ixp, date), set())
+            families.add(v)
+            if families == set(['4', '6']):
+                self.ixps.add((ixp, date))
+            return True
+        match = RIB.match(name)
+        if match and parent in self.ixpdata and self.ixpdata[parent]['source'] == 'lacnic':
+            date = match.group(1)
+            self.store(lacnic_url(self.ixpdata[parent], date), path)
+            self.ixps.add((parent, date))
+            return True
+        if match and parent in self.collectors:
+            self.ribs.setdefault(match.group(1), {})[parent] = path
+            return True
+        print("! Ignoring " + path)
+        return False
+
+    def store(self, url, path):
+        # IXP tables go to the download cache under their url, where
+        # get-bgp-table.py finds them
+        tmp = os.path.join(self.cache.directory, 'tmp', os.path.basename(path))
+        shutil.move(path, tmp)
+        self.cache.put(url, tmp, file_hash(tmp), os.path.getsize(tmp))
+
+    def launch(self):
+        for date in sorted(self.ribs):
+            files = self.ribs[date]
+            if all(c in files for c in self.collectors) and self.catalog(date):
+                paths = [files[c] for c in self.collectors]
+                self.submit('ribs-' + date, paths, ribs_job, date, paths)
+                del self.ribs[date]
+        for ixp, date in sorted(self.ixps):
+            if self.catalog(date):
+                self.submit(ixp + '-' + date, [], ixp_job, date, ixp)
+                self.ixps.discard((ixp, date))
+
+    def submit(self, name, paths, job, *args):
+        print("* Scheduling " + name)
+        self.futures[self.pool.submit(run_job, job, *args)] = (name, paths)
+
+    def collect(self):
+        for future in [f for f in self.futures if f.done()]:
+            name, paths = self.futures.pop(future)
+            seconds, error = future.result()
+            outcome = 'processed' if error is None else 'failed'
+            for path in paths:
+                target = os.path.join(self.drop, outcome, os.path.relpath(path, self.drop))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            if error is None:
+                print("- {n} done in {s:.1f}s".format(n=name, s=seconds))
+            else:
+                print("! {n} failed\n{e}".format(n=name, e=error))
+
+    def pending(self):
+        waiting = ['ribs-' + date for date in self.ribs] + [ixp + '-' + date for ixp, date in self.ixps]
+        return sorted(waiting)
+
+    def run(self, interval=30, once=False):
+        # with once, files are taken as they are and the daemon stops when
+        # nothing is left to run
+        self.swap()
+        while True:
+            taken = [path for path in self.scan(settle=not once) if self.take(path)]
+            self.launch()
+            self.collect()
+            if once and not taken and not self.futures:
+                break
+            time.sleep(interval if not once else 0.2)
+        self.pool.shutdown()
+        for name in self.pending():
+            print("! {n} still waiting for its files or catalog".format(n=name))
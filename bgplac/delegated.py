@@ -0,0 +1,196 @@
+import os
+from bisect import bisect_right
+from socket import AF_INET6, inet_aton, inet_pton
+
+import numpy as np
+import pandas as pd
+
+
+REGISTRIES = ['afrinic', 'apnic', 'arin', 'lacnic', 'ripencc']
+
+# IPv6 ranges are kept at /64 granularity (the upper 64 bits of the address),
+# which is finer than any delegation in the RIR stats files.
+BITS = {'ipv4': 32, 'ipv6': 64}
+
+from_bytes = int.from_bytes
+
+# catalogs kept in memory by a long running process (see bgplac/daemon.py);
+# load_delegated returns them instead of parsing the same file again
+WARM = {}
+
+
+def ipv4_to_int(addresses):
+    packed = b''.join(map(inet_aton, addresses))
+    return np.frombuffer(packed, dtype='>u4').astype(np.uint64)
+
+
+def ipv6_to_int(addresses):
+    packed = b''.join([inet_pton(AF_INET6, a) for a in addresses])
+    return np.frombuffer(packed, dtype='>u8')[0::2].astype(np.uint64)
+
+
+def prefix_range(v, prefix):
+    address, _, length = prefix.partition('/')
+    if v == 'ipv4':
+        host = 32 - int(length) if length else 0
+        start = from_bytes(inet_aton(address), 'big') >> host << host
+    else:
+        host = 64 - min(int(length), 64) if length else 0
+        start = from_bytes(inet_pton(AF_INET6, address)[:8], 'big') >> host << host
+    return start, start | ((1 << host) - 1)
+
+
+def prefix_ranges(v, prefixes):
+    starts, ends, lengths = parse_prefixes(v, prefixes)
+    return starts, ends
+
+
+def parse_prefixes(v, prefixes):
+    # splitting one joined string keeps the per-prefix work inside C
+    parts = '/'.join(prefixes).split('/')
+    if len(parts) == 2 * len(prefixes):
+        addresses = parts[0::2]
+        lengths = np.array(parts[1::2], dtype=np.int64)
+    else:
+        pairs = [p.partition('/') for p in prefixes]
+        addresses = [a for a, _, _ in pairs]
+        lengths = np.array([length or 128 for _, _, length in pairs], dtype=np.int64)
+    mask = host_mask(v, lengths)
+    if v == 'ipv4':
+        starts = ipv4_to_int(addresses)
+    else:
+        starts = ipv6_to_int(addresses)
+    starts &= ~mask
+    return starts, starts | mask, np.minimum(lengths, BITS[v])
+
+
+def host_mask(v, lengths):
+    # all-ones mask for the host part of each prefix, avoiding shifts by 64
+    host = BITS[v] - np.minimum(lengths, BITS[v]).astype(np.int64)
+    full = host >= 64
+    mask = (np.uint64(1) << np.where(full, 0, host).astype(np.uint64)) - np.uint64(1)
+    return np.where(full, np.uint64(0xFFFFFFFFFFFFFFFF), mask)
+
+
+class RangeTable:
+
+    def __init__(self, starts, ends, ccs):
+        order = np.argsort(starts, kind='stable')
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.ccs = ccs[order]
+        self.starts_list = self.starts.tolist()
+        self.ends_list = self.ends.tolist()
+        self.ccs_list = self.ccs.tolist()
+
+    def __len__(self):
+        return len(self.starts_list)
+
+    def get(self, start, end, default=None):
+        i = bisect_right(self.starts_list, start) - 1
+        if i >= 0 and end <= self.ends_list[i]:
+            return self.ccs_list[i]
+        return default
+
+    def lookup(self, starts, ends, default=None):
+        # delegations do not overlap, so the last range starting at or before
+        # each address is the only candidate that can contain it
+        idx = np.searchsorted(self.starts, starts, side='right') - 1
+        found = idx >= 0
+        idx = np.where(found, idx, 0)
+        if len(self.starts):
+            found &= ends <= self.ends[idx]
+            return np.where(found, self.ccs[idx], default)
+        return np.full(len(starts), default, dtype=object)
+
+
+class DelegatedCatalog:
+
+    def __init__(self, ranges, ases, default=None):
+        self.ranges = ranges
+        self.ases = ases
+        self.default = default
+        self.last_address = None
+        self.last_cc = default
+
+    def __len__(self):
+        return len(self.ases) + len(self.ranges['ipv4']) + len(self.ranges['ipv6'])
+
+    def get_pfx(self, v, address):
+        # RIB dumps and PCH tables list every path of a prefix together
+        if address != self.last_address:
+            start, end = prefix_range(v, address)
+            self.last_cc = self.ranges[v].get(start, end, self.default)
+            self.last_address = address
+        return self.last_cc
+
+    def lookup_pfxs(self, v, starts, ends):
+        return self.ranges[v].lookup(starts, ends, self.default)
+
+    def get_pfxs(self, v, prefixes):
+        # v=None resolves a list mixing both families
+        if v is None:
+            result = np.full(len(prefixes), self.default, dtype=object)
+            is4 = np.array(['.' in p for p in prefixes], dtype=bool)
+            for v, sel in [('ipv4', is4), ('ipv6', ~is4)]:
+                idx = np.flatnonzero(sel)
+                if len(idx):
+                    result[idx] = self.get_pfxs(v, [prefixes[i] for i in idx])
+            return result
+        if len(prefixes) == 0:
+            return np.empty(0, dtype=object)
+        starts, ends = prefix_ranges(v, prefixes)
+        return self.ranges[v].lookup(starts, ends, self.default)
+
+    def get_asn(self, asn):
+        if asn in self.ases:
+            return self.ases[asn]
+        else:
+            return 'ZZ'
+
+
+def read_delegated(path):
+    # 'NA' is Namibia, so pandas must not turn it into a missing value
+    df = pd.read_csv(
+        path, sep='|', header=None, names=range(8), usecols=range(5), dtype=str,
+        comment='#', keep_default_na=False, na_filter=False, on_bad_lines='warn'
+    )
+    df.columns = ['registry', 'cc', 'type', 'start', 'value']
+    return df[df['registry'].isin(REGISTRIES)]
+
+
+def catalog_key(path):
+    st = os.stat(path)
+    return os.path.realpath(path), st.st_size, st.st_mtime_ns
+
+
+def load_delegated(path, default=None):
+    if WARM:
+        warm = WARM.get(catalog_key(path))
+        if warm is not None:
+            print("* Using the loaded delegated " + path)
+            return DelegatedCatalog(warm.ranges, warm.ases, default)
+    print("* Retrieving delegated from " + path)
+    df = read_delegated(path)
+    print("* Processing delegated")
+    ranges = {}
+
+    asn = df[(df['type'] == 'asn') & (df['cc'] != 'ZZ')]
+    starts = asn['start'].to_numpy(dtype=np.int64)
+    counts = asn['value'].to_numpy(dtype=np.int64)
+    ccs = asn['cc'].to_numpy(dtype=object)
+    numbers = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+    ases = dict(zip(numbers.astype(str).tolist(), np.repeat(ccs, counts).tolist()))
+    ranges['asn'] = RangeTable(starts.astype(np.uint64), (starts + counts - 1).astype(np.uint64), ccs)
+
+    ipv4 = df[df['type'] == 'ipv4']
+    starts = ipv4_to_int(ipv4['start'].tolist())
+    counts = ipv4['value'].to_numpy(dtype=np.uint64)
+    ranges['ipv4'] = RangeTable(starts, starts + counts - np.uint64(1), ipv4['cc'].to_numpy(dtype=object))
+
+    ipv6 = df[df['type'] == 'ipv6']
+    starts = ipv6_to_int(ipv6['start'].tolist())
+    ends = starts | host_mask('ipv6', ipv6['value'].to_numpy(dtype=np.int64))
+    ranges['ipv6'] = RangeTable(starts, ends, ipv6['cc'].to_numpy(dtype=object))
+
+    return DelegatedCatalog(ranges, ases, default)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from bgplac.delegated import BITS, parse_prefixes
+
+
+# An AS a prefix depends on is one present in every observed path to it (a
+# dominator from the collectors' point of view). Paths are reduced to sets of
+# integer AS ids and only the running intersection is kept per prefix.
+COLUMNS = [
+    'country', 'family', 'asn', 'asn_country', 'kind',
+    'prefixes', 'prefixes_share', 'addresses', 'addresses_share'
+]
+
+
+class DependencyBuilder:
+
+    def __init__(self):
+        self.asns = {}
+        self.prefixes = {}
+        self.countries = []
+        self.families = []
+        self.common = []
+
+    def asn(self, asn):
+        if asn not in self.asns:
+            self.asns[asn] = len(self.asns)
+        return self.asns[asn]
+
+    def add_path(self, prefix, prefix_cc, path, v):
+        origin = path[-1]
+        if not origin.isdigit():
+            origin = origin[1:-1]
+        hops = set([self.asn(asn) for asn in path[:-1] if asn.isdigit() and asn != origin])
+        i = self.prefixes.get(prefix)
+        if i is None:
+            self.prefixes[prefix] = len(self.common)
+            self.countries.append(prefix_cc)
+            self.families.append(v)
+            self.common.append(hops)
+        else:
+            self.common[i] &= hops
+
+    def addresses(self):
+        # IPv4 addresses, or IPv6 /64s
+        prefixes = np.array(list(self.prefixes), dtype=object)
+        families = np.array(self.families)
+        sizes = np.zeros(len(prefixes), dtype=np.int64)
+        for v in BITS:
+            sel = families == v
+            if sel.any():
+                _, _, lengths = parse_prefixes(v, prefixes[sel].tolist())
+                sizes[sel] = np.left_shift(1, BITS[v] - lengths)
+        return sizes
+
+    def table(self, countries, catalog):
+        # one row per (country, family, AS) with the prefixes and address
+        # space reachable only through that AS, and their share of the country
+        sizes = self.addresses()
+        prefix_ids = np.repeat(np.arange(len(self.common)), [len(c) for c in self.common])
+        asn_ids = np.fromiter((a for c in self.common for a in c), dtype=np.int64, count=len(prefix_ids))
+        names = np.array(list(self.asns), dtype=object)
+        prefix_cc = np.array(self.countries, dtype=object)
+        family = np.array(self.families, dtype=object)
+        per_prefix = pd.DataFrame({'country': prefix_cc, 'family': family, 'addresses': sizes})
+        per_prefix = per_prefix[per_prefix['country'].isin(countries)]
+        totals = per_prefix.groupby(['country', 'family']).agg(
+            total_prefixes=('addresses', 'size'), total_addresses=('addresses', 'sum')
+        )
+        long = pd.DataFrame({
+            'country': prefix_cc[prefix_ids],
+            'family': family[prefix_ids],
+            'asn': names[asn_ids],
+            'addresses': sizes[prefix_ids]
+        })
+        long = long[long['country'].isin(countries)]
+        df = long.groupby(['country', 'family', 'asn']).agg(
+            prefixes=('addresses', 'size'), addresses=('addresses', 'sum')
+        ).reset_index()
+        df = df.join(totals, on=['country', 'family'])
+        df['prefixes_share'] = df['prefixes'] / df['total_prefixes']
+        df['addresses_share'] = df['addresses'] / df['total_addresses']
+        df['asn_country'] = [catalog.get_asn(asn) for asn in df['asn']]
+        df['kind'] = np.where(df['asn_country'] == df['country'], 'transit', 'upstream')
+        df = df.sort_values(['country', 'family', 'addresses', 'prefixes'], ascending=[True, True, False, False], kind='stable')
+        return df[COLUMNS]
+
+
+def write_dependency(df, path):
+    df.to_csv(path, index=False, float_format='%.4f')
@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+# BGPLAC_MIRROR=http://127.0.0.1:8000 sends https://host/path to
+# http://127.0.0.1:8000/host/path, so a local stand-in server (for example
+# python -m http.server over a directory tree) can replace the remote sources.
+CACHE_DIR = os.environ.get('BGPLAC_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'bgplac'))
+CACHE_SIZE = int(os.environ.get('BGPLAC_CACHE_SIZE', str(20 * 2**30)))
+MIRROR = os.environ.get('BGPLAC_MIRROR', '')
+TIMEOUT = 300
+
+
+def resolve(url):
+    if not MIRROR:
+        return url
+    parts = urllib.parse.urlsplit(url)
+    return MIRROR.rstrip('/') + '/' + parts.netloc + parts.path
+
+
+class ArtifactCache:
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, 'index.json')
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'tmp'), exist_ok=True)
+        self.index = self.load_index()
+
+    def load_index(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                return json.load(f)
+        return {}
+
+    def merge_index(self):
+        # other processes may have cached or used artifacts since this one
+        # loaded the index; the latest access of each url is kept
+        index = self.load_index()
+        for url, entry in self.index.items():
+            if url not in index or index[url]['atime'] < entry['atime']:
+                index[url] = entry
+        self.index = index
+
+    def save_index(self):
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.directory, 'tmp'))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_path)
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[0:2], digest)
+
+    def get(self, url):
+        entry = self.index.get(url)
+        if entry is None:
+            return None
+        path = self.object_path(entry['sha256'])
+        if not os.path.exists(path):
+            del self.index[url]
+            return None
+        # the access time is saved at once, as eviction reads the saved index
+        entry['atime'] = time.time()
+        self.merge_index()
+        self.save_index()
+        return path
+
+    def put(self, url, tmp, digest, size):
+        path = self.object_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, path)
+        self.merge_index()
+        self.index[url] = {'sha256': digest, 'size': size, 'atime': time.time()}
+        self.evict(keep=digest)
+        self.save_index()
+        return path
+
+    def evict(self, keep=None):
+        # least recently used objects go first; urls sharing content share the object
+        objects = {}
+        for url, entry in self.index.items():
+            obj = objects.setdefault(entry['sha256'], {'size': entry['size'], 'atime': 0, 'urls': []})
+            obj['atime'] = max(obj['atime'], entry['atime'])
+            obj['urls'].append(url)
+        total = sum(obj['size'] for obj in objects.values())
+        for digest, obj in sorted(objects.items(), key=lambda item: item[1]['atime']):
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            if os.path.exists(self.object_path(digest)):
+                os.remove(self.object_path(digest))
+            for url in obj['urls']:
+                del self.index[url]
+            total -= obj['size']
+
+
+def download(url, tmpdir):
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=tmpdir)
+    try:
+        with os.fdopen(fd, 'wb') as out, urllib.request.urlopen(resolve(url), timeout=TIMEOUT) as response:
+            while True:
+                chunk = response.read(1 << 20)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return tmp, digest.hexdigest(), size
+
+
+def retryable(error):
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500 or error.code == 429
+    return isinstance(error, (urllib.error.URLError, OSError))
+
+
+async def fetch_one(url, cache, semaphore, retries, backoff):
+    path = cache.get(url)
+    if path is not None:
+        print("* Using cached {url}".format(url=url))
+        return path
+    async with semaphore:
+        for attempt in range(retries + 1):
+            try:
+                print("* Downloading {url}".format(url=url))
+                tmp, digest, size = await asyncio.to_thread(download, url, os.path.join(cache.directory, 'tmp'))
+                break
+            except Exception as error:
+                if attempt == retries or not retryable(error):
+                    raise
+                print("! Retrying {url} ({e})".format(url=url, e=error))
+                await asyncio.sleep(backoff * 2 ** attempt)
+    return cache.put(url, tmp, digest, size)
+
+
+async def fetch_all(urls, concurrency=4, retries=3, backoff=2.0, cache=None):
+    if cache is None:
+        cache = ArtifactCache()
+    semaphore = asyncio.Semaphore(concurrency)
+    urls = list(dict.fromkeys(urls))
+    paths = await asyncio.gather(
+        *[fetch_one(url, cache, semaphore, retries, backoff) for url in urls],
+        return_exceptions=True
+    )
+    return dict(zip(urls, paths))
+
+
+def prefetch(urls, concurrency=4, retries=3, backoff=2.0, cache=None):
+    return asyncio.run(fetch_all(urls, concurrency, retries, backoff, cache))
+
+
+def fetch(url, retries=3, backoff=2.0, cache=None):
+    if url.startswith('file://'):
+        return urllib.request.url2pathname(urllib.parse.urlsplit(url).path)
+    path = prefetch([url], 1, retries, backoff, cache)[url]
+    if isinstance(path, BaseException):
+        raise path
+    return path
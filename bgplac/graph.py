@@ -0,0 +1,320 @@
+import os
+import tempfile
+from array import array
+
+import numpy as np
+
+
+# Directed AS adjacency (upstream -> downstream, as in downstream_ases) built
+# from the RIB paths and stored in CSR form: the downstreams of node i are
+# indices[indptr[i]:indptr[i + 1]], with the number of distinct prefixes
+# routed over each edge and the families it was seen in. The first hop of
+# each path is a collector peer, where every observed route starts.
+# Relationships are not inferred, so the queries only use what the paths
+# show: the downstream cone of an AS is every AS seen after it on a path
+# through it (the collector peer aside), and the ASes every observed path
+# to an origin goes through are kept per origin, as running intersections.
+# Upstream dependencies count the distinct prefixes that enter a country
+# over an edge from a foreign AS.
+FAMILIES = {'ipv4': 1, 'ipv6': 2}
+ARRAYS = [
+    'asns', 'indptr', 'indices', 'prefixes', 'flags', 'origins', 'countries', 'peers',
+    'cone_indptr', 'cone_indices', 'through_indptr', 'through_indices',
+    'upstream_countries', 'upstream_nodes', 'upstream_prefixes'
+]
+
+
+class PairSet:
+    # distinct (a, b) integer pairs, buffered and compacted with numpy
+
+    def __init__(self, limit=1 << 22):
+        self.limit = limit
+        self.buffer = array('Q')
+        self.pairs = np.empty(0, dtype=np.uint64)
+
+    def add(self, a, b):
+        self.buffer.append(a << 32 | b)
+        if len(self.buffer) >= self.limit:
+            self.compact()
+
+    def compact(self):
+        if len(self.buffer):
+            self.pairs = np.union1d(self.pairs, np.frombuffer(self.buffer, dtype=np.uint64))
+            self.buffer = array('Q')
+        return self.pairs
+
+    def counts(self, n):
+        # distinct b per a
+        return np.bincount((self.compact() >> np.uint64(32)).astype(np.int64), minlength=n)
+
+
+class GraphBuilder:
+
+    def __init__(self):
+        self.nodes = {}
+        self.edges = {}
+        self.flags = array('B')
+        self.prefixes = {}
+        self.peers = set()
+        self.edge_prefixes = PairSet()
+        self.origin_prefixes = PairSet()
+        # the hops of each distinct path (by PathStore id) from the origin up,
+        # without the collector peer, for the cone pairs built at the end
+        self.walked = bytearray()
+        self.hops = array('I')
+        self.offsets = array('Q', [0])
+        self.through = {}
+
+    def node(self, asn):
+        if asn not in self.nodes:
+            self.nodes[asn] = len(self.nodes)
+        return self.nodes[asn]
+
+    def add_path(self, prefix, path, v, path_id):
+        if prefix not in self.prefixes:
+            self.prefixes[prefix] = len(self.prefixes)
+        pid = self.prefixes[prefix]
+        if path[0].isdigit():
+            self.peers.add(self.node(path[0]))
+        flag = FAMILIES[v]
+        # walk from the origin up, skipping prepends; AS sets break the chain
+        hops = []
+        found = False
+        prev = None
+        origin = True
+        for asn in reversed(path):
+            if not asn.isdigit():
+                if origin and asn[1:-1].isdigit():
+                    asn = asn[1:-1]
+                else:
+                    prev = None
+                    origin = False
+                    continue
+            if asn == prev:
+                continue
+            if origin:
+                self.origin_prefixes.add(self.node(asn), pid)
+                found = True
+                origin = False
+            elif prev is not None:
+                key = (self.node(asn), self.nodes[prev])
+                eid = self.edges.get(key)
+                if eid is None:
+                    eid = self.edges[key] = len(self.edges)
+                    self.flags.append(0)
+                self.flags[eid] |= flag
+                self.edge_prefixes.add(eid, pid)
+            hops.append(self.node(asn))
+            prev = asn
+        # a repeated path adds no cone pairs and leaves the intersection of
+        # its origin as it is
+        if not found or (path_id < len(self.walked) and self.walked[path_id]):
+            return
+        if path_id >= len(self.walked):
+            self.walked.extend(bytes(path_id + 1 - len(self.walked)))
+        self.walked[path_id] = 1
+        self.hops.extend(hops[:-1] if path[0].isdigit() else hops)
+        self.offsets.append(len(self.hops))
+        others = set(hops[1:])
+        others.discard(hops[0])
+        common = self.through.get(hops[0])
+        if common is None:
+            self.through[hops[0]] = others
+        else:
+            common &= others
+
+    def build(self, catalog=None):
+        asns = np.array([int(a) for a in self.nodes], dtype=np.uint32)
+        order = np.argsort(asns, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        if self.edges:
+            ends = rank[np.array(list(self.edges), dtype=np.int64)]
+        else:
+            ends = np.empty((0, 2), dtype=np.int64)
+        counts = self.edge_prefixes.counts(len(self.edges))
+        flags = np.frombuffer(self.flags, dtype=np.uint8) if len(self.flags) else np.empty(0, dtype=np.uint8)
+        origins = np.zeros(len(order), dtype=np.uint32)
+        origins[rank] = self.origin_prefixes.counts(len(order))
+        peers = np.zeros(len(order), dtype=bool)
+        peers[rank[list(self.peers)]] = True
+        by_edge = np.lexsort((ends[:, 1], ends[:, 0]))
+        indptr = csr_indptr(ends[:, 0], len(order))
+        if catalog is not None:
+            countries = np.array([catalog.get_asn(str(a)) for a in asns[order]], dtype='U2')
+        else:
+            countries = np.full(len(order), 'ZZ', dtype='U2')
+        pairs = self.downstreams()
+        cone = np.stack([rank[(pairs >> np.uint64(32)).astype(np.int64)], rank[(pairs & np.uint64(0xffffffff)).astype(np.int64)]], axis=1)
+        cone = cone[np.lexsort((cone[:, 1], cone[:, 0]))]
+        through = np.array([(rank[o], rank[n]) for o, common in self.through.items() for n in common], dtype=np.int64).reshape(-1, 2)
+        through = through[np.lexsort((through[:, 1], through[:, 0]))]
+        upstream_countries, upstream_nodes, upstream_prefixes = self.upstreams(ends, countries)
+        return ASGraph(
+            asns[order], indptr, ends[by_edge, 1].astype(np.int32),
+            counts[by_edge].astype(np.uint32), flags[by_edge], origins, countries, peers,
+            csr_indptr(cone[:, 0], len(order)), cone[:, 1].astype(np.int32),
+            csr_indptr(through[:, 0], len(order)), through[:, 1].astype(np.int32),
+            upstream_countries, upstream_nodes, upstream_prefixes
+        )
+
+    def downstreams(self):
+        # (AS, AS seen after it) pairs of the walked paths, built per path
+        # length and hop position
+        hops = np.frombuffer(self.hops, dtype=np.uint32).astype(np.uint64) if len(self.hops) else np.empty(0, dtype=np.uint64)
+        offsets = np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64)
+        lengths = np.diff(offsets)
+        pairs = [np.empty(0, dtype=np.uint64)]
+        for length in np.unique(lengths[lengths > 1]):
+            rows = hops[offsets[:-1][lengths == length][:, None] + np.arange(length)]
+            keys = []
+            for i in range(1, length):
+                above = rows[:, i:i + 1]
+                below = rows[:, :i]
+                keys.append((above << np.uint64(32) | below)[above != below])
+            pairs.append(np.unique(np.concatenate(keys)))
+        return np.unique(np.concatenate(pairs))
+
+    def upstreams(self, ends, countries):
+        # distinct prefixes entering each country over an edge from a foreign
+        # AS, per (country, foreign AS) and per country (node -1)
+        pairs = self.edge_prefixes.compact()
+        eids = (pairs >> np.uint64(32)).astype(np.int64)
+        pids = (pairs & np.uint64(0xffffffff)).astype(np.int64)
+        sources, targets = countries[ends[eids, 0]], countries[ends[eids, 1]]
+        foreign = sources != targets
+        names, codes = np.unique(targets[foreign], return_inverse=True)
+        codes = codes.astype(np.int64)
+        nodes = ends[eids[foreign], 0]
+        pids = pids[foreign]
+        # mixed radix keys: (country, node, prefix) and (country, prefix)
+        radix = int(pids.max()) + 1 if len(pids) else 1
+        per_node = np.unique((codes * len(countries) + nodes) * radix + pids) // radix
+        per_node, sizes = np.unique(per_node, return_counts=True)
+        per_country = np.unique(codes * radix + pids) // radix
+        per_country, totals = np.unique(per_country, return_counts=True)
+        keys = np.concatenate([per_node // len(countries), per_country])
+        order = np.argsort(keys, kind='stable')
+        nodes = np.concatenate([per_node % len(countries), np.full(len(per_country), -1)])
+        prefixes = np.concatenate([sizes, totals])
+        return names[keys[order]].astype('U2'), nodes[order].astype(np.int32), prefixes[order].astype(np.uint32)
+
+
+def csr_indptr(rows, n):
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr
+
+
+class ASGraph:
+
+    def __init__(self, asns, indptr, indices, prefixes, flags, origins, countries, peers,
+                 cone_indptr, cone_indices, through_indptr, through_indices,
+                 upstream_countries, upstream_nodes, upstream_prefixes):
+        self.asns = asns
+        self.indptr = indptr
+        self.indices = indices
+        self.prefixes = prefixes
+        self.flags = flags
+        self.origins = origins
+        self.countries = countries
+        self.peers = peers
+        self.cone_indptr = cone_indptr
+        self.cone_indices = cone_indices
+        self.through_indptr = through_indptr
+        self.through_indices = through_indices
+        self.upstream_countries = upstream_countries
+        self.upstream_nodes = upstream_nodes
+        self.upstream_prefixes = upstream_prefixes
+        self._reverse = None
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(*[f[name] for name in ARRAYS])
+
+    def save(self, path):
+        directory = os.path.dirname(path) or '.'
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **{name: getattr(self, name) for name in ARRAYS})
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self.asns)
+
+    def edge_count(self):
+        return len(self.indices)
+
+    def node(self, asn):
+        i = int(np.searchsorted(self.asns, int(asn)))
+        if i < len(self.asns) and self.asns[i] == int(asn):
+            return i
+        return None
+
+    def reverse(self):
+        # upstreams of node i: rindices[rindptr[i]:rindptr[i + 1]], with the edge ids
+        if self._reverse is None:
+            sources = np.repeat(np.arange(len(self.asns)), np.diff(self.indptr))
+            edges = np.argsort(self.indices, kind='stable')
+            rindptr = np.zeros(len(self.asns) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=len(self.asns)), out=rindptr[1:])
+            self._reverse = (rindptr, sources[edges].astype(np.int32), edges)
+        return self._reverse
+
+    def neighbours(self, nodes, upstream=False):
+        # every edge out of (or into) a batch of nodes: (edge ids, other ends)
+        if upstream:
+            indptr, indices, edges = self.reverse()
+        else:
+            indptr, indices, edges = self.indptr, self.indices, None
+        starts, stops = indptr[nodes], indptr[nodes + 1]
+        sizes = stops - starts
+        offsets = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+        if edges is None:
+            return offsets, indices[offsets]
+        return edges[offsets], indices[offsets]
+
+    def cone(self, node):
+        # node and every AS seen after it on a path through it
+        below = self.cone_indices[self.cone_indptr[node]:self.cone_indptr[node + 1]]
+        return np.union1d(below, [node])
+
+    def cone_size(self, asn):
+        # (ASes, originated prefixes) in the downstream cone of asn
+        node = self.node(asn)
+        if node is None:
+            return 0, 0
+        cone = self.cone(node)
+        return len(cone), int(self.origins[cone].sum())
+
+    def country_upstreams(self, cc):
+        # foreign ASes with an edge into the country, with the distinct
+        # prefixes entering the country over their edges and how many of the
+        # country's ASes they reach; total counts each prefix once
+        members = np.flatnonzero(self.countries == cc)
+        _, sources = self.neighbours(members, upstream=True)
+        sources = sources[self.countries[sources] != cc]
+        sel = self.upstream_countries == cc
+        nodes, prefixes = self.upstream_nodes[sel], self.upstream_prefixes[sel]
+        total = int(prefixes[nodes == -1].sum())
+        upstreams = {}
+        for node, count in zip(nodes.tolist(), prefixes.tolist()):
+            if node >= 0:
+                upstreams[int(self.asns[node])] = (count, int((sources == node).sum()))
+        return total, upstreams
+
+    def single_points_of_failure(self, cc):
+        # ASes every observed path to some of the country's origin ASes goes
+        # through: (ASes cut off, prefixes they originate) per AS
+        spofs = {}
+        for member in np.flatnonzero(self.countries == cc):
+            for node in self.through_indices[self.through_indptr[member]:self.through_indptr[member + 1]]:
+                asn = int(self.asns[node])
+                ases, prefixes = spofs.get(asn, (0, 0))
+                spofs[asn] = (ases + 1, prefixes + int(self.origins[member]))
+        return spofs
+
+
+def graph_path(source, date):
+    return "{dir}/as-graph-{date}.npz".format(dir=source, date=date)
@@ -0,0 +1,106 @@
+import os
+import re
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# One compressed chunk per day holding every column of these datasets, so a
+# daily update writes a single chunk and a rolling window reads only its days.
+DATASETS = ['country-routing-stats', 'prefix-summary', 'ixp-summary']
+TRENDS = {'country-routing-stats': 'country-routing-trends', 'prefix-summary': 'prefix-trends', 'ixp-summary': 'ixp-trends'}
+
+
+def chunk_path(directory, date):
+    return "{dir}/history-{date}.npz".format(dir=directory, date=date)
+
+
+def history_dates(directory):
+    dates = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            match = re.match(r'^history-(\d{8})\.npz$', name)
+            if match:
+                dates.append(match.group(1))
+    return sorted(dates)
+
+
+def append_day(directory, source, date, force=False):
+    path = chunk_path(directory, date)
+    if os.path.exists(path) and not force:
+        return False
+    arrays = {}
+    for name in DATASETS:
+        inpath = "{dir}/{n}-{date}.csv".format(dir=source, n=name, date=date)
+        if not os.path.exists(inpath):
+            continue
+        # 'NA' is Namibia
+        df = pd.read_csv(inpath, index_col='country', keep_default_na=False, na_values=[''])
+        arrays[name + '/country'] = df.index.to_numpy(dtype=str)
+        for column in df.columns:
+            arrays[name + '/' + column] = df[column].to_numpy(dtype=np.float64)
+    if not arrays:
+        raise FileNotFoundError("no datasets from " + date + " in " + source)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+    return True
+
+
+def load_history(directory, name, dates=None):
+    # long frame indexed by (country, date) with one column per stat
+    if dates is None:
+        dates = history_dates(directory)
+    frames = []
+    for date in dates:
+        with np.load(chunk_path(directory, date)) as chunk:
+            prefix = name + '/'
+            columns = {k[len(prefix):]: chunk[k] for k in chunk.files if k.startswith(prefix)}
+        if not columns:
+            continue
+        countries = columns.pop('country')
+        df = pd.DataFrame(columns)
+        df.insert(0, 'date', datetime.strptime(date, '%Y%m%d'))
+        df.insert(0, 'country', countries)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=['country', 'date']).set_index(['country', 'date'])
+    return pd.concat(frames, ignore_index=True).set_index(['country', 'date']).sort_index()
+
+
+def window_start(date, window):
+    # first day of the <window> days ending on date (YYYYMMDD)
+    start = datetime.strptime(date, '%Y%m%d') - pd.Timedelta(days=window)
+    return start.strftime('%Y%m%d')
+
+
+def trends(history, window):
+    # per country: last value, change since the previous calendar day (empty
+    # when that day is not in the history), mean over the days of the last
+    # <window> calendar days that are in the history, and change since the
+    # earliest of them no more than <window> days before the last one.
+    # Entries are selected by date, so skipped days do not stretch the window.
+    columns = [c + s for c in history.columns for s in ['', '_delta', '_mean_{w}d'.format(w=window), '_delta_{w}d'.format(w=window)]]
+    if history.empty:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name='country'))
+    dates = history.index.get_level_values('date')
+    latest = dates.max()
+    present = history.xs(latest, level='date').index
+    history = history[history.index.get_level_values('country').isin(present)]
+    dates = history.index.get_level_values('date')
+    last = history.xs(latest, level='date')
+    previous = history[dates == latest - pd.Timedelta(days=1)].droplevel('date')
+    delta = last - previous.reindex(last.index)
+    mean = history[dates > latest - pd.Timedelta(days=window)].groupby(level='country').mean()
+    since = history[dates >= latest - pd.Timedelta(days=window)]
+    first = since.groupby(level='country').head(1).droplevel('date')
+    frames = [last]
+    frames.append(delta.add_suffix('_delta'))
+    frames.append(mean.reindex(last.index).add_suffix('_mean_{w}d'.format(w=window)))
+    frames.append((last - first.reindex(last.index)).add_suffix('_delta_{w}d'.format(w=window)))
+    result = pd.concat(frames, axis=1)
+    return result[columns]
@@ -0,0 +1,200 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Profiling is opt-in through the environment so every script gets the hook
+# without growing new command line options:
+#   BGPLAC_PROFILE=cprofile|sample
+#   BGPLAC_PROFILE_STAGES=parse,ribs   (default: every stage)
+#   BGPLAC_PROFILE_INTERVAL=0.005      (sampling period in seconds)
+PROFILE_MODE = os.environ.get('BGPLAC_PROFILE', '')
+PROFILE_STAGES = [s for s in os.environ.get('BGPLAC_PROFILE_STAGES', '').split(',') if s]
+PROFILE_INTERVAL = float(os.environ.get('BGPLAC_PROFILE_INTERVAL', '0.005'))
+
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss = rss // 1024
+    return rss
+
+
+class StackSampler:
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.target = threading.get_ident()
+        self.running = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+    def run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{f}:{n}".format(f=os.path.basename(code.co_filename), n=code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write("{s} {c}\n".format(s=stack, c=count))
+
+
+class Stage:
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.items = 0
+        self.counters = {}
+        self.parts = {}
+        self.last = None
+
+    def count(self, key, n=1):
+        if key in self.counters:
+            self.counters[key] += n
+        else:
+            self.counters[key] = n
+
+    def lap(self, part):
+        # splits the time of a hot loop into parts without nesting stages
+        now = time.perf_counter()
+        if part in self.parts:
+            self.parts[part] += now - self.last
+        else:
+            self.parts[part] = now - self.last
+        self.last = now
+
+    def to_dict(self):
+        data = {
+            'seconds': round(self.seconds, 6),
+            'calls': self.calls,
+            'items': self.items,
+            'items_per_second': round(self.items / self.seconds, 2) if self.seconds > 0 and self.items else None,
+            'counters': self.counters
+        }
+        if self.parts:
+            data['parts'] = {p: round(s, 6) for p, s in self.parts.items()}
+        return data
+
+
+class RunReport:
+
+    def __init__(self, script, date, ixp=None, region=None):
+        self.script = script
+        self.date = date
+        self.ixp = ixp
+        self.region = region
+        self.started = time.time()
+        self.stages = {}
+        self.profiles = []
+        self.profiling = False
+
+    def get_stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = Stage(name)
+        return self.stages[name]
+
+    def profiled(self, name):
+        return PROFILE_MODE != '' and (not PROFILE_STAGES or name in PROFILE_STAGES)
+
+    @contextmanager
+    def stage(self, name):
+        st = self.get_stage(name)
+        profiler = None
+        # a stage nested in a profiled one is left in the outer profile:
+        # only one cProfile can be enabled at a time
+        if self.profiled(name) and not self.profiling:
+            self.profiling = True
+            if PROFILE_MODE == 'sample':
+                profiler = StackSampler(PROFILE_INTERVAL)
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+        start = time.perf_counter()
+        st.last = start
+        try:
+            yield st
+        finally:
+            st.seconds += time.perf_counter() - start
+            st.calls += 1
+            if profiler is not None:
+                if PROFILE_MODE == 'sample':
+                    profiler.stop()
+                else:
+                    profiler.disable()
+                self.profiles.append((name, profiler))
+                self.profiling = False
+
+    def to_dict(self):
+        return {
+            'script': self.script,
+            'date': self.date,
+            'ixp': self.ixp,
+            'region': self.region,
+            'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'elapsed_seconds': round(time.time() - self.started, 6),
+            'peak_rss_kb': peak_rss_kb(),
+            'stages': {name: st.to_dict() for name, st in self.stages.items()}
+        }
+
+    def basename(self):
+        if self.ixp:
+            return "{s}-{ixp}-{date}".format(s=self.script, ixp=self.ixp, date=self.date)
+        return "{s}-{date}".format(s=self.script, date=self.date)
+
+    def write(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = "{dir}/run-report-{name}.json".format(dir=directory, name=self.basename())
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        for name, profiler in self.profiles:
+            if isinstance(profiler, StackSampler):
+                profiler.dump("{dir}/profile-{n}-{s}.folded".format(dir=directory, n=self.basename(), s=name))
+            else:
+                profiler.dump_stats("{dir}/profile-{n}-{s}.prof".format(dir=directory, n=self.basename(), s=name))
+        return path
+
+
+def summarize(directory, date):
+    reports = []
+    for root, dirs, files in os.walk(directory):
+        for name in sorted(files):
+            if name.startswith('run-report-') and name.endswith('-' + date + '.json'):
+                with open(os.path.join(root, name)) as f:
+                    reports.append(json.load(f))
+    for r in reports:
+        title = r['script'] if not r['ixp'] else r['script'] + ' (' + r['ixp'] + ')'
+        print("* {t}: {s:.1f}s, peak rss {m:.0f} MB".format(t=title, s=r['elapsed_seconds'], m=r['peak_rss_kb'] / 1024))
+        for name, st in r['stages'].items():
+            rate = '' if st['items_per_second'] is None else ", {0:.0f} items/s".format(st['items_per_second'])
+            print("    {n}: {s:.1f}s{r}".format(n=name, s=st['seconds'], r=rate))
+    return reports
+
+
+if __name__ == '__main__':
+    summarize(sys.argv[1], sys.argv[2])
@@ -0,0 +1,236 @@
+import csv
+import ipaddress
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from bgplac.fetch import fetch
+from bgplac.sources import caida_ixs_url
+from bgplac.tables import open_input, write_table, writes_long, writes_wide
+
+
+def build_ixp_index(path):
+    # only IXPs seen by PCH are counted, as in the daily summaries
+    countries = {}
+    rows = 0
+    with open(path, 'rb') as content:
+        for l in content:
+            line = l.decode('utf-8')
+            if line[0] != '#':
+                rows += 1
+                obj = json.loads(line)
+                if 'country' in obj and 'pch' in obj['sources']:
+                    entry = countries.setdefault(obj['country'], {'ixp_count': 0, 'ix_ids': []})
+                    entry['ixp_count'] += 1
+                    entry['ix_ids'].append(obj['ix_id'])
+    for entry in countries.values():
+        entry['ix_ids'].sort()
+    return {'rows': rows, 'countries': countries}
+
+
+def index_path(source, dsdate):
+    return "{s}/ixp-index-{d}.json".format(s=source, d=dsdate)
+
+
+def load_ixp_index(source, dsdate, st=None):
+    # the dataset is quarterly, so it is parsed once and reused by every daily run
+    path = index_path(source, dsdate)
+    if os.path.exists(path):
+        print("* Using IXP index " + path)
+        with open(path) as f:
+            return json.load(f)['countries']
+    index = build_ixp_index(fetch(caida_ixs_url(dsdate)))
+    index['dsdate'] = dsdate
+    if st is not None:
+        st.items = index['rows']
+    os.makedirs(source, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=source)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+    return index['countries']
+
+
+def ixp_count(index, cc):
+    if cc in index:
+        return index[cc]['ixp_count']
+    return 0
+
+
+def country_regions(regions):
+    cctorir = {}
+    for rir, countries in regions.items():
+        for cc in countries:
+            cctorir[cc] = rir
+    return cctorir
+
+
+def read_routes(path, layout='wide'):
+    # (peer_cc, peer_asn, origin_cc, origin_asn, ipv4 prefixes, ipv6 prefixes)
+    # from ixp-routing, or from the long ixp-routes table
+    with open_input(path) as csvfile:
+        for row in csv.DictReader(csvfile, delimiter=',', quoting=csv.QUOTE_NONE):
+            if layout != 'long':
+                yield (
+                    row['peer_cc'], row['peer_asn'], row['origin_cc'], row['origin_asn'],
+                    row['prefixes_ipv4'].split(), row['prefixes_ipv6'].split()
+                )
+            elif '.' in row['prefix']:
+                yield row['peer_cc'], row['peer_asn'], row['origin_cc'], row['origin_asn'], [row['prefix']], []
+            else:
+                yield row['peer_cc'], row['peer_asn'], row['origin_cc'], row['origin_asn'], [], [row['prefix']]
+
+
+def summarize_ixp(routes, aspath_path, region, cctorir, st=None):
+    table = {}
+    for peercc, peer_asn, origcc, origin_asn, pfxs4, pfxs6 in routes:
+        if st is not None:
+            st.items += 1
+        if peercc in cctorir:
+            if cctorir[peercc] != region:
+                peercc = cctorir[peercc]
+        else:
+            peercc = 'other'
+        if peercc not in table:
+            table[peercc] = { 'peer_ases': set([]), 'origin_ases': set([]), 'origin_prefixes_ipv4': set([]), 'origin_prefixes_ipv6': set([]) }
+        if origcc not in table:
+            table[origcc] = { 'peer_ases': set([]), 'origin_ases': set([]), 'origin_prefixes_ipv4': set([]), 'origin_prefixes_ipv6': set([]) }
+        table[peercc]['peer_ases'].add(peer_asn)
+        custom = table[origcc]
+        custom['origin_ases'].add(origin_asn)
+        custom['origin_prefixes_ipv4'].update(pfxs4)
+        custom['origin_prefixes_ipv6'].update(pfxs6)
+
+    dataset = []
+    for cc, row in table.items():
+        prefixes4 = []
+        pfxlen4_sum = 0
+        prefixes6 = []
+        pfxlen6_sum = 0
+        for p in row['origin_prefixes_ipv4']:
+            ipnet = ipaddress.IPv4Network(p)
+            pfxlen4_sum += ipnet.prefixlen
+            prefixes4.append(ipnet)
+        for p in row['origin_prefixes_ipv6']:
+            ipnet = ipaddress.IPv6Network(p)
+            pfxlen6_sum += ipnet.prefixlen
+            prefixes6.append(ipnet)
+        origin_collapsed_prefixes4 = ipaddress.collapse_addresses(prefixes4)
+        origin_collapsed_prefixes6 = ipaddress.collapse_addresses(prefixes6)
+        addresses4_count = 0
+        for net in origin_collapsed_prefixes4:
+            addresses4_count += net.num_addresses
+        addresses6_count = 0
+        for net in origin_collapsed_prefixes6:
+            addresses6_count += net.num_addresses
+        prefixes4_count = len(row['origin_prefixes_ipv4'])
+        if prefixes4_count > 0:
+            origin_pfxlen4_avg = "{:.2f}".format(pfxlen4_sum/prefixes4_count)
+        else:
+            origin_pfxlen4_avg = ''
+        prefixes6_count = len(row['origin_prefixes_ipv6'])
+        if prefixes6_count > 0:
+            origin_pfxlen6_avg = "{:.2f}".format(pfxlen6_sum/prefixes6_count)
+        else:
+            origin_pfxlen6_avg = ''
+        dataset.append({
+            "country": cc,
+            "peer_ases_count": len(row['peer_ases']),
+            "origin_ases_count": len(row['origin_ases']),
+            "origin_prefixes_ipv4_count": prefixes4_count,
+            "origin_prefixes_ipv6_count": prefixes6_count,
+            "origin_prefixes_count": prefixes4_count + prefixes6_count,
+            "origin_addresses_ipv4_count": addresses4_count,
+            "origin_addresses_ipv6_count": addresses6_count,
+            "origin_pfxlen_ipv4_avg": origin_pfxlen4_avg,
+            "origin_pfxlen_ipv6_avg": origin_pfxlen6_avg
+        })
+    df = pd.DataFrame(dataset)
+
+    data = pd.read_csv(aspath_path, keep_default_na=False, na_values=[''])
+    g = data.groupby('country')
+    data['wa'] = data.frequency / g.frequency.transform("sum") * data.hops
+    aggregated = g.agg({
+        'wa': 'sum',
+        'hops': ['min', 'max'],
+        'frequency': 'sum'
+    })
+    aggregated.columns = ["_".join(x) for x in aggregated.columns.ravel()]
+    aggregated.rename(columns={
+        'wa_sum': 'aspath_len_avg',
+        'hops_min': 'aspath_len_min',
+        'hops_max': 'aspath_len_max',
+        'frequency_sum': 'total_paths'
+    }, inplace=True)
+    return pd.merge(df, aggregated, how="outer", on='country')
+
+
+def country_resources(path, countries, st=None):
+    # origin ASNs and prefixes of each country in prefix-data, read once
+    resources = {}
+    for cc in countries:
+        resources[cc] = {'asn': set([]), 'ipv4': set([]), 'ipv6': set([])}
+    with open_input(path) as csvcc:
+        for row in csv.DictReader(csvcc, delimiter=',', quoting=csv.QUOTE_NONE):
+            if st is not None:
+                st.items += 1
+            if row['country'] in resources:
+                cc = resources[row['country']]
+                cc['asn'].add(row['origin_asn'])
+                prefix = "{0}/{1}".format(row['prefix'], row['length'])
+                if row['version'] == 'ipv4':
+                    cc['ipv4'].add(prefix)
+                else:
+                    cc['ipv6'].add(prefix)
+    return resources
+
+
+def ixp_resources(routes, country, st=None):
+    # origin ASNs and prefixes seen at the IXP from origins of its country
+    resources = {'asn': set([]), 'ipv4': set([]), 'ipv6': set([])}
+    for peer_cc, peer_asn, origin_cc, origin_asn, pfxs4, pfxs6 in routes:
+        if st is not None:
+            st.items += 1
+        if origin_cc == country:
+            resources['asn'].add(origin_asn)
+            resources['ipv4'].update(pfxs4)
+            resources['ipv6'].update(pfxs6)
+    return resources
+
+
+def coverage(ix, cc):
+    groups = {}
+    for resource in ['asn', 'ipv4', 'ipv6']:
+        shared = ix[resource].intersection(cc[resource])
+        groups[resource] = {
+            'shared': shared,
+            'ixp_only': ix[resource].difference(shared),
+            'country_only': cc[resource].difference(shared)
+        }
+    return groups
+
+
+def write_coverage(dst, ixp, date, groups, layout='wide'):
+    outp1 = "{dir}/country-coverage-{ixp}-{date}.csv".format(dir=dst, ixp=ixp, date=date)
+    outp2 = "{dir}/country-coverage-summary-{ixp}-{date}.csv".format(dir=dst, ixp=ixp, date=date)
+    classes = ['shared', 'ixp_only', 'country_only']
+    if writes_wide(layout):
+        with open(outp1, 'w', newline='') as f1:
+            w1 = csv.writer(f1)
+            w1.writerow(["resource", "shared", "ixp_only", "country_only"])
+            for resource, sets in groups.items():
+                w1.writerow([resource] + [" ".join(sets[c]) for c in classes])
+    if writes_long(layout):
+        write_table(
+            "{dir}/country-coverage-items-{ixp}-{date}.csv".format(dir=dst, ixp=ixp, date=date),
+            ["resource", "class", "value"],
+            ([resource, c, value] for resource, sets in groups.items() for c in classes for value in sets[c])
+        )
+    with open(outp2, 'w', newline='') as f2:
+        w2 = csv.writer(f2)
+        w2.writerow(["resource", "total", "shared", "ixp_only", "country_only"])
+        for resource, sets in groups.items():
+            counts = [len(sets[c]) for c in classes]
+            w2.writerow([resource, sum(counts)] + counts)
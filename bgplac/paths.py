@@ -0,0 +1,82 @@
+from array import array
+
+import numpy as np
+
+
+# Every distinct AS path is stored once as a run of integer ASNs (0 for AS
+# sets) in one flat array: path i is asns[offsets[i]:offsets[i + 1]], seen
+# counts[i] times. Per-path analyses run over the distinct paths only and
+# weight the results by those counts. Numeric paths are found by the hash of
+# their text and checked against the stored run, so the text is not kept;
+# paths with AS sets (stored as 0) and hash collisions are keyed by the text.
+STATS = ['length', 'prepends', 'loop']
+
+
+class PathStore:
+
+    def __init__(self):
+        self.ids = {}
+        self.named = {}
+        self.asns = array('I')
+        self.offsets = array('Q', [0])
+        self.counts = array('I')
+
+    def __len__(self):
+        return len(self.counts)
+
+    def append(self, tokens):
+        self.asns.extend([int(t) if t.isdigit() else 0 for t in tokens])
+        self.offsets.append(len(self.asns))
+        self.counts.append(0)
+        return len(self.counts) - 1
+
+    def add(self, aspath, tokens):
+        pid = None
+        if aspath.replace(' ', '').isdigit():
+            key = hash(aspath)
+            pid = self.ids.get(key)
+            if pid is None:
+                pid = self.ids[key] = self.append(tokens)
+            elif self.path(pid) != array('I', map(int, tokens)):
+                pid = None
+        if pid is None:
+            pid = self.named.get(aspath)
+            if pid is None:
+                pid = self.named[aspath] = self.append(tokens)
+        self.counts[pid] += 1
+        return pid
+
+    def path(self, pid):
+        return self.asns[self.offsets[pid]:self.offsets[pid + 1]]
+
+    def arrays(self):
+        asns = np.frombuffer(self.asns, dtype=np.uint32) if len(self.asns) else np.empty(0, dtype=np.uint32)
+        return asns, np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64), np.frombuffer(self.counts, dtype=np.uint32) if len(self.counts) else np.empty(0, dtype=np.uint32)
+
+
+def path_stats(store):
+    # per distinct path: its length, the hops added by prepending and whether
+    # an AS appears again after a different one (AS sets are ignored)
+    asns, offsets, counts = store.arrays()
+    lengths = np.diff(offsets)
+    pids = np.repeat(np.arange(len(lengths)), lengths)
+    first = np.ones(len(asns), dtype=bool)
+    first[1:] = (asns[1:] != asns[:-1]) | (pids[1:] != pids[:-1])
+    runs = np.bincount(pids[first], minlength=len(lengths))
+    prepends = lengths - runs
+    named = first & (asns != 0)
+    named_runs = np.bincount(pids[named], minlength=len(lengths))
+    pairs = np.unique(pids[named].astype(np.uint64) << np.uint64(32) | asns[named].astype(np.uint64))
+    distinct = np.bincount((pairs >> np.uint64(32)).astype(np.int64), minlength=len(lengths))
+    loops = (named_runs > distinct).astype(np.int64)
+    return {'length': lengths, 'prepends': prepends, 'loop': loops}, counts
+
+
+def path_stat_rows(store):
+    # (stat, value, distinct paths, paths) frequency rows
+    stats, counts = path_stats(store)
+    for stat in STATS:
+        values = stats[stat]
+        for value in np.unique(values):
+            sel = values == value
+            yield [stat, int(value), int(sel.sum()), int(counts[sel].sum())]
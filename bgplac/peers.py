@@ -0,0 +1,119 @@
+import csv
+import hashlib
+import heapq
+
+from bgplac.tables import write_table
+
+
+# Collector peers are profiled per family in a pre-pass over the RIBs: the
+# size of their table and a bottom-k sketch of their (prefix, path) routes,
+# with the peer's own ASN removed from the head of the path so the views of
+# different peers can be compared. Full feeds are peers whose table is close
+# to the largest one; among full feeds with nearly the same view only the
+# largest is selected.
+SKETCH_SIZE = 1024
+COLUMNS = [
+    'collector', 'peer_asn', 'peer_address', 'family', 'prefixes', 'share',
+    'full_feed', 'similar_to', 'similarity', 'selected'
+]
+
+
+def peer_of(rec, elem):
+    return (rec.collector, str(elem.peer_asn), elem.peer_address)
+
+
+def route_hash(prefix, path, peer_asn):
+    i = 0
+    while i < len(path) - 1 and path[i] == peer_asn:
+        i += 1
+    route = prefix + '|' + ' '.join(path[i:])
+    return int.from_bytes(hashlib.blake2b(route.encode(), digest_size=8).digest(), 'big')
+
+
+class Sketch:
+    # the k smallest distinct hashes seen (a KMV sketch)
+
+    def __init__(self, k=SKETCH_SIZE):
+        self.k = k
+        self.heap = []
+        self.members = set()
+
+    def add(self, h):
+        if h in self.members:
+            return
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, -h)
+            self.members.add(h)
+        elif h < -self.heap[0]:
+            self.members.discard(-heapq.heapreplace(self.heap, -h))
+            self.members.add(h)
+
+
+def similarity(a, b):
+    # estimated Jaccard similarity of the two route sets
+    union = sorted(a.members | b.members)[:min(a.k, b.k)]
+    if not union:
+        return 0.0
+    return sum(1 for h in union if h in a.members and h in b.members) / len(union)
+
+
+class PeerProfile:
+
+    def __init__(self, k=SKETCH_SIZE):
+        self.k = k
+        self.prefixes = {}
+        self.sketches = {}
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    def add(self, peer, v, prefix, path):
+        key = peer + (v,)
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = Sketch(self.k)
+            self.prefixes[key] = 0
+        self.prefixes[key] += 1
+        sketch.add(route_hash(prefix, path, peer[1]))
+
+    def rows(self, full_feed=0.9, threshold=0.95):
+        largest = {}
+        for key, n in self.prefixes.items():
+            largest[key[3]] = max(largest.get(key[3], 0), n)
+        kept = []
+        for key in sorted(self.prefixes, key=lambda k: (k[3], -self.prefixes[k], k)):
+            share = self.prefixes[key] / largest[key[3]]
+            full = share >= full_feed
+            # the closest peer already selected, reported even when it is
+            # not close enough, so the threshold can be tuned on the profile
+            similar_to, best = '', None
+            if full:
+                for other in kept:
+                    if other[3] == key[3]:
+                        s = similarity(self.sketches[key], self.sketches[other])
+                        if best is None or s > best:
+                            similar_to, best = ' '.join(other[:3]), s
+            selected = full and (best is None or best < threshold)
+            if selected:
+                kept.append(key)
+            yield list(key) + [
+                self.prefixes[key], round(share, 4), full, similar_to,
+                '' if best is None else round(best, 4), selected
+            ]
+
+
+def write_profile(path, rows):
+    return write_table(path, COLUMNS, rows)
+
+
+def read_selection(path):
+    # (collector, peer_asn, peer_address, family) of the selected peers
+    with open(path, newline='') as f:
+        return set(
+            (row['collector'], row['peer_asn'], row['peer_address'], row['family'])
+            for row in csv.DictReader(f) if row['selected'] == 'True'
+        )
+
+
+def selection(rows):
+    return set(tuple(row[:4]) for row in rows if row[-1])
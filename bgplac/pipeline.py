@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bgplac.scripts import ROOT
+
+
+# A stage is rebuilt when its outputs are missing or were changed since its
+# last run, or when the content of its inputs, its parameters or its code
+# (the script and the bgplac package) changed. Outputs are hashed after each
+# run, so a dependent whose inputs came out identical is not rebuilt.
+class Stage:
+
+    def __init__(self, name, script, args, inputs=(), outputs=(), optional=(), params=None):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        # inputs that may be missing without blocking the stage
+        self.optional = list(optional)
+        self.params = params
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def package_hash():
+    digest = hashlib.sha256()
+    package = os.path.join(ROOT, 'bgplac')
+    for name in sorted(os.listdir(package)):
+        if name.endswith('.py'):
+            digest.update(name.encode())
+            digest.update(file_hash(os.path.join(package, name)).encode())
+    return digest.hexdigest()
+
+
+class Executor:
+
+    def __init__(self, manifest, dry_run=False):
+        self.path = manifest
+        self.dry_run = dry_run
+        self.manifest = {'stages': {}, 'files': {}}
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                self.manifest = json.load(f)
+        self.package = package_hash()
+
+    def hash(self, path):
+        # hashes are reused while a file keeps its size and mtime
+        if not os.path.exists(path):
+            return None
+        st = os.stat(path)
+        known = self.manifest['files'].get(path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2]
+        digest = file_hash(path)
+        self.manifest['files'][path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def code(self, stage):
+        return hashlib.sha256((self.package + file_hash(os.path.join(ROOT, stage.script))).encode()).hexdigest()
+
+    def state(self, stage):
+        return {
+            'inputs': {p: self.hash(p) for p in stage.inputs + stage.optional},
+            'params': [stage.args, stage.params],
+            'code': self.code(stage)
+        }
+
+    def stale(self, stage):
+        # the reason to rebuild the stage, or None when it is up to date
+        entry = self.manifest['stages'].get(stage.name)
+        if entry is None:
+            return 'never built'
+        state = self.state(stage)
+        if entry['code'] != state['code']:
+            return 'code changed'
+        if entry['params'] != state['params']:
+            return 'parameters changed'
+        for path, digest in state['inputs'].items():
+            if entry['inputs'].get(path) != digest:
+                return path + ' changed'
+        for path in stage.outputs:
+            if entry['outputs'].get(path) != self.hash(path):
+                return path + (' missing' if not os.path.exists(path) else ' changed')
+        return None
+
+    def save(self):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def run(self, stages, report, force=()):
+        # stages are given in dependency order; a failed stage blocks the
+        # stages reading its outputs, every other stage still runs
+        producers = {}
+        for stage in stages:
+            for path in stage.outputs:
+                producers[path] = stage.name
+        results = {}
+        for stage in stages:
+            blocked = [producers[p] for p in stage.inputs if results.get(producers.get(p)) in ['failed', 'blocked']]
+            if blocked:
+                print("! {s} blocked by {b}".format(s=stage.name, b=", ".join(sorted(set(blocked)))))
+                results[stage.name] = 'blocked'
+                continue
+            pending = [producers[p] for p in stage.inputs + stage.optional if results.get(producers.get(p)) == 'pending']
+            if stage.name in force or 'all' in force:
+                reason = 'forced'
+            elif pending:
+                reason = 'after ' + ", ".join(sorted(set(pending)))
+            else:
+                reason = self.stale(stage)
+            if reason is None:
+                print("= {s} up to date".format(s=stage.name))
+                results[stage.name] = 'skipped'
+                continue
+            print("* {s}: {r}".format(s=stage.name, r=reason))
+            if self.dry_run:
+                results[stage.name] = 'pending'
+                continue
+            started = time.time()
+            with report.stage(stage.name) as st:
+                code = subprocess.call([sys.executable, os.path.join(ROOT, stage.script)] + stage.args)
+            seconds = time.time() - started
+            if code != 0:
+                print("! {s} failed ({c})".format(s=stage.name, c=code))
+                self.manifest['stages'].pop(stage.name, None)
+                results[stage.name] = 'failed'
+            else:
+                entry = self.state(stage)
+                entry['outputs'] = {p: self.hash(p) for p in stage.outputs}
+                entry['seconds'] = round(seconds, 3)
+                self.manifest['stages'][stage.name] = entry
+                results[stage.name] = 'built'
+            st.count(results[stage.name])
+            self.save()
+        return results
+
+
+def daily_stages(date, source, ixp_data, ixps=True):
+    # the steps of run-scripts-with-ixp.sh with the files each reads and writes
+    regions = os.path.join(ROOT, 'regions.json')
+    with open(ixp_data) as f:
+        ixpdata = json.load(f)
+    active = [ixp for ixp, values in ixpdata.items() if values['active']] if ixps else []
+
+    def data(name):
+        return "{dir}/{n}-{date}.csv".format(dir=source, n=name, date=date)
+
+    def ixp_file(name, ixp):
+        return "{dir}/{ixp}/{n}-{ixp}-{date}.csv".format(dir=source, ixp=ixp, n=name, date=date)
+
+    common = ['--date', date]
+    stages = [
+        Stage('prefetch', 'prefetch.py', common + ['--source', source, '--ixp-data', ixp_data, '--ixps' if ixps else '--no-ixps'],
+              params=[ixpdata[ixp] for ixp in active]),
+        Stage('download-delegated', 'download-delegated.py', common + ['--source', source], outputs=[data('delegated')]),
+        Stage('process-ribs', 'collector-scripts/process-ribs.py', common + ['--source', source],
+              inputs=[data('delegated'), regions], outputs=[data('country-data'), data('prefix-data'), data('as-data')]),
+        Stage('process-ixp-data', 'collector-scripts/process-ixp-data.py', common + ['--source', source],
+              inputs=[regions], outputs=[data('ixp-summary')]),
+        Stage('process-country-data', 'collector-scripts/process-country-data.py', common + ['--source', source],
+              inputs=[data('country-data'), regions], outputs=[data('country-summary')]),
+        Stage('process-prefix-data', 'collector-scripts/process-prefix-data.py', common + ['--source', source],
+              inputs=[data('prefix-data')], outputs=[data('prefix-summary')]),
+        Stage('get-routing-stats', 'collector-scripts/get-routing-stats.py', common + ['--source', source],
+              inputs=[data('country-summary'), data('prefix-summary'), data('ixp-summary')], outputs=[data('country-routing-stats')]),
+        Stage('update-history', 'collector-scripts/update-history.py', common + ['--source', source, '--force'],
+              inputs=[data('country-routing-stats'), data('prefix-summary'), data('ixp-summary')],
+              outputs=[data('country-routing-trends'), data('prefix-trends'), data('ixp-trends'), "{dir}/history/history-{date}.npz".format(dir=source, date=date)]),
+        Stage('process-as-data', 'collector-scripts/process-as-data.py', common + ['--source', source],
+              inputs=[data('as-data'), data('delegated'), regions],
+              outputs=[data(n) for n in ['country-ases-flow', 'country-prefixes-flow', 'country-origin-ases', 'country-transit-ases', 'country-upstream-ases']])
+    ]
+    routing = []
+    for ixp in active:
+        stages.append(Stage(
+            'get-bgp-table-' + ixp, 'ixp-scripts/get-bgp-table.py',
+            common + ['--ixp', ixp, '--dst', source, '--delegated-src', source, '--ixp-data', ixp_data],
+            inputs=[data('delegated')], outputs=[ixp_file('bgp-table', ixp)], params=ixpdata[ixp]
+        ))
+        stages.append(Stage(
+            'process-bgp-table-' + ixp, 'ixp-scripts/process-bgp-table.py', common + ['--ixp', ixp, '--src', source],
+            inputs=[ixp_file('bgp-table', ixp), regions],
+            outputs=[ixp_file(n, ixp) for n in ['ixp-routing', 'aspath-freq', 'prepend-freq']]
+        ))
+        routing += [ixp_file('ixp-routing', ixp), ixp_file('aspath-freq', ixp)]
+    if active:
+        # IXPs whose table could not be built are skipped by process-all-ixps
+        stages.append(Stage(
+            'process-all-ixps', 'ixp-scripts/process-all-ixps.py',
+            common + ['--src', source, '--ixp-data', ixp_data, '--ixps', ','.join(active)],
+            inputs=[data('prefix-data'), regions], optional=routing,
+            outputs=["{dir}/ixp-matrix-{date}.csv".format(dir=source, date=date)],
+            params=[ixpdata[ixp] for ixp in active]
+        ))
+    return stages
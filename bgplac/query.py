@@ -0,0 +1,262 @@
+import csv
+import ipaddress
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from bgplac.delegated import load_delegated, prefix_range
+from bgplac.ixps import read_routes
+from bgplac.summaries import ASN_COLUMNS, FAMILIES
+from bgplac.tables import input_path, open_input
+
+
+DATE = re.compile(r'^as-data-(\d{8})\.csv(\.gz|\.zst)?$')
+
+
+def read_rows(path):
+    with open_input(path) as csvfile:
+        for row in csv.DictReader(csvfile, delimiter=',', quoting=csv.QUOTE_NONE):
+            yield row
+
+
+class DayIndex:
+    # the catalog, as-data, prefix-data, country-data and ixp-routing of a
+    # date as dicts keyed by ASN, prefix and country
+
+    def __init__(self, source, date, ixps):
+        started = time.time()
+        self.date = date
+        self.catalog = load_delegated("{dir}/delegated-{date}.csv".format(dir=source, date=date), 'ZZ')
+        self.ases = {}
+        self.carriers = {}
+        for row in read_rows("{dir}/as-data-{date}.csv".format(dir=source, date=date)):
+            asn = row['as']
+            self.ases[asn] = {
+                'cc': row['cc'],
+                'downstream_ases': row['downstream_ases'].split(),
+                'prefixes': {v: row[v + '_prefixes'].split() for v in FAMILIES},
+                'downstream_prefixes': {v: row[v + '_downstream_prefixes'].split() for v in FAMILIES}
+            }
+            for v in FAMILIES:
+                for prefix in self.ases[asn]['downstream_prefixes'][v]:
+                    self.carriers.setdefault(prefix, []).append(asn)
+        self.prefixes = {}
+        self.lengths = {v: set() for v in FAMILIES}
+        for row in read_rows("{dir}/prefix-data-{date}.csv".format(dir=source, date=date)):
+            self.prefixes[row['prefix'] + '/' + row['length']] = {
+                'country': row['country'], 'origin_asn': row['origin_asn'],
+                'jumps': int(row['jumps']), 'paths': int(row['paths'])
+            }
+            self.lengths[row['version']].add(int(row['length']))
+        self.lengths = {v: sorted(lengths, reverse=True) for v, lengths in self.lengths.items()}
+        # country -> column -> ASNs, and ASN -> the (country, column) it is in
+        self.countries = {}
+        self.classes = {}
+        for row in read_rows("{dir}/country-data-{date}.csv".format(dir=source, date=date)):
+            self.countries[row['country']] = {column: row[column].split() for column in ASN_COLUMNS}
+            for column in ASN_COLUMNS:
+                for asn in row[column].split():
+                    self.classes.setdefault(asn, []).append({
+                        'country': row['country'], 'family': column[0:4], 'class': column[5:-5]
+                    })
+        # prefix -> ixp -> peers announcing it, ASN -> ixp -> roles and counts
+        self.ixps = []
+        self.ixp_prefixes = {}
+        self.ixp_ases = {}
+        self.ixp_countries = {}
+        for ixp in ixps:
+            path = input_path("{dir}/{ixp}/ixp-routing-{ixp}-{date}.csv".format(dir=source, ixp=ixp, date=date))
+            if not os.path.exists(path):
+                continue
+            self.ixps.append(ixp)
+            for peer_cc, peer_asn, origin_cc, origin_asn, ipv4, ipv6 in read_routes(path):
+                for prefix in ipv4 + ipv6:
+                    self.ixp_prefixes.setdefault(prefix, {}).setdefault(ixp, set()).add(peer_asn)
+                seen = self.ixp_ases.setdefault(origin_asn, {}).setdefault(ixp, {'origin_prefixes': 0, 'peer': False})
+                seen['origin_prefixes'] += len(ipv4) + len(ipv6)
+                self.ixp_ases.setdefault(peer_asn, {}).setdefault(ixp, {'origin_prefixes': 0, 'peer': False})['peer'] = True
+                counts = self.ixp_countries.setdefault(origin_cc, {}).setdefault(ixp, {'ipv4': 0, 'ipv6': 0})
+                counts['ipv4'] += len(ipv4)
+                counts['ipv6'] += len(ipv6)
+        self.seconds = time.time() - started
+
+    def covering(self, v, address):
+        # the most specific routed prefix covering an address
+        for length in self.lengths[v]:
+            prefix = str(ipaddress.ip_network(address + '/' + str(length), strict=False))
+            if prefix in self.prefixes:
+                return prefix
+        return None
+
+    def asn(self, asn):
+        data = self.ases.get(asn)
+        result = {'asn': asn, 'registry_cc': self.catalog.get_asn(asn), 'routed': data is not None}
+        if data is not None:
+            result.update(data)
+        result['classes'] = self.classes.get(asn, [])
+        result['ixps'] = self.ixp_ases.get(asn, {})
+        return result
+
+    def registry_cc(self, v, prefix):
+        # get_pfx remembers the last prefix, which threads must not share
+        start, end = prefix_range(v, prefix)
+        return self.catalog.ranges[v].get(start, end, self.catalog.default)
+
+    def prefix(self, prefix):
+        v = 'ipv4' if '.' in prefix else 'ipv6'
+        if '/' not in prefix:
+            result = {'address': prefix, 'registry_cc': self.registry_cc(v, prefix)}
+            covering = self.covering(v, prefix)
+            if covering is None:
+                result['routed'] = False
+                return result
+            return dict(self.prefix(covering), address=prefix)
+        data = self.prefixes.get(prefix)
+        result = {'prefix': prefix, 'registry_cc': self.registry_cc(v, prefix), 'routed': data is not None}
+        if data is not None:
+            result.update(data)
+        result['transit_ases'] = self.carriers.get(prefix, [])
+        result['ixps'] = {ixp: sorted(peers) for ixp, peers in self.ixp_prefixes.get(prefix, {}).items()}
+        return result
+
+    def country(self, cc):
+        columns = self.countries.get(cc)
+        if columns is None:
+            return None
+        return {
+            'country': cc,
+            'counts': {column: len(asns) for column, asns in columns.items()},
+            'asns': columns,
+            'ixps': self.ixp_countries.get(cc, {})
+        }
+
+    def stats(self):
+        return {
+            'date': self.date, 'ases': len(self.ases), 'prefixes': len(self.prefixes),
+            'countries': len(self.countries), 'ixps': self.ixps, 'load_seconds': round(self.seconds, 3)
+        }
+
+
+class DayCache:
+    # the indexes of the most recently queried dates; a date is loaded once
+    # even when several requests ask for it at the same time
+
+    def __init__(self, source, ixps, size=3):
+        self.source = source
+        self.ixps = ixps
+        self.size = size
+        self.days = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading = {}
+        self.hits = 0
+        self.misses = 0
+
+    def latest(self):
+        dates = [m.group(1) for m in map(DATE.match, os.listdir(self.source)) if m]
+        if not dates:
+            raise FileNotFoundError("no as-data in " + self.source)
+        return max(dates)
+
+    def get(self, date):
+        if date == 'latest':
+            date = self.latest()
+        with self.lock:
+            day = self.days.get(date)
+            if day is not None:
+                self.days.move_to_end(date)
+                self.hits += 1
+                return day
+            self.misses += 1
+            loading = self.loading.setdefault(date, threading.Lock())
+        with loading:
+            with self.lock:
+                day = self.days.get(date)
+            if day is None:
+                try:
+                    day = DayIndex(self.source, date, self.ixps)
+                finally:
+                    with self.lock:
+                        self.loading.pop(date, None)
+                with self.lock:
+                    self.days[date] = day
+                    while len(self.days) > self.size:
+                        self.days.popitem(last=False)
+        return day
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': self.size, 'hits': self.hits, 'misses': self.misses,
+                'days': [day.stats() for day in self.days.values()]
+            }
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    # GET /<date>/asn/<asn>, /<date>/prefix/<prefix or address>,
+    # /<date>/country/<cc> and /stats; <date> may be 'latest'
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately; with Nagle each keep-alive
+    # response would wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+    quiet = True
+
+    def do_GET(self):
+        started = time.perf_counter()
+        parts = unquote(self.path.split('?')[0]).strip('/').split('/', 2)
+        try:
+            status, body = 200, self.answer(parts)
+        except FileNotFoundError as e:
+            status, body = 404, {'error': str(e)}
+        except ValueError as e:
+            status, body = 400, {'error': str(e)}
+        except Exception as e:
+            # a broken table must not leave the client without a response
+            traceback.print_exc()
+            status, body = 500, {'error': "{t}: {e}".format(t=type(e).__name__, e=e)}
+        if body is None:
+            status, body = 404, {'error': 'not found'}
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('X-Elapsed-Us', str(int((time.perf_counter() - started) * 1e6)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def answer(self, parts):
+        cache = self.server.cache
+        if parts == ['stats']:
+            return cache.stats()
+        if len(parts) != 3:
+            raise ValueError("expected /<date>/<asn|prefix|country>/<key>")
+        date, kind, key = parts
+        if kind == 'asn':
+            return cache.get(date).asn(key.upper().replace('AS', ''))
+        if kind == 'prefix':
+            # the tables hold prefixes in their canonical form
+            if '/' in key:
+                key = str(ipaddress.ip_network(key, strict=False))
+            else:
+                key = str(ipaddress.ip_address(key))
+            return cache.get(date).prefix(key)
+        if kind == 'country':
+            return cache.get(date).country(key.upper())
+        raise ValueError("unknown query " + kind)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host, port, cache, quiet=True):
+    handler = type('Handler', (QueryHandler,), {'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.cache = cache
+    return server
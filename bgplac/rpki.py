@@ -0,0 +1,186 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from bgplac.delegated import host_mask, parse_prefixes
+from bgplac.summaries import FAMILIES
+from bgplac.tables import input_path, open_input
+
+
+# Route origin validation (RFC 6811) of prefix/origin pairs against the VRPs
+# (validated ROA payloads: asn, prefix, max length) of a validator export.
+# VRPs are grouped by prefix length; for each length the routes at least that
+# long are masked to it and looked up in the sorted VRP starts (covered) and
+# in sorted (start rank, asn) keys with the longest max length (matched).
+# IPv6 is compared at /64 granularity, like the delegated tables.
+REASONS = ['valid', 'invalid_asn', 'invalid_length', 'unknown']
+SUMMARY_COLUMNS = ['valid', 'invalid', 'invalid_asn', 'invalid_length', 'unknown', 'total', 'valid_pct', 'invalid_pct']
+
+
+def parse_asns(values):
+    # 'AS64500' and '64500' as integers, -1 for anything else (AS sets, ...);
+    # one joined string keeps the per-ASN work inside C
+    values = [str(value) for value in values]
+    numbers = '\n'.join(values).upper().replace('AS', '').split('\n')[:len(values)]
+    try:
+        numbers = np.array(numbers, dtype=np.int64)
+    except ValueError:
+        numbers = pd.to_numeric(pd.Series(numbers), errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+    return np.where((numbers >= 0) & (numbers < 2 ** 32), numbers, -1)
+
+
+def prefix_lengths(prefixes):
+    # unclipped, as max lengths are compared against them
+    parts = '/'.join(prefixes).split('/')
+    if len(parts) == 2 * len(prefixes):
+        return np.array(parts[1::2], dtype=np.int64)
+    return np.array([int(p.partition('/')[2] or (32 if '.' in p else 128)) for p in prefixes], dtype=np.int64)
+
+
+def is_ipv4(prefixes):
+    return np.fromiter(('.' in p for p in prefixes), dtype=bool, count=len(prefixes))
+
+
+class VrpIndex:
+
+    def __init__(self, v, starts, lengths, asns, max_lengths):
+        self.v = v
+        self.count = len(starts)
+        self.levels = []
+        for l in np.unique(lengths):
+            sel = lengths == l
+            keys = np.unique(starts[sel])
+            # AS0 VRPs only make their space covered
+            matching = sel & (asns > 0)
+            ranks = np.searchsorted(keys, starts[matching]).astype(np.uint64)
+            pairs = ranks << np.uint64(32) | asns[matching].astype(np.uint64)
+            order = np.argsort(pairs, kind='stable')
+            pairs, longest = pairs[order], max_lengths[matching][order]
+            first = np.ones(len(pairs), dtype=bool)
+            first[1:] = pairs[1:] != pairs[:-1]
+            bounds = np.flatnonzero(first)
+            longest = np.maximum.reduceat(longest, bounds) if len(bounds) else longest
+            self.levels.append((int(l), keys, pairs[first], longest))
+
+    @classmethod
+    def from_vrps(cls, v, prefixes, asns, max_lengths):
+        if len(prefixes) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(v, np.empty(0, dtype=np.uint64), empty, empty, empty)
+        return cls(v, parse_prefixes(v, prefixes)[0], prefix_lengths(prefixes), asns, max_lengths)
+
+    def __len__(self):
+        return self.count
+
+    def validate(self, starts, lengths, origins):
+        # REASONS codes of routes given by start, prefix length and origin ASN
+        covered = np.zeros(len(starts), dtype=bool)
+        matched = np.zeros(len(starts), dtype=bool)
+        valid = np.zeros(len(starts), dtype=bool)
+        for l, keys, pairs, longest in self.levels:
+            sel = np.flatnonzero(lengths >= l)
+            if len(sel) == 0:
+                continue
+            masked = starts[sel] & ~host_mask(self.v, np.full(len(sel), l))
+            ranks = np.searchsorted(keys, masked)
+            found = ranks < len(keys)
+            found[found] = keys[ranks[found]] == masked[found]
+            covered[sel] |= found
+            sel, ranks = sel[found], ranks[found]
+            origin = origins[sel]
+            known = origin > 0
+            sel, ranks, origin = sel[known], ranks[known], origin[known]
+            wanted = ranks.astype(np.uint64) << np.uint64(32) | origin.astype(np.uint64)
+            idx = np.searchsorted(pairs, wanted)
+            hit = idx < len(pairs)
+            hit[hit] = pairs[idx[hit]] == wanted[hit]
+            matched[sel[hit]] = True
+            valid[sel[hit]] |= lengths[sel[hit]] <= longest[idx[hit]]
+        result = np.full(len(starts), REASONS.index('unknown'), dtype=np.int8)
+        result[covered] = REASONS.index('invalid_asn')
+        result[covered & matched & ~valid] = REASONS.index('invalid_length')
+        result[valid] = REASONS.index('valid')
+        return result
+
+
+def vrp_path(source, date):
+    # a validator export next to the data, as CSV or JSON
+    for ext in ['csv', 'json']:
+        path = input_path("{dir}/vrps-{date}.{ext}".format(dir=source, date=date, ext=ext))
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError("no vrps-{date}.csv or vrps-{date}.json in {dir}".format(date=date, dir=source))
+
+
+def read_vrps(path):
+    # Routinator / rpki-client exports: CSV with ASN, IP Prefix and Max Length
+    # columns, or JSON with a list of {asn, prefix, maxLength} under 'roas'
+    if path.endswith('.json') or '.json.' in path:
+        with open_input(path) as f:
+            roas = json.load(f)
+        roas = roas.get('roas', roas.get('vrps', [])) if isinstance(roas, dict) else roas
+        df = pd.DataFrame({
+            'asn': [r['asn'] for r in roas], 'prefix': [r['prefix'] for r in roas],
+            'max_length': [r.get('maxLength', r.get('max_length')) for r in roas]
+        })
+    else:
+        with open_input(path) as f:
+            df = pd.read_csv(f, dtype=str, keep_default_na=False, na_filter=False, skipinitialspace=True)
+        df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+        df = df.rename(columns={'ip_prefix': 'prefix', 'maxlength': 'max_length'})[['asn', 'prefix', 'max_length']]
+    lengths = prefix_lengths(df['prefix'].tolist())
+    max_lengths = pd.to_numeric(df['max_length'], errors='coerce').to_numpy()
+    df['max_length'] = np.where(np.isnan(max_lengths), lengths, max_lengths).astype(np.int64)
+    df['asn'] = parse_asns(df['asn'])
+    df['family'] = np.where(is_ipv4(df['prefix'].tolist()), 'ipv4', 'ipv6')
+    return df
+
+
+def load_vrps(path):
+    df = read_vrps(path)
+    indexes = {}
+    for v in FAMILIES:
+        vrps = df[df['family'] == v]
+        indexes[v] = VrpIndex.from_vrps(v, vrps['prefix'].tolist(), vrps['asn'].to_numpy(), vrps['max_length'].to_numpy())
+    return indexes
+
+
+def validate_routes(indexes, prefixes, origins):
+    # REASONS codes of (prefix, origin ASN) routes, both families mixed
+    prefixes = np.asarray(prefixes, dtype=object)
+    origins = parse_asns(origins)
+    result = np.full(len(prefixes), REASONS.index('unknown'), dtype=np.int8)
+    is4 = is_ipv4(prefixes)
+    for v, sel in [('ipv4', is4), ('ipv6', ~is4)]:
+        idx = np.flatnonzero(sel)
+        if len(idx) == 0:
+            continue
+        subset = prefixes[idx].tolist()
+        result[idx] = indexes[v].validate(parse_prefixes(v, subset)[0], prefix_lengths(subset), origins[idx])
+    return result
+
+
+def states(reasons):
+    # valid / invalid / unknown
+    names = np.array(['valid', 'invalid', 'invalid', 'unknown'], dtype=object)
+    return names[reasons]
+
+
+def summarize(df, keys):
+    # per group counts of every state and reason, from a frame with a
+    # 'reason' column of REASONS codes
+    named = df.assign(reason=np.asarray(REASONS)[df['reason'].to_numpy()])
+    reasons = named.groupby(keys + ['reason']).size().unstack('reason', fill_value=0)
+    reasons = reasons.reindex(columns=REASONS, fill_value=0)
+    summary = pd.DataFrame(index=reasons.index)
+    summary['valid'] = reasons['valid']
+    summary['invalid'] = reasons['invalid_asn'] + reasons['invalid_length']
+    summary['invalid_asn'] = reasons['invalid_asn']
+    summary['invalid_length'] = reasons['invalid_length']
+    summary['unknown'] = reasons['unknown']
+    summary['total'] = reasons.sum(axis=1)
+    summary['valid_pct'] = 100 * summary['valid'] / summary['total']
+    summary['invalid_pct'] = 100 * summary['invalid'] / summary['total']
+    return summary[SUMMARY_COLUMNS].reset_index()
@@ -0,0 +1,171 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from bgplac.summaries import FAMILIES, KINDS
+
+
+# Prefixes are hashed into BUCKETS buckets and a run samples the first
+# fraction of them, so the same prefixes are kept by every run with the same
+# fraction and seed. The kept buckets are dealt into GROUPS groups for
+# delete-a-group jackknife error bounds.
+BUCKETS = 10000
+GROUPS = 10
+# jackknife standard errors added to each side of the bounds (the 95%
+# normal quantile)
+Z = 1.96
+ASN_COLUMNS = ['country', 'column', 'sampled', 'estimate', 'lower', 'upper']
+PREFIX_COLUMNS = ['country', 'family', 'metric', 'sampled', 'estimate', 'lower', 'upper']
+PREFIX_METRICS = ['prefix_count', 'prefix_length_mean', 'prefix_length_std', 'path_length_mean', 'path_count']
+
+
+class PrefixSampler:
+
+    def __init__(self, fraction, seed=0):
+        self.kept = int(round(fraction * BUCKETS))
+        if self.kept < GROUPS:
+            raise ValueError("sampling fraction below {f}".format(f=GROUPS / BUCKETS))
+        self.fraction = self.kept / BUCKETS
+        self.seed = seed
+        self.cache = {}
+
+    def bucket(self, prefix):
+        return zlib.crc32(prefix.encode(), self.seed) % BUCKETS
+
+    def keep(self, prefix):
+        kept = self.cache.get(prefix)
+        if kept is None:
+            kept = self.cache[prefix] = self.bucket(prefix) < self.kept
+        return kept
+
+    def group(self, prefix):
+        return self.bucket(prefix) % GROUPS
+
+
+def jackknife(replicates):
+    # standard error from the GROUPS delete-a-group replicates (columns)
+    deviation = replicates.sub(replicates.mean(axis=1), axis=0)
+    return np.sqrt((GROUPS - 1) / GROUPS * (deviation ** 2).sum(axis=1))
+
+
+def support_frame(as_items, pfx_values, countries, catalog, sampler):
+    # one row per (country, column, asn, sampled prefix) that put the AS in
+    # that country column, rebuilt from the AS and prefix tables
+    prefix_cc = {}
+    for values in pfx_values:
+        prefix_cc[values['prefix'] + '/' + values['length']] = values['cc']
+    countries = set(countries)
+    rows = []
+    for asn, data in as_items:
+        asn_cc = catalog.get_asn(asn)
+        for v in FAMILIES:
+            for prefix in data[v + '_prefixes']:
+                cc = prefix_cc.get(prefix)
+                if cc in countries:
+                    if asn_cc == cc:
+                        kind = 'origin'
+                    elif asn_cc == 'ZZ':
+                        kind = 'unregistered'
+                    else:
+                        kind = 'offshore'
+                    rows.append((cc, v, kind, asn, prefix))
+            for prefix in data[v + '_downstream_prefixes']:
+                cc = prefix_cc.get(prefix)
+                if cc in countries:
+                    rows.append((cc, v, 'transit' if asn_cc == cc else 'upstream', asn, prefix))
+    df = pd.DataFrame(rows, columns=['country', 'family', 'kind', 'asn', 'prefix'])
+    df['group'] = [sampler.group(prefix) for prefix in df['prefix']]
+    return df
+
+
+def richness(support, fraction):
+    # observed ASes plus two estimates of the unseen ones, where fk is the
+    # number of ASes seen in exactly k sampled prefixes. Under Bernoulli
+    # sampling of prefixes at rate q, f1^2 / (2 f2 + q / (1 - q) f1) is a
+    # lower bound of the unseen count and f1 (1 - q) / q an upper bound (exact
+    # when every AS has a single prefix)
+    index = support.index.droplevel('asn')
+    seen = (support > 0).groupby(index).sum()
+    if fraction >= 1:
+        return seen, seen.astype(float), seen.astype(float)
+    f1 = (support == 1).groupby(index).sum()
+    f2 = (support == 2).groupby(index).sum()
+    denominator = 2 * f2 + fraction / (1 - fraction) * f1
+    unseen = (f1 ** 2 / denominator.where(denominator > 0)).fillna(0)
+    return seen, seen + unseen, seen + f1 * (1 - fraction) / fraction
+
+
+def asn_estimates(support, countries, fraction):
+    # per country and column (ipv4_origin_asns, ..., total_origin_asns, ...)
+    # the ASes seen in the sample, the estimated count and its bounds: the
+    # lower and upper bound estimates widened by Z jackknife errors. Both
+    # estimates are biased (the lower one most when many ASes have a single
+    # prefix), so the bounds are not confidence intervals of a set level
+    support = support.assign(column=support['family'] + '_' + support['kind'] + '_asns')
+    totals = support.assign(column='total_' + support['kind'] + '_asns')
+    long = pd.concat([support, totals])
+    counts = long.groupby(['country', 'column', 'asn', 'group'])['prefix'].nunique().unstack('group', fill_value=0)
+    counts = counts.reindex(columns=range(GROUPS), fill_value=0)
+    total = counts.sum(axis=1)
+    sampled, estimate, ceiling = richness(total, fraction)
+    replicates = [richness(total - counts[g], fraction * (GROUPS - 1) / GROUPS) for g in range(GROUPS)]
+    error = jackknife(pd.concat([r[1].rename(g) for g, r in enumerate(replicates)], axis=1))
+    ceiling_error = jackknife(pd.concat([r[2].rename(g) for g, r in enumerate(replicates)], axis=1))
+    columns = ['total_' + k + '_asns' for k in KINDS] + [v + '_' + k + '_asns' for v in FAMILIES for k in KINDS]
+    index = pd.MultiIndex.from_product([countries, columns], names=['country', 'column'])
+    df = pd.DataFrame({
+        'sampled': sampled, 'estimate': estimate,
+        'lower': np.maximum(estimate - Z * error, sampled), 'upper': ceiling + Z * ceiling_error
+    }).reindex(index, fill_value=0).reset_index()
+    return df[ASN_COLUMNS]
+
+
+def prefix_metrics(aggregates, fraction):
+    n = aggregates['n']
+    mean = aggregates['length'] / n
+    variance = (aggregates['length_sq'] - n * mean ** 2) / (n - 1)
+    return pd.DataFrame({
+        'prefix_count': n / fraction,
+        'prefix_length_mean': mean,
+        'prefix_length_std': np.sqrt(variance.clip(lower=0)),
+        'path_length_mean': aggregates['jumps'] / aggregates['paths'],
+        'path_count': aggregates['paths'] / fraction
+    })
+
+
+def prefix_estimates(pfx_values, countries, sampler):
+    # the prefix-summary metrics per country and family, scaled to the
+    # full table where they are totals
+    rows = [
+        (values['cc'], values['version'], int(values['length']), values['jumps'], values['paths'],
+         sampler.group(values['prefix'] + '/' + values['length']))
+        for values in pfx_values if values['cc'] in countries
+    ]
+    df = pd.DataFrame(rows, columns=['country', 'family', 'length', 'jumps', 'paths', 'group'])
+    df['n'] = 1
+    df['length_sq'] = df['length'] ** 2
+    per_group = df.groupby(['country', 'family', 'group'])[['n', 'length', 'length_sq', 'jumps', 'paths']].sum()
+    full = per_group.groupby(level=['country', 'family']).sum()
+    fraction = sampler.fraction
+    sampled = prefix_metrics(full, 1)
+    estimate = prefix_metrics(full, fraction)
+    replicates = []
+    for g in range(GROUPS):
+        rest = full.sub(per_group.xs(g, level='group').reindex(full.index, fill_value=0))
+        replicates.append(prefix_metrics(rest, fraction * (GROUPS - 1) / GROUPS))
+    parts = []
+    for metric in PREFIX_METRICS:
+        error = jackknife(pd.concat([r[metric].rename(g) for g, r in enumerate(replicates)], axis=1))
+        parts.append(pd.DataFrame({
+            'metric': metric, 'sampled': sampled[metric], 'estimate': estimate[metric],
+            'lower': estimate[metric] - Z * error, 'upper': estimate[metric] + Z * error
+        }))
+    df = pd.concat(parts).reset_index()
+    df['metric'] = pd.Categorical(df['metric'], PREFIX_METRICS)
+    df = df.sort_values(['country', 'family', 'metric'], kind='stable')
+    return df[PREFIX_COLUMNS]
+
+
+def write_estimates(df, path):
+    df.to_csv(path, index=False, float_format='%.2f')
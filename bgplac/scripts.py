@@ -0,0 +1,31 @@
+import importlib.util
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_script(path):
+    # scripts have dashes in their names, so they are loaded by path
+    name = os.path.splitext(os.path.basename(path))[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+LOADED = {}
+
+
+def run_script(path, **params):
+    # calls the click command of a script in this process, with its defaults
+    # for the options not given. Scripts find regions.json and the ixp data
+    # relative to sys.path[0], so it is pointed at the script's directory
+    if path not in LOADED:
+        LOADED[path] = load_script(path)
+    command = LOADED[path].main
+    values = {p.name: p.default for p in command.params}
+    values.update(params)
+    sys.path[0] = os.path.join(ROOT, os.path.dirname(path))
+    return command.callback(**values)
@@ -0,0 +1,45 @@
+def delegated_url(date):
+    return "https://ftp.ripe.net/pub/stats/ripencc/nro-stats/{d}/combined-stat".format(d=date)
+
+
+def caida_dsdate(date):
+    # CAIDA publishes the IXP dataset quarterly
+    year = int(date[0:4])
+    month = date[4:6]
+    if year < 2019:
+        return '201810'
+    elif month in ['02', '03', '04']:
+        return str(year) + '01'
+    elif month in ['05', '06', '07']:
+        return str(year) + '04'
+    elif month in ['08', '09', '10']:
+        return str(year) + '07'
+    elif month in ['11', '12']:
+        return str(year) + '10'
+    else:
+        return str(year-1) + '10'
+
+
+def caida_ixs_url(dsdate):
+    return "https://data.caida.org/datasets/ixps/ixps_v2/ixs_" + dsdate + ".jsonl"
+
+
+def pch_url(ixp, date):
+    # the address family is filled in later with url % (v, v)
+    url = "https://www.pch.net/resources/Routing_Data/IPv%s_daily_snapshots/{year}/{month}/route-collector.{ixp}.pch.net/route-collector.{ixp}.pch.net-ipv%s_bgp_routes.{year}.{month}.{day}.gz"
+    return url.format(year=date[0:4], month=date[4:6], day=date[6:8], ixp=ixp)
+
+
+def lacnic_url(selected, date):
+    return "https://ixpdata.labs.lacnic.net/raw-data/{path}/{y}/{m}/{d}/rib.{y}{m}{d}.{t}.bz2".format(
+        path=selected['path'], y=date[0:4], m=date[4:6], d=date[6:8], t=selected['time']
+    )
+
+
+def ixp_urls(ixp, selected, date):
+    if selected['source'] == 'pch':
+        url = pch_url(ixp, date)
+        return [url % ('4', '4'), url % ('6', '6')]
+    elif selected['source'] == 'lacnic':
+        return [lacnic_url(selected, date)]
+    return []
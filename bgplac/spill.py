@@ -0,0 +1,211 @@
+import heapq
+import os
+import shutil
+import tempfile
+from itertools import groupby
+
+
+# Partial aggregates are written as sorted runs of tab separated lines and
+# merged back with a k-way merge, so a pass never holds more than one run's
+# worth of buffered lines plus one line per open run.
+MAX_FAN_IN = 128
+# rough size of one buffered set member, for the memory budget
+ENTRY_BYTES = 64
+AS_FIELDS = ['ipv4_prefixes', 'ipv4_downstream_prefixes', 'ipv6_prefixes', 'ipv6_downstream_prefixes', 'downstream_ases']
+
+
+class SortedRuns:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.runs = []
+
+    def write(self, lines):
+        # lines must already be sorted
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix='.run')
+        with os.fdopen(fd, 'w') as f:
+            for line in lines:
+                f.write(line + '\n')
+        self.runs.append(path)
+
+    def merge_runs(self, runs):
+        files = [open(path) for path in runs]
+        try:
+            for line in heapq.merge(*files):
+                yield line[:-1]
+        finally:
+            for f in files:
+                f.close()
+
+    def merge(self):
+        while len(self.runs) > MAX_FAN_IN:
+            batch, self.runs = self.runs[:MAX_FAN_IN], self.runs[MAX_FAN_IN:]
+            self.write(self.merge_runs(batch))
+            for path in batch:
+                os.remove(path)
+        return self.merge_runs(self.runs)
+
+
+class ExternalSorter:
+    # sorts lines of any number with at most limit of them in memory
+
+    def __init__(self, directory, limit):
+        self.runs = SortedRuns(directory)
+        self.limit = limit
+        self.buffer = []
+
+    def add(self, line):
+        self.buffer.append(line)
+        if len(self.buffer) >= self.limit:
+            self.buffer.sort()
+            self.runs.write(self.buffer)
+            self.buffer = []
+
+    def sorted(self):
+        if self.buffer:
+            self.buffer.sort()
+            self.runs.write(self.buffer)
+            self.buffer = []
+        return self.runs.merge()
+
+
+def key(line):
+    return line.partition('\t')[0]
+
+
+class MemoryBudget:
+    # shared by the databases of a run; once the entries buffered by all of
+    # them pass the limit every database spills
+
+    def __init__(self, megabytes, directory):
+        self.limit = max(1, megabytes * 2 ** 20 // ENTRY_BYTES)
+        self.used = 0
+        self.directory = directory
+        self.databases = []
+        self.spills = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def store(self, database):
+        self.databases.append(database)
+        return SpillStore(tempfile.mkdtemp(dir=self.directory), self)
+
+    def add(self, n):
+        self.used += n
+        if self.used >= self.limit:
+            for database in self.databases:
+                database.spill()
+            self.used = 0
+            self.spills += 1
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class SpillStore:
+
+    def __init__(self, directory, budget):
+        self.directory = directory
+        self.budget = budget
+        self.ases = SortedRuns(directory)
+        self.pfxs = SortedRuns(directory)
+        self.seq = 0
+        self.final_ases = None
+        self.final_pfxs = None
+        self.counts = {'ases': 0, 'pfxs': 0}
+
+    def next_seq(self):
+        self.seq += 1
+        return self.seq
+
+    def spill(self, ases, pfxs):
+        # one run per kind, each ASN's lines grouped: first-seen order and
+        # country, then the members of every set
+        def as_lines():
+            for asn in sorted(ases, key=lambda a: a + '\t'):
+                data = ases[asn]
+                yield "{a}\t0\t{s:012d}\t{c}".format(a=asn, s=data['seq'], c=data['country'])
+                for code, field in enumerate(AS_FIELDS, 1):
+                    for member in sorted(data[field]):
+                        yield "{a}\t{c}\t{m}".format(a=asn, c=code, m=member)
+
+        def pfx_lines():
+            for prefix in sorted(pfxs, key=lambda p: p + '\t'):
+                values = pfxs[prefix]
+                yield "\t".join([
+                    prefix, "{:012d}".format(values['seq']), values['version'], values['cc'], values['origin'],
+                    str(values['jumps']), str(values['paths'])
+                ])
+
+        if ases:
+            self.ases.write(as_lines())
+        if pfxs:
+            self.pfxs.write(pfx_lines())
+
+    def finish(self, ases, pfxs):
+        # merge every run and order the records as they were first seen
+        self.spill(ases, pfxs)
+        limit = self.budget.limit
+        sorter = ExternalSorter(self.directory, limit)
+        for asn, lines in groupby(self.ases.merge(), key):
+            seq, country = None, None
+            members = [[] for _ in AS_FIELDS]
+            last = None
+            for line in lines:
+                if line == last:
+                    continue
+                last = line
+                _, code, rest = line.split('\t', 2)
+                if code == '0':
+                    s, c = rest.split('\t')
+                    if seq is None or s < seq:
+                        seq, country = s, c
+                else:
+                    members[int(code) - 1].append(rest)
+            sorter.add("\t".join([seq, asn, country] + [" ".join(m) for m in members]))
+            self.counts['ases'] += 1
+        self.final_ases = self.materialize(sorter.sorted())
+        sorter = ExternalSorter(self.directory, limit)
+        for prefix, lines in groupby(self.pfxs.merge(), key):
+            first = None
+            jumps, paths = 0, 0
+            for line in lines:
+                fields = line.split('\t')
+                if first is None or fields[1] < first[1]:
+                    first = fields
+                jumps += int(fields[5])
+                paths += int(fields[6])
+            sorter.add("\t".join([first[1], prefix] + first[2:5] + [str(jumps), str(paths)]))
+            self.counts['pfxs'] += 1
+        self.final_pfxs = self.materialize(sorter.sorted())
+
+    def materialize(self, lines):
+        # one file that every writer of create_datasets can read again
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix='.final')
+        with os.fdopen(fd, 'w') as f:
+            for line in lines:
+                f.write(line + '\n')
+        return path
+
+    def as_items(self):
+        with open(self.final_ases) as f:
+            for line in f:
+                fields = line[:-1].split('\t')
+                data = {'country': fields[2]}
+                for i, field in enumerate(AS_FIELDS):
+                    data[field] = fields[3 + i].split()
+                yield fields[1], data
+
+    def pfx_values(self):
+        with open(self.final_pfxs) as f:
+            for line in f:
+                fields = line[:-1].split('\t')
+                address, _, length = fields[1].partition('/')
+                yield {
+                    'prefix': address,
+                    'length': length,
+                    'version': fields[2],
+                    'cc': fields[3],
+                    'origin': fields[4],
+                    'jumps': int(fields[5]),
+                    'paths': int(fields[6])
+                }
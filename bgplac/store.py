@@ -0,0 +1,157 @@
+import os
+import re
+import sqlite3
+
+import pandas as pd
+
+from bgplac.summaries import ASN_COLUMNS
+
+
+STORE_PATH = os.environ.get('BGPLAC_STORE', 'data/bgplac.sqlite')
+
+# dataset name -> (table, key columns); key columns are kept as text and indexed.
+# Every table also has the date, region and ixp partition columns.
+DATASETS = {
+    'country-summary': ('country_summary', ['country']),
+    'prefix-summary': ('prefix_summary', ['country']),
+    'ixp-summary': ('ixp_summary', ['country']),
+    'country-routing-stats': ('country_routing_stats', ['country']),
+    'prefix-data': ('prefix_data', ['country', 'origin_asn', 'prefix']),
+    'country-asns': ('country_asns', ['country', 'asn']),
+    'ases': ('ases', ['asn', 'cc']),
+    'as-downstream': ('as_downstream', ['asn', 'downstream_as']),
+    'as-prefixes': ('as_prefixes', ['asn', 'prefix']),
+    'country-ases-flow': ('country_ases_flow', ['origin', 'destination']),
+    'country-prefixes-flow': ('country_prefixes_flow', ['origin', 'destination']),
+    'country-origin-ases': ('country_origin_ases', ['country', 'asn']),
+    'country-transit-ases': ('country_transit_ases', ['country', 'asn']),
+    'country-upstream-ases': ('country_upstream_ases', ['asn', 'country']),
+    'country-dependency': ('country_dependency', ['country', 'asn'])
+}
+IXP_DATASETS = {
+    'ixp-routes': ('ixp_routes', ['peer_asn', 'origin_asn', 'origin_cc', 'prefix']),
+    'aspath-freq': ('ixp_aspath_freq', ['country']),
+    'prepend-freq': ('ixp_prepend_freq', []),
+    'country-coverage-items': ('ixp_coverage_items', ['value']),
+    'country-coverage-summary': ('ixp_coverage_summary', []),
+    'ixp-summary': ('ixp_peer_summary', ['country']),
+    'ixp-visibility': ('ixp_visibility', ['family', 'class'])
+}
+# wide files are loaded into the same tables as their long counterparts
+WIDE = {
+    'country-data': ['country-asns'],
+    'as-data': ['ases', 'as-downstream', 'as-prefixes'],
+    'ixp-routing': ['ixp-routes']
+}
+
+
+def connect(path=STORE_PATH):
+    con = sqlite3.connect(path)
+    con.execute('PRAGMA journal_mode=WAL')
+    con.execute('PRAGMA synchronous=NORMAL')
+    return con
+
+
+def read_dataset(path, keys, text=False):
+    # 'NA' is Namibia; key columns stay text so every table compares the same way
+    dtype = str if text else {k: str for k in keys + ['as']}
+    df = pd.read_csv(path, keep_default_na=False, na_values=[''], dtype=dtype)
+    return df.rename(columns={'as': 'asn'})
+
+
+def split_column(df, key, column, name):
+    long = df[[key, column]].copy()
+    long[column] = long[column].fillna('').astype(str).str.split()
+    long = long.explode(column).dropna(subset=[column])
+    return long.rename(columns={column: name})
+
+
+def explode_wide(name, df):
+    # the space joined cells of a wide file as the rows of its long tables
+    if name == 'country-data':
+        long = df.melt(id_vars='country', value_vars=ASN_COLUMNS, var_name='column', value_name='asns')
+        long = split_column(long, 'column', 'asns', 'asn').join(long['country'])
+        long['family'] = long['column'].str[0:4]
+        long['class'] = long['column'].str[5:-5]
+        return {'country-asns': long[['country', 'family', 'class', 'asn']]}
+    if name == 'as-data':
+        prefixes = []
+        for v in ['ipv4', 'ipv6']:
+            for column, role in [(v + '_prefixes', 'origin'), (v + '_downstream_prefixes', 'downstream')]:
+                long = split_column(df, 'asn', column, 'prefix')
+                long['family'] = v
+                long['role'] = role
+                prefixes.append(long[['asn', 'family', 'role', 'prefix']])
+        return {
+            'ases': df[['asn', 'cc']],
+            'as-downstream': split_column(df, 'asn', 'downstream_ases', 'downstream_as'),
+            'as-prefixes': pd.concat(prefixes, ignore_index=True)
+        }
+    if name == 'ixp-routing':
+        routes = []
+        for column in ['prefixes_ipv4', 'prefixes_ipv6']:
+            long = split_column(df.reset_index(), 'index', column, 'prefix').set_index('index')
+            routes.append(df[['peer_cc', 'peer_asn', 'origin_cc', 'origin_asn']].join(long, how='inner'))
+        return {'ixp-routes': pd.concat(routes).sort_index(kind='stable').reset_index(drop=True)}
+    return {}
+
+
+def table_columns(con, table):
+    return [row[1] for row in con.execute('PRAGMA table_info("{t}")'.format(t=table))]
+
+
+def append(con, table, keys, df, date, region, ixp):
+    df = df.copy()
+    df.insert(0, 'ixp', ixp)
+    df.insert(0, 'region', region)
+    df.insert(0, 'date', date)
+    existing = table_columns(con, table)
+    if existing:
+        # reloading a partition replaces it
+        con.execute('DELETE FROM "{t}" WHERE date = ? AND region = ? AND ixp = ?'.format(t=table), (date, region, ixp))
+        for column in df.columns:
+            if column not in existing:
+                con.execute('ALTER TABLE "{t}" ADD COLUMN "{c}"'.format(t=table, c=column))
+    df.to_sql(table, con, if_exists='append', index=False, chunksize=50000)
+    if not existing:
+        con.execute('CREATE INDEX IF NOT EXISTS "{t}_partition" ON "{t}" (date, region, ixp)'.format(t=table))
+        for key in keys:
+            con.execute('CREATE INDEX IF NOT EXISTS "{t}_{k}" ON "{t}" ("{k}", date)'.format(t=table, k=key))
+    return len(df)
+
+
+def find_datasets(directory, date, ixp=None):
+    # <name>-<date>.csv, or <name>-<ixp>-<date>.csv inside an ixp folder,
+    # either of them possibly compressed
+    if ixp is None:
+        pattern = re.compile(r'^(.+)-' + date + r'\.csv(\.gz|\.zst)?$')
+        known = set(DATASETS) | {'country-data', 'as-data'}
+    else:
+        pattern = re.compile(r'^(.+)-' + re.escape(ixp) + '-' + date + r'\.csv(\.gz|\.zst)?$')
+        known = set(IXP_DATASETS) | {'ixp-routing'}
+    found = {}
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            match = pattern.match(name)
+            if match and match.group(1) in known:
+                found[match.group(1)] = os.path.join(directory, name)
+    # long files win over the wide file carrying the same data
+    for wide, longs in WIDE.items():
+        if wide in found and all(name in found for name in longs):
+            del found[wide]
+    return found
+
+
+def load_directory(con, directory, date, region, ixp=None):
+    datasets = IXP_DATASETS if ixp is not None else DATASETS
+    rows = {}
+    for name, path in find_datasets(directory, date, ixp).items():
+        if name in WIDE:
+            keys = sorted({k for long in WIDE[name] for k in datasets[long][1]})
+            frames = explode_wide(name, read_dataset(path, keys, text=True))
+        else:
+            frames = {name: read_dataset(path, datasets[name][1])}
+        for long, df in frames.items():
+            table, keys = datasets[long]
+            rows[table] = append(con, table, keys, df, date, region, ixp or '')
+    return rows
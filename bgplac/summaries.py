@@ -0,0 +1,64 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+
+FAMILIES = ['ipv4', 'ipv6']
+KINDS = ['origin', 'transit', 'upstream', 'unregistered', 'offshore']
+ASN_COLUMNS = [v + '_' + k + '_asns' for v in FAMILIES for k in KINDS]
+SUMMARY_COLUMNS = ['total_' + k + '_asns' for k in KINDS] + ASN_COLUMNS + ['total_local_asns']
+
+
+def read_country_data(path):
+    # 'NA' is Namibia, and empty ASN lists must stay empty strings
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_filter=False)
+
+
+def explode_country_data(df):
+    # one row per (country, family, kind, asn) from the space joined columns
+    long = df.melt(id_vars='country', value_vars=ASN_COLUMNS, var_name='column', value_name='asn')
+    long['asn'] = long['asn'].str.split()
+    long = long.explode('asn').dropna(subset=['asn'])
+    return long_form(long['country'].to_numpy(), long['column'].to_numpy(), long['asn'].to_numpy())
+
+
+def read_country_asns(path):
+    # the long country-asns table written by process-ribs.py --layout long
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, na_filter=False)
+    column = df['family'] + '_' + df['class'] + '_asns'
+    return long_form(df['country'].to_numpy(), column.to_numpy(), df['asn'].to_numpy())
+
+
+def database_to_long(countries):
+    # same long form straight from RoutingDatabase.countries
+    sizes = [(cc, column, len(asns)) for cc, values in countries.items() for column, asns in values.items()]
+    cc = np.repeat([s[0] for s in sizes], [s[2] for s in sizes])
+    column = np.repeat([s[1] for s in sizes], [s[2] for s in sizes])
+    asn = list(chain.from_iterable(asns for values in countries.values() for asns in values.values()))
+    return long_form(cc, column, np.array(asn, dtype=object))
+
+
+def long_form(country, column, asn):
+    column = pd.Series(column, dtype=str)
+    return pd.DataFrame({
+        'country': country,
+        'column': column.to_numpy(),
+        'kind': column.str[5:-5].to_numpy(),
+        'asn': asn
+    })
+
+
+def summarize_countries(long, countries):
+    per_family = long.groupby(['country', 'column'])['asn'].nunique().unstack()
+    total = long.groupby(['country', 'kind'])['asn'].nunique().unstack()
+    total.columns = ['total_' + k + '_asns' for k in total.columns]
+    local = long[long['kind'].isin(['origin', 'transit'])].groupby('country')['asn'].nunique()
+    counts = pd.concat([total, per_family, local.rename('total_local_asns')], axis=1)
+    summary = counts.reindex(index=pd.Index(countries, name='country'), columns=SUMMARY_COLUMNS)
+    return summary.fillna(0).astype(np.int64)
+
+
+def write_country_summary(summary, path):
+    # same bytes as the csv.writer based summary
+    summary.to_csv(path, index_label='country', lineterminator='\r\n')
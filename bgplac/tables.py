@@ -0,0 +1,148 @@
+import csv
+import gzip
+import io
+import os
+import queue
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# wide: one row per entity with space joined set columns (the original files)
+# long: normalized edge tables, one row per set member
+LAYOUTS = ['wide', 'long', 'both']
+
+# compressed tables get the extension appended (.csv.gz, .csv.zst); zstd
+# needs the optional zstandard package
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+COMPRESSIONS = ['none', 'gzip'] + (['zstd'] if zstandard is not None else [])
+BATCH_SIZE = 1 << 20
+
+
+def writes_wide(layout):
+    return layout in ('wide', 'both')
+
+
+def writes_long(layout):
+    return layout in ('long', 'both')
+
+
+def output_path(path, compression='none'):
+    return path + EXTENSIONS.get(compression, '')
+
+
+def input_path(path):
+    # the table as written, whichever compression it was written with
+    for candidate in [path] + [path + ext for ext in EXTENSIONS.values()]:
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+
+def open_input(path):
+    path = input_path(path)
+    if path.endswith(EXTENSIONS['gzip']):
+        return gzip.open(path, 'rt', newline='')
+    if path.endswith(EXTENSIONS['zstd']):
+        if zstandard is None:
+            raise RuntimeError(path + " needs the zstandard package")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True), newline='')
+    return open(path, newline='')
+
+
+class BackgroundWriter:
+    # text file whose writes are batched and handed to a thread that encodes,
+    # compresses and writes them, so formatting overlaps with compression and I/O
+
+    def __init__(self, path, compression='none', batch=BATCH_SIZE):
+        target = output_path(path, compression)
+        # a table written again with another compression must not leave the
+        # old variant behind for input_path to find
+        for other in [path] + [path + ext for ext in EXTENSIONS.values()]:
+            if other != target and os.path.exists(other):
+                os.remove(other)
+        self.raw = open(target, 'wb')
+        if compression == 'gzip':
+            # no timestamp, so identical tables compress to identical bytes
+            self.out = gzip.GzipFile(fileobj=self.raw, mode='wb', compresslevel=6, mtime=0)
+        elif compression == 'zstd':
+            self.out = zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(self.raw, closefd=False)
+        else:
+            self.out = self.raw
+        self.batch = batch
+        self.buffer = []
+        self.size = 0
+        self.error = None
+        self.queue = queue.Queue(maxsize=8)
+        self.thread = threading.Thread(target=self.drain, daemon=True)
+        self.thread.start()
+
+    def drain(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                return
+            if self.error is None:
+                try:
+                    self.out.write(chunk.encode('utf-8'))
+                except Exception as e:
+                    self.error = e
+
+    def flush_buffer(self):
+        if self.error is not None:
+            raise self.error
+        if self.buffer:
+            self.queue.put(''.join(self.buffer))
+            self.buffer = []
+            self.size = 0
+
+    def write(self, s):
+        self.buffer.append(s)
+        self.size += len(s)
+        if self.size >= self.batch:
+            self.flush_buffer()
+        return len(s)
+
+    def close(self):
+        # the thread is stopped and the files closed (the compressed stream
+        # with its footer) even when the thread failed; its error comes after
+        if self.thread.is_alive():
+            try:
+                self.flush_buffer()
+            finally:
+                self.queue.put(None)
+                self.thread.join()
+                try:
+                    if self.out is not self.raw:
+                        self.out.close()
+                finally:
+                    self.raw.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_table(path, header, rows, compression='none'):
+    # rows is usually a generator, so members are written as they are produced
+    count = 0
+    with BackgroundWriter(path, compression) as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def family(prefix):
+    if '.' in prefix:
+        return 'ipv4'
+    return 'ipv6'
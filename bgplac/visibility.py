@@ -0,0 +1,125 @@
+import numpy as np
+
+from bgplac.delegated import host_mask, parse_prefixes
+
+
+# Prefixes are kept as sorted start/end/length arrays per family (IPv6 at /64
+# granularity, like the delegated tables). Two CIDR prefixes are either nested
+# or disjoint, so every query is a few searchsorted calls per prefix length.
+CLASSES = ['exact', 'more_specific', 'less_specific', 'uncovered']
+
+
+def contains(sorted_values, values):
+    idx = np.searchsorted(sorted_values, values)
+    found = idx < len(sorted_values)
+    found[found] = sorted_values[idx[found]] == values[found]
+    return found
+
+
+class PrefixIndex:
+
+    def __init__(self, v, starts, ends, lengths):
+        self.v = v
+        order = np.lexsort((lengths, starts))
+        starts, ends, lengths = starts[order], ends[order], lengths[order]
+        keep = np.ones(len(starts), dtype=bool)
+        keep[1:] = (starts[1:] != starts[:-1]) | (lengths[1:] != lengths[:-1])
+        self.starts, self.ends, self.lengths = starts[keep], ends[keep], lengths[keep]
+        self.by_length = {int(l): np.unique(self.starts[self.lengths == l]) for l in np.unique(self.lengths)}
+        # longest prefix starting at each distinct start
+        last = np.ones(len(self.starts), dtype=bool)
+        last[:-1] = self.starts[1:] != self.starts[:-1]
+        self.start_keys = self.starts[last]
+        self.start_longest = self.lengths[last]
+        # top level prefixes (not inside any other) cover the same space as the whole set
+        top = np.ones(len(self.starts), dtype=bool)
+        if len(self.starts) > 1:
+            top[1:] = self.ends[1:] > np.maximum.accumulate(self.ends)[:-1]
+        self.top_starts = self.starts[top]
+        self.top_ends = self.ends[top]
+        sizes = self.top_ends - self.top_starts + np.uint64(1)
+        self.top_cumsum = np.concatenate([[0], np.cumsum(sizes.astype(object))])
+
+    @classmethod
+    def from_prefixes(cls, v, prefixes):
+        if len(prefixes) == 0:
+            empty = np.empty(0, dtype=np.uint64)
+            return cls(v, empty, empty, np.empty(0, dtype=np.int64))
+        return cls(v, *parse_prefixes(v, prefixes))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def addresses(self):
+        # IPv4 addresses, or IPv6 /64s
+        return int(self.top_cumsum[-1])
+
+    def exact(self, starts, lengths):
+        found = np.zeros(len(starts), dtype=bool)
+        for l, keys in self.by_length.items():
+            sel = np.flatnonzero(lengths == l)
+            found[sel] = contains(keys, starts[sel])
+        return found
+
+    def covered(self, starts, lengths):
+        # a strictly shorter prefix of the index contains the query
+        found = np.zeros(len(starts), dtype=bool)
+        for l, keys in self.by_length.items():
+            sel = np.flatnonzero((lengths > l) & ~found)
+            if len(sel):
+                masked = starts[sel] & ~host_mask(self.v, np.full(len(sel), l))
+                found[sel] = contains(keys, masked)
+        return found
+
+    def covering(self, starts, ends, lengths):
+        # the query strictly contains a longer prefix of the index: one
+        # starting inside it after its first address, or at the same start
+        inside = np.searchsorted(self.starts, ends, side='right') - np.searchsorted(self.starts, starts, side='right')
+        idx = np.searchsorted(self.start_keys, starts)
+        same = idx < len(self.start_keys)
+        same[same] = self.start_keys[idx[same]] == starts[same]
+        longer = np.zeros(len(starts), dtype=bool)
+        longer[same] = self.start_longest[idx[same]] > lengths[same]
+        return (inside > 0) | longer
+
+    def classify(self, starts, ends, lengths):
+        result = np.full(len(starts), CLASSES.index('uncovered'), dtype=np.int8)
+        less = self.covering(starts, ends, lengths)
+        result[less] = CLASSES.index('less_specific')
+        more = self.covered(starts, lengths)
+        result[more] = CLASSES.index('more_specific')
+        result[self.exact(starts, lengths)] = CLASSES.index('exact')
+        return result
+
+    def shared_addresses(self, other):
+        # space covered by both sets: each top level prefix of self is either
+        # inside a top level prefix of other, or contains some of them
+        if len(self.top_starts) == 0 or len(other.top_starts) == 0:
+            return 0
+        idx = np.searchsorted(other.top_starts, self.top_starts, side='right') - 1
+        valid = idx >= 0
+        inside = np.zeros(len(self.top_starts), dtype=bool)
+        inside[valid] = other.top_ends[idx[valid]] >= self.top_ends[valid]
+        sizes = (self.top_ends - self.top_starts + np.uint64(1)).astype(object)
+        lo = np.searchsorted(other.top_starts, self.top_starts, side='left')
+        hi = np.searchsorted(other.top_starts, self.top_ends, side='right')
+        partial = other.top_cumsum[hi] - other.top_cumsum[lo]
+        return int(np.where(inside, sizes, partial).sum())
+
+
+def visibility(index, prefixes):
+    # per class prefix counts and address space of one family of a table
+    table = PrefixIndex.from_prefixes(index.v, prefixes)
+    classes = index.classify(table.starts, table.ends, table.lengths)
+    rows = []
+    for i, name in enumerate(CLASSES):
+        sel = classes == i
+        subset = PrefixIndex(index.v, table.starts[sel], table.ends[sel], table.lengths[sel])
+        rows.append([index.v, name, int(sel.sum()), subset.addresses()])
+    shared = table.shared_addresses(index)
+    rows.append([index.v, 'total', len(table), table.addresses()])
+    rows.append([index.v, 'global', len(index), index.addresses()])
+    rows.append([index.v, 'shared_space', '', shared])
+    rows.append([index.v, 'table_only_space', '', table.addresses() - shared])
+    rows.append([index.v, 'global_only_space', '', index.addresses() - shared])
+    return rows
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+
+import sys
+import click
+import os
+from datetime import datetime
+
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.compare import COLUMNS, diff_rows
+from bgplac.instrumentation import RunReport
+from bgplac.tables import write_table
+
+
+@click.command()
+@click.option('--date', default='00000000', help='date of calculation')
+@click.option('--full', default='data', help='directory with the datasets of a full run')
+@click.option('--reduced', required=True, help='directory with the datasets of a reduced run, where the diff is written')
+def main(date, full, reduced):
+    if date == '00000000':
+        date = datetime.today().strftime('%Y%m%d')
+    report = RunReport('compare-datasets', date)
+    print("* Comparing " + reduced + " against " + full)
+    with report.stage('compare') as st:
+        rows = list(diff_rows(full, reduced, date))
+        st.items = len(rows)
+    write_table(reduced + "/dataset-diff-" + date + ".csv", COLUMNS, rows)
+    for row in rows:
+        print("  {d} {c}: recall {r}, precision {p}, {n} changed".format(d=row[0], c=row[1], r=row[5], p=row[6], n=row[7]))
+    report.write(reduced)
+    print("- DONE!")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 
 
+import sys
 import click
 import csv
+import os
 import pandas as pd
 from datetime import datetime
 
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.instrumentation import RunReport
+
 
 @click.command()
 @click.option('--date', default='00000000', help='date of calculation')
@@ -14,10 +19,12 @@ def main(date, source):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
 
+    report = RunReport('get-routing-stats', date)
     print("* Procesing routing stats")
-    csm_df = pd.read_csv(source + "/country-summary-" + date + ".csv", index_col='country')
-    pfx_df = pd.read_csv(source + "/prefix-summary-" + date + ".csv", index_col='country')
-    ixp_df = pd.read_csv(source + "/ixp-summary-" + date + ".csv", index_col='country')
+    with report.stage('parse'):
+        csm_df = pd.read_csv(source + "/country-summary-" + date + ".csv", index_col='country')
+        pfx_df = pd.read_csv(source + "/prefix-summary-" + date + ".csv", index_col='country')
+        ixp_df = pd.read_csv(source + "/ixp-summary-" + date + ".csv", index_col='country')
 
     pfc4 = pfx_df['prefix_count_ipv4']
     pfc6 = pfx_df['prefix_count_ipv6']
@@ -37,7 +44,9 @@ def main(date, source):
         'ixp_count': ixp_df['ixp_count']
     }
     result = pd.DataFrame(frame)
-    result.to_csv(source + "/country-routing-stats-" + date + ".csv", index_label='country', float_format='%.2f')
+    with report.stage('write'):
+        result.to_csv(source + "/country-routing-stats-" + date + ".csv", index_label='country', float_format='%.2f')
+    report.write(source)
     print("- DONE!")
 
 
@@ -6,38 +6,18 @@ import csv
 import json
 import sys
 import os
-import pytricia
+import numpy as np
 import pandas as pd
 import urllib.request
 from datetime import datetime
 
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.delegated import load_delegated
+from bgplac.instrumentation import RunReport
+from bgplac.tables import open_input
 
-csv.field_size_limit(sys.maxsize)
-
-
-class ResourceCatalog:
-
-    def __init__(self):
-        self.ptree = {
-            'ipv4': pytricia.PyTricia(32),
-            'ipv6': pytricia.PyTricia(128)
-        }
-        self.ases = {}
-
-    def add_pfx(self, v, address, length, data):
-        self.ptree[v].insert(address, length, data)
 
-    def get_pfx(self, v, address):
-        return self.ptree[v].get(address)
-
-    def add_asn(self, asn, cc):
-        self.ases[asn] = cc
-
-    def get_asn(self, asn):
-        if asn in self.ases:
-            return self.ases[asn]
-        else:
-            return 'ZZ'
+csv.field_size_limit(sys.maxsize)
 
 
 class RegionCatalog:
@@ -105,35 +85,38 @@ class AsesDatabase:
             self.upstream_ases[asn][country] = set([ds_as])
 
 
-def load_delegated(path):
-    catalog = ResourceCatalog()
-    print("* Retrieving delegated from " + path)
-    with open(path, 'r', newline='') as content:
-        print("* Procesing delegated")
-        for line in content:
-            row = line.split('|')
-            if row[0] not in ['afrinic', 'apnic', 'arin', 'lacnic', 'ripencc']:
-                continue
-            if row[2] == 'asn':
-                if row[1] != 'ZZ':
-                    count = int(row[4])
-                    start = int(row[3])
-                    for i in range(count):
-                        catalog.add_asn(str(start + i), row[1])
-            elif row[2] == 'ipv4':
-                catalog.add_pfx('ipv4', row[3], 33 - int(row[4]).bit_length(), row[1])
-            elif row[2] == 'ipv6':
-                catalog.add_pfx('ipv6', row[3], int(row[4]), row[1])
-    print("- DONE!")
-    return catalog
-
-def process_ases(path, res_catalog, reg_catalog, region):
+def add_prefix_flows(result, rows, res_catalog, countries):
+    # resolves the downstream prefixes of a chunk of rows with one batch per
+    # family, then records the flows in the same order as a per-prefix loop
+    dst_ccs = np.array([row['cc'] for row in rows], dtype=str)
+    owners = []
+    matches = []
+    for v in ['ipv4', 'ipv6']:
+        pfxs = [p for row in rows for p in row[v]]
+        pfx_owners = np.repeat(np.arange(len(rows)), [len(row[v]) for row in rows])
+        # unresolved prefixes come back as 'None', which is never a country
+        ccs = res_catalog.get_pfxs(v, pfxs).astype(str)
+        keep = np.flatnonzero(np.isin(ccs, countries) & (ccs != dst_ccs[pfx_owners])).tolist()
+        owners.append(pfx_owners[keep])
+        ccs = ccs.tolist()
+        matches += [(pfxs[i], ccs[i]) for i in keep]
+    owners = np.concatenate(owners)
+    for i in np.argsort(owners, kind='stable').tolist():
+        pfx, src_cc = matches[i]
+        result.add_pfx_flow(src_cc, rows[owners[i]]['rir'], pfx)
+
+def process_ases(path, res_catalog, reg_catalog, region, report=None, chunk_size=200000):
+    if report is None:
+        report = RunReport('process-as-data', '')
     result = AsesDatabase(reg_catalog, region)
     countries = reg_catalog.regions[region]
     print("* Procesing ASes from " + path)
-    with open(path, newline='') as f1:
+    with open_input(path) as f1, report.stage('aggregate') as st:
         reader = csv.DictReader(f1, delimiter=',', quoting=csv.QUOTE_NONE)
+        rows = []
+        pending = 0
         for row in reader:
+            st.items += 1
             dst_asn = row['as']
             if dst_asn not in result.upstream_ases:
                 result.upstream_ases[dst_asn] = {}
@@ -147,18 +130,22 @@ def process_ases(path, res_catalog, reg_catalog, region):
                     else:
                         result.add_as_flow(src_cc, dst_rir, src_asn)
                         result.add_upstream_as(src_cc, dst_asn, src_asn)
-            for ipv4 in row['ipv4_downstream_prefixes'].split():
-                src_cc = res_catalog.get_pfx('ipv4', ipv4)
-                if src_cc in countries and src_cc != dst_cc:
-                    result.add_pfx_flow(src_cc, dst_rir, ipv4)
-            for ipv6 in row['ipv6_downstream_prefixes'].split():
-                src_cc = res_catalog.get_pfx('ipv6', ipv6)
-                if src_cc in countries and src_cc != dst_cc:
-                    result.add_pfx_flow(src_cc, dst_rir, ipv6)
+            rows.append({
+                'cc': dst_cc,
+                'rir': dst_rir,
+                'ipv4': row['ipv4_downstream_prefixes'].split(),
+                'ipv6': row['ipv6_downstream_prefixes'].split()
+            })
+            pending += len(rows[-1]['ipv4']) + len(rows[-1]['ipv6'])
+            if pending >= chunk_size:
+                add_prefix_flows(result, rows, res_catalog, countries)
+                rows = []
+                pending = 0
             if dst_cc in countries:
                 pfxcount = len(row['ipv4_prefixes'].split()) + len(row['ipv6_prefixes'].split())
                 if pfxcount > 0:
                     result.origin_ases[dst_cc][dst_asn] = pfxcount
+        add_prefix_flows(result, rows, res_catalog, countries)
     return result
 
 def create_datasets(ts, source, result):
@@ -201,10 +188,15 @@ def create_datasets(ts, source, result):
 def main(date, source, region):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
+    report = RunReport('process-as-data', date, region=region)
     regn_cat = RegionCatalog()
-    numb_cat = load_delegated(source + '/delegated-' + date + '.csv')
-    result = process_ases(source + '/as-data-' + date + '.csv', numb_cat, regn_cat, region)
-    create_datasets(date, source, result)
+    with report.stage('parse') as st:
+        numb_cat = load_delegated(source + '/delegated-' + date + '.csv')
+        st.items = len(numb_cat)
+    result = process_ases(source + '/as-data-' + date + '.csv', numb_cat, regn_cat, region, report)
+    with report.stage('write'):
+        create_datasets(date, source, result)
+    report.write(source)
 
 if __name__ == '__main__':
     main()
@@ -1,63 +1,60 @@
 #!/usr/bin/env python3
 
 
+import sys
 import click
-import csv
+import json
+import os
 from datetime import datetime
 
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.instrumentation import RunReport
+from bgplac.summaries import explode_country_data, read_country_asns, read_country_data, summarize_countries, write_country_summary
+from bgplac.tables import input_path
+
+
+def load_countries(region):
+    with open(os.path.join(sys.path[0], '../regions.json')) as json_file:
+        data = json.load(json_file)
+        if region in data:
+            return data[region]
+    return []
+
 
 @click.command()
 @click.option('--date', default='00000000', help='date of calculation')
 @click.option('--source', default='data', help='directory where the data is stored')
-def main(date, source):
+@click.option('--layout', type=click.Choice(['wide', 'long']), default='wide', help='read country-data or the long country-asns table')
+@click.option('--region', default='lacnic', help='countries listed by the long layout. see regions.json')
+def main(date, source, layout, region):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
-    inpath = source + "/country-data-" + date + ".csv"
+    if layout == 'long':
+        inpath = input_path(source + "/country-asns-" + date + ".csv")
+    else:
+        inpath = input_path(source + "/country-data-" + date + ".csv")
     outpath = source + "/country-summary-" + date + ".csv"
+    report = RunReport('process-country-data', date)
     print("* Procesing countries from " + inpath)
-    with open(inpath, newline='') as infile, open(outpath, 'w', newline='') as outfile:
-        rdr = csv.DictReader(infile)
-        wrt = csv.writer(outfile)
-        wrt.writerow([
-            "country",
-            "total_origin_asns", "total_transit_asns", "total_upstream_asns", "total_unregistered_asns", "total_offshore_asns",
-            "ipv4_origin_asns", "ipv4_transit_asns", "ipv4_upstream_asns", "ipv4_unregistered_asns", "ipv4_offshore_asns",
-            "ipv6_origin_asns", "ipv6_transit_asns", "ipv6_upstream_asns", "ipv6_unregistered_asns", "ipv6_offshore_asns",
-            "total_local_asns"
-        ])
-        for row in rdr:
-            ipv4_orgs = row["ipv4_origin_asns"].split()
-            ipv4_trns = row["ipv4_transit_asns"].split()
-            ipv4_upss = row["ipv4_upstream_asns"].split()
-            ipv4_unrs = row["ipv4_unregistered_asns"].split()
-            ipv4_offs = row["ipv4_offshore_asns"].split()
-            ipv6_orgs = row["ipv6_origin_asns"].split()
-            ipv6_trns = row["ipv6_transit_asns"].split()
-            ipv6_upss = row["ipv6_upstream_asns"].split()
-            ipv6_unrs = row["ipv6_unregistered_asns"].split()
-            ipv6_offs = row["ipv6_offshore_asns"].split()
-            total_orgs = set().union(ipv4_orgs, ipv6_orgs)
-            total_trns = set().union(ipv4_trns, ipv6_trns)
-            wrt.writerow([
-                row["country"],
-                len(total_orgs),
-                len(total_trns),
-                len(set().union(ipv4_upss, ipv6_upss)),
-                len(set().union(ipv4_unrs, ipv6_unrs)),
-                len(set().union(ipv4_offs, ipv6_offs)),
-                len(ipv4_orgs),
-                len(ipv4_trns),
-                len(ipv4_upss),
-                len(ipv4_unrs),
-                len(ipv4_offs),
-                len(ipv6_orgs),
-                len(ipv6_trns),
-                len(ipv6_upss),
-                len(ipv6_unrs),
-                len(ipv6_offs),
-                len(total_orgs.union(total_trns))
-            ])
-        print("- DONE!")
+    with report.stage('parse') as st:
+        if layout == 'long':
+            # countries without ASNs have no rows in the long table
+            long = read_country_asns(inpath)
+            countries = load_countries(region)
+        else:
+            df = read_country_data(inpath)
+            countries = df['country'].tolist()
+            long = None
+        st.items = len(countries)
+    with report.stage('aggregate') as st:
+        if long is None:
+            long = explode_country_data(df)
+        summary = summarize_countries(long, countries)
+        st.items = len(long)
+    with report.stage('write'):
+        write_country_summary(summary, outpath)
+    report.write(source)
+    print("- DONE!")
 
 
 if __name__ == '__main__':
@@ -6,70 +6,60 @@ import click
 import json
 import csv
 import os
-import urllib.request
 from datetime import datetime
-import ssl
 
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.instrumentation import RunReport
+from bgplac.ixps import ixp_count, load_ixp_index
+from bgplac.sources import caida_dsdate
 
-def load_countries(region):
+
+def load_regions(region):
     with open(os.path.join(sys.path[0], '../regions.json')) as json_file:
         data = json.load(json_file)
-        if region in data:
-            return data[region]
-    return []
+    if region == 'all':
+        return data
+    if region in data:
+        return {region: data[region]}
+    return {region: []}
+
+
+def write_summary(outpath, countries, index):
+    with open(outpath, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["country", "ixp_count"])
+        for c in countries:
+            writer.writerow([
+                c,
+                ixp_count(index, c)
+            ])
 
 
 @click.command()
 @click.option('--date', default='00000000', help='date of calculation')
 @click.option('--source', default='data', help='directory where the data is stored')
-@click.option('--region', default='lacnic', help='region to analize. see regions.json')
+@click.option('--region', default='lacnic', help='region to analize. see regions.json. all writes every region to <source>/<region>')
 def main(date, source, region):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
-    outpath = source + "/ixp-summary-" + date + ".csv"
-    countries = load_countries(region)
-    db = {}
-    for c in countries:
-        db[c] = {
-            'ixp_count': 0
-        }
-    with open(outpath, 'w', newline='') as outfile:
-        year = int(date[0:4])
-        month = date[4:6]
-        if year < 2019:
-            dsdate = '201810'
-        elif month in ['02', '03', '04']:
-            dsdate = str(year) + '01'
-        elif month in ['05', '06', '07']:
-            dsdate = str(year) + '04'
-        elif month in ['08', '08', '10']:
-            dsdate = str(year) + '07'
-        elif month in ['11', '12']:
-            dsdate = str(year) + '10'
-        else:
-            dsdate = str(year-1) + '10'
-        print("* Retrieving IXP data from " + dsdate)
-        url = "https://data.caida.org/datasets/ixps/ixps_v2/ixs_" + dsdate + ".jsonl"
-        content = urllib.request.urlopen(url)
-        print("* Processing IXP dataset")
-        for l in content:
-            line = l.decode('utf-8')
-            if line[0] != '#':
-                obj = json.loads(line)
-                if 'country' in obj:
-                    cc = obj['country']
-                    sources = obj['sources']
-                    if cc in countries and 'pch' in sources:
-                        db[cc]['ixp_count'] += 1
-                        # print(cc, obj['name'], obj['ix_id'], obj['sources'])
-        writer = csv.writer(outfile)
-        writer.writerow(["country", "ixp_count"])
-        for prefix, values in db.items():
-            writer.writerow([
-                prefix,
-                values["ixp_count"]
-            ])
-        print("- DONE!")
+    report = RunReport('process-ixp-data', date, region=region)
+    regions = load_regions(region)
+    dsdate = caida_dsdate(date)
+    print("* Retrieving IXP data from " + dsdate)
+    with report.stage('parse') as st:
+        index = load_ixp_index(source, dsdate, st)
+    print("* Processing IXP dataset")
+    with report.stage('write') as st:
+        for rir, countries in regions.items():
+            if region == 'all':
+                os.makedirs(source + "/" + rir, exist_ok=True)
+                outpath = source + "/" + rir + "/ixp-summary-" + date + ".csv"
+            else:
+                outpath = source + "/ixp-summary-" + date + ".csv"
+            write_summary(outpath, countries, index)
+            st.items += len(countries)
+    report.write(source)
+    print("- DONE!")
 
 
 if __name__ == '__main__':
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 
 
+import sys
 import click
 import csv
+import os
 import pandas as pd
 from datetime import datetime
 
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.instrumentation import RunReport
+from bgplac.tables import input_path
+
 
 @click.command()
 @click.option('--date', default='00000000', help='date of calculation')
@@ -13,22 +19,28 @@ from datetime import datetime
 def main(date, source):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
-    inpath = source + "/prefix-data-" + date + ".csv"
+    inpath = input_path(source + "/prefix-data-" + date + ".csv")
+    report = RunReport('process-prefix-data', date)
     print("* Procesing prefixes from " + inpath)
-    pfx_df = pd.read_csv(inpath)
-    gr = pfx_df.groupby(['country', 'version'])
-    frame = {
-        'prefix_count': gr['prefix'].count(),
-        'prefix_length_mean': gr['length'].mean(),
-        'prefix_length_std': gr['length'].std(),
-        'path_length_mean': gr['jumps'].sum() / gr['paths'].sum(),
-        'path_count': gr['paths'].sum()
-    }
-    df = pd.DataFrame(frame)
-    dipv4 = df.xs('ipv4', level='version')
-    dipv6 = df.xs('ipv6', level='version')
-    result = pd.merge(dipv4, dipv6, on='country', suffixes=["_ipv4", "_ipv6"], how='outer')
-    result.to_csv(source + "/prefix-summary-" + date + ".csv", index_label='country', float_format='%.2f')
+    with report.stage('parse') as st:
+        pfx_df = pd.read_csv(inpath)
+        st.items = len(pfx_df)
+    with report.stage('aggregate'):
+        gr = pfx_df.groupby(['country', 'version'])
+        frame = {
+            'prefix_count': gr['prefix'].count(),
+            'prefix_length_mean': gr['length'].mean(),
+            'prefix_length_std': gr['length'].std(),
+            'path_length_mean': gr['jumps'].sum() / gr['paths'].sum(),
+            'path_count': gr['paths'].sum()
+        }
+        df = pd.DataFrame(frame)
+        dipv4 = df.xs('ipv4', level='version')
+        dipv6 = df.xs('ipv6', level='version')
+        result = pd.merge(dipv4, dipv6, on='country', suffixes=["_ipv4", "_ipv6"], how='outer')
+    with report.stage('write'):
+        result.to_csv(source + "/prefix-summary-" + date + ".csv", index_label='country', float_format='%.2f')
+    report.write(source)
     print("- DONE!")
 
 
@@ -3,44 +3,37 @@
 
 import sys
 import click
-import pytricia
 import pybgpstream
 import csv
 import json
 import os
 import urllib.request
 from datetime import datetime
+from sys import intern
 
-
-class ResourceCatalog:
-
-    def __init__(self):
-        self.ptree = {
-            'ipv4': pytricia.PyTricia(32),
-            'ipv6': pytricia.PyTricia(128)
-        }
-        self.ases = {}
-
-    def add_pfx(self, v, address, length, data):
-        self.ptree[v].insert(address, length, data)
-
-    def get_pfx(self, v, address):
-        return self.ptree[v].get(address)
-
-    def add_asn(self, asn, cc):
-        self.ases[asn] = cc
-
-    def get_asn(self, asn):
-        if asn in self.ases:
-            return self.ases[asn]
-        else:
-            return 'ZZ'
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.anomalies import KINDS, AnomalyLog
+from bgplac.delegated import load_delegated
+from bgplac.dependency import DependencyBuilder, write_dependency
+from bgplac.graph import GraphBuilder, graph_path
+from bgplac.instrumentation import RunReport
+from bgplac.paths import PathStore, path_stat_rows
+from bgplac.peers import PeerProfile, peer_of, read_selection, selection, write_profile
+from bgplac.sampling import PrefixSampler, asn_estimates, prefix_estimates, support_frame, write_estimates
+from bgplac.spill import MemoryBudget
+from bgplac.summaries import database_to_long, summarize_countries, write_country_summary
+from bgplac.tables import COMPRESSIONS, LAYOUTS, BackgroundWriter, family, write_table, writes_long, writes_wide
 
 
 class RoutingDatabase:
 
-    def __init__(self, countries_list, catalog):
-        self.anomalies = []
+    def __init__(self, countries_list, catalog, paths=None, anomalies=None, budget=None):
+        self.anomalies = AnomalyLog() if anomalies is None else anomalies
+        self.paths = PathStore() if paths is None else paths
+        self.classified = []
+        self.reclassified = {}
+        # with a memory budget, ases and pfxs are spilled to sorted runs
+        self.runs = budget.store(self) if budget is not None else None
         self.ases = {}
         self.countries = {}
         self.resources = catalog
@@ -59,9 +52,6 @@ class RoutingDatabase:
             }
         self.pfxs = {}
 
-    def add_anomaly(self, pfx, path):
-        self.anomalies.append(pfx + '|' + ' '.join(path))
-
     def add_prefix_to_as(self, asn, cc, pfx, origin, v, prevs):
         if asn not in self.ases:
             self.ases[asn] = {
@@ -72,31 +62,32 @@ class RoutingDatabase:
                 'ipv6_downstream_prefixes': set([]),
                 'downstream_ases': set([])
             }
+            if self.runs is not None:
+                self.ases[asn]['seq'] = self.runs.next_seq()
         self.ases[asn]['downstream_ases'] |= prevs
         if origin:
             self.ases[asn][v + '_prefixes'].add(pfx)
         else:
             self.ases[asn][v + '_downstream_prefixes'].add(pfx)
 
-    def add_path(self, prefix, prefix_cc, path, v):
+    def classify(self, prefix_cc, path, v):
+        # the ASes a path adds the prefix to, flattened as asn, cc, ... from
+        # the origin up, after adding them to the country sets. Empty for
+        # paths without a numeric origin
         origin = path[-1]
         if not origin.isdigit():
             origin = origin[1:-1]
-            path[-1] = origin
             if not origin.isdigit():
-                self.add_anomaly(prefix, path)
-                return
+                return ()
         origin_cc = self.resources.get_asn(origin)
-        self.add_prefix_to_as(origin, origin_cc, prefix, True, v, set([]))
+        hops = [origin, origin_cc]
         if origin_cc == prefix_cc:
             self.countries[prefix_cc][v + '_origin_asns'].add(origin)
             prevs = set([origin])
             for asn in path[-2:0:-1]:
-                if not asn.isdigit():
-                    self.add_anomaly(prefix, path)
                 if asn not in prevs:
                     asn_cc = self.resources.get_asn(asn)
-                    self.add_prefix_to_as(asn, asn_cc, prefix, False, v, prevs)
+                    hops += [asn, asn_cc]
                     if asn_cc == prefix_cc:
                         self.countries[prefix_cc][v + '_transit_asns'].add(asn)
                     else:
@@ -108,6 +99,37 @@ class RoutingDatabase:
                 self.countries[prefix_cc][v + '_unregistered_asns'].add(origin)
             else:
                 self.countries[prefix_cc][v + '_offshore_asns'].add(origin)
+        return tuple(hops)
+
+    def classification(self, pid, prefix_cc, path, v):
+        # classify is run once per path, country and family: the first
+        # country and family of a path are kept in a list indexed by its id,
+        # any other in a dict
+        if pid >= len(self.classified):
+            self.classified.extend([None] * (pid + 1 - len(self.classified)))
+        entry = self.classified[pid]
+        if entry is None:
+            entry = self.classified[pid] = (prefix_cc, v) + self.classify(prefix_cc, path, v)
+        elif entry[0] != prefix_cc or entry[1] != v:
+            key = (pid, prefix_cc, v)
+            entry = self.reclassified.get(key)
+            if entry is None:
+                entry = self.reclassified[key] = (prefix_cc, v) + self.classify(prefix_cc, path, v)
+        return entry
+
+    def add_path(self, prefix, prefix_cc, path, v, pid=None):
+        if pid is None:
+            pid = self.paths.add(' '.join(path), path)
+        self.anomalies.check_path(prefix, path, pid)
+        # a repeated path only adds the prefix to the ASes it reaches
+        entry = self.classification(pid, prefix_cc, path, v)
+        if len(entry) == 2:
+            return
+        prevs = set()
+        for i in range(2, len(entry), 2):
+            self.add_prefix_to_as(entry[i], entry[i + 1], prefix, i == 2, v, prevs)
+            prevs.add(entry[i])
+        origin = entry[2]
         # pfx db
         if prefix in self.pfxs:
             self.pfxs[prefix]['jumps'] += len(path)
@@ -119,10 +141,41 @@ class RoutingDatabase:
                 'length': add_len[1],
                 'version': v,
                 'cc': prefix_cc,
-                'origin': path[-1],
+                'origin': origin,
                 'jumps': len(path),
                 'paths': 1
             }
+            if self.runs is not None:
+                self.pfxs[prefix]['seq'] = self.runs.next_seq()
+        if self.runs is not None:
+            self.runs.budget.add(len(path) + 1)
+
+    def spill(self):
+        self.runs.spill(self.ases, self.pfxs)
+        self.ases = {}
+        self.pfxs = {}
+
+    def finish(self):
+        # merges the spilled runs; ases and pfxs are then read with as_items and pfx_values
+        if self.runs is not None:
+            self.runs.finish(self.ases, self.pfxs)
+            self.ases = {}
+            self.pfxs = {}
+
+    def as_items(self):
+        if self.runs is not None:
+            return self.runs.as_items()
+        return self.ases.items()
+
+    def pfx_values(self):
+        if self.runs is not None:
+            return self.runs.pfx_values()
+        return self.pfxs.values()
+
+    def sizes(self):
+        if self.runs is not None:
+            return self.runs.counts['pfxs'], self.runs.counts['ases']
+        return len(self.pfxs), len(self.ases)
 
 
 def load_countries(region):
@@ -132,81 +185,144 @@ def load_countries(region):
             return data[region]
     return []
 
-def load_delegated(path):
-    catalog = ResourceCatalog()
-    print("* Retrieving delegated from " + path)
-    with open(path, 'r', newline='') as content:
-        print("* Processing delegated")
-        for line in content:
-            row = line.split('|')
-            if row[0] not in ['afrinic', 'apnic', 'arin', 'lacnic', 'ripencc']:
-                continue
-            if row[2] == 'asn':
-                if row[1] != 'ZZ':
-                    count = int(row[4])
-                    start = int(row[3])
-                    for i in range(count):
-                        catalog.add_asn(str(start + i), row[1])
-            elif row[2] == 'ipv4':
-                catalog.add_pfx('ipv4', row[3], 33 - int(row[4]).bit_length(), row[1])
-            elif row[2] == 'ipv6':
-                catalog.add_pfx('ipv6', row[3], int(row[4]), row[1])
-    return catalog
-
-def process_ribs(ts, collectors, countries, catalog):
+def load_regions(region):
+    with open(os.path.join(sys.path[0], '../regions.json')) as json_file:
+        data = json.load(json_file)
+    if region == 'all':
+        return data
+    return {region: load_countries(region)}
+
+def process_ribs(ts, collectors, countries, catalog, report=None):
+    return process_regions(ts, collectors, {None: countries}, catalog, report)[None]
+
+class FileStream:
+    # local RIB dumps read one after the other, in place of the broker
+
+    def __init__(self, files):
+        self.files = files
+
+    def records(self):
+        for path in self.files:
+            stream = pybgpstream.BGPStream(data_interface="singlefile")
+            stream.set_data_interface_option("singlefile", "rib-file", path)
+            for rec in stream.records():
+                yield rec
+
+def open_stream(ts, collectors, files=None):
+    if files:
+        return FileStream(files)
     date = ts[0:4] + '-' + ts[4:6] + '-' + ts[6:8]
-    print("* Processing RIBs from " + ts + " (" + ", ".join(collectors) + ")")
-    computed_lines = 0
-    stream = pybgpstream.BGPStream(
+    return pybgpstream.BGPStream(
         from_time=date+" 07:50:00", until_time=date+" 08:10:00",
         collectors=collectors,
         record_type="ribs",
     )
-    result = RoutingDatabase(countries, catalog)
-    for rec in stream.records():
-        for elem in rec:
-            prefix = elem.fields["prefix"]
-            path = elem.fields["as-path"].split()
-            if '.' in prefix:
-                v = 'ipv4'
-            else:
-                v = 'ipv6'
-            prefix_cc = catalog.get_pfx(v, prefix)
-            if prefix_cc in countries:
-                result.add_path(prefix, prefix_cc, path, v)
-            computed_lines += 1
-            if computed_lines % 1000 == 0:
-                print('\r* ' + str(computed_lines) + " rows computed", end="", flush=True)
+
+def profile_peers(ts, collectors, report, files=None):
+    # pre-pass: table size and route sketch of every peer
+    print("* Profiling peers from " + ts + " (" + ", ".join(collectors) + ")")
+    profile = PeerProfile()
+    with report.stage('peers') as st:
+        for rec in open_stream(ts, collectors, files).records():
+            for elem in rec:
+                prefix = elem.fields["prefix"]
+                profile.add(peer_of(rec, elem), family(prefix), prefix, elem.fields["as-path"].split())
+                st.items += 1
+        st.count('peers', len(profile))
+    return profile
+
+def process_regions(ts, collectors, regions, catalog, report=None, graph=None, dependency=None, paths=None, anomalies=None, budget=None, peers=None, sampler=None, files=None, all_paths=False):
+    # one pass over the RIBs feeds a database per region; prefix and ASN
+    # strings are interned and distinct paths stored once, so the regions
+    # share them instead of copying. With peers given, only the routes of
+    # those (collector, peer_asn, peer_address, family) are processed, and
+    # with a sampler only the prefixes it keeps. Only the paths of prefixes in
+    # the regions are stored, or every path with all_paths or a graph
+    if report is None:
+        report = RunReport('process-ribs', ts)
+    print("* Processing RIBs from " + ts + " (" + ", ".join(collectors) + ")")
+    computed_lines = 0
+    stream = open_stream(ts, collectors, files)
+    if paths is None:
+        paths = PathStore()
+    all_paths = all_paths or graph is not None
+    if anomalies is None:
+        anomalies = AnomalyLog()
+    results = {}
+    databases = {}
+    for region, countries in regions.items():
+        results[region] = RoutingDatabase(countries, catalog, paths, anomalies, budget)
+        for c in countries:
+            databases[c] = results[region]
+    with report.stage('ribs') as st:
+        for rec in stream.records():
+            for elem in rec:
+                prefix = intern(elem.fields["prefix"])
+                if sampler is not None and not sampler.keep(prefix):
+                    st.count('unsampled_paths')
+                    continue
+                if '.' in prefix:
+                    v = 'ipv4'
+                else:
+                    v = 'ipv6'
+                if peers is not None and peer_of(rec, elem) + (v,) not in peers:
+                    st.count('skipped_paths')
+                    continue
+                aspath = elem.fields["as-path"]
+                path = list(map(intern, aspath.split()))
+                pid = paths.add(aspath, path) if all_paths else None
+                st.lap('parse')
+                if graph is not None:
+                    graph.add_path(prefix, path, v, pid)
+                    st.lap('graph')
+                prefix_cc = catalog.get_pfx(v, prefix)
+                st.lap('lookup')
+                if prefix_cc in databases:
+                    if pid is None:
+                        pid = paths.add(aspath, path)
+                    if dependency is not None:
+                        dependency.add_path(prefix, prefix_cc, path, v)
+                    databases[prefix_cc].add_path(prefix, prefix_cc, path, v, pid)
+                    st.count('paths')
+                elif prefix_cc == catalog.default:
+                    anomalies.check_prefix(v, prefix, path)
+                st.lap('aggregate')
+                computed_lines += 1
+                if computed_lines % 1000 == 0:
+                    print('\r* ' + str(computed_lines) + " rows computed", end="", flush=True)
+        st.items = computed_lines
+        st.count('distinct_paths', len(paths))
     print('\r* ' + str(computed_lines) + " total rows computed\n", end="", flush=True)
-    return result
+    return results
 
-def create_datasets(ts, source, result):
+def create_datasets(ts, source, result, layout='wide', compression='none'):
     print("* Creating datasets")
-    with open(source + "/country-data-" + ts + ".csv", 'w', newline='') as f1:
-        w1 = csv.writer(f1)
-        w1.writerow([
-            "country",
-            "ipv4_origin_asns", "ipv4_transit_asns", "ipv4_upstream_asns", "ipv4_unregistered_asns", "ipv4_offshore_asns",
-            "ipv6_origin_asns", "ipv6_transit_asns", "ipv6_upstream_asns", "ipv6_unregistered_asns", "ipv6_offshore_asns"
-        ])
-        for cc, values in result.countries.items():
+    if writes_wide(layout):
+        with BackgroundWriter(source + "/country-data-" + ts + ".csv", compression) as f1:
+            w1 = csv.writer(f1)
             w1.writerow([
-                cc,
-                " ".join(values["ipv4_origin_asns"]),
-                " ".join(values["ipv4_transit_asns"]),
-                " ".join(values["ipv4_upstream_asns"]),
-                " ".join(values["ipv4_unregistered_asns"]),
-                " ".join(values["ipv4_offshore_asns"]),
-                " ".join(values["ipv6_origin_asns"]),
-                " ".join(values["ipv6_transit_asns"]),
-                " ".join(values["ipv6_upstream_asns"]),
-                " ".join(values["ipv6_unregistered_asns"]),
-                " ".join(values["ipv6_offshore_asns"])
+                "country",
+                "ipv4_origin_asns", "ipv4_transit_asns", "ipv4_upstream_asns", "ipv4_unregistered_asns", "ipv4_offshore_asns",
+                "ipv6_origin_asns", "ipv6_transit_asns", "ipv6_upstream_asns", "ipv6_unregistered_asns", "ipv6_offshore_asns"
             ])
-    with open(source + "/prefix-data-" + ts + ".csv", 'w', newline='') as f2:
+            for cc, values in result.countries.items():
+                w1.writerow([
+                    cc,
+                    " ".join(values["ipv4_origin_asns"]),
+                    " ".join(values["ipv4_transit_asns"]),
+                    " ".join(values["ipv4_upstream_asns"]),
+                    " ".join(values["ipv4_unregistered_asns"]),
+                    " ".join(values["ipv4_offshore_asns"]),
+                    " ".join(values["ipv6_origin_asns"]),
+                    " ".join(values["ipv6_transit_asns"]),
+                    " ".join(values["ipv6_upstream_asns"]),
+                    " ".join(values["ipv6_unregistered_asns"]),
+                    " ".join(values["ipv6_offshore_asns"])
+                ])
+    with BackgroundWriter(source + "/prefix-data-" + ts + ".csv", compression) as f2:
         w2 = csv.writer(f2)
         w2.writerow(["prefix", "length", "version", "country", "origin_asn", "jumps", "paths"])
-        for i, values in result.pfxs.items():
+        for values in result.pfx_values():
             w2.writerow([
                 values["prefix"],
                 values["length"],
@@ -216,40 +332,156 @@ def create_datasets(ts, source, result):
                 values["jumps"],
                 values["paths"],
             ])
-    with open(source + "/as-data-" + ts + ".csv", 'w', newline='') as f3:
-        w3 = csv.writer(f3)
-        w3.writerow([
-            "as", "cc", "downstream_ases",
-            "ipv4_prefixes", "ipv4_downstream_prefixes",
-            "ipv6_prefixes", "ipv6_downstream_prefixes"
-        ])
-        for a, data in result.ases.items():
+    if writes_wide(layout):
+        with BackgroundWriter(source + "/as-data-" + ts + ".csv", compression) as f3:
+            w3 = csv.writer(f3)
             w3.writerow([
-                a,
-                data["country"],
-                " ".join(data["downstream_ases"]),
-                " ".join(data["ipv4_prefixes"]),
-                " ".join(data["ipv4_downstream_prefixes"]),
-                " ".join(data["ipv6_prefixes"]),
-                " ".join(data["ipv6_downstream_prefixes"])
+                "as", "cc", "downstream_ases",
+                "ipv4_prefixes", "ipv4_downstream_prefixes",
+                "ipv6_prefixes", "ipv6_downstream_prefixes"
             ])
+            for a, data in result.as_items():
+                w3.writerow([
+                    a,
+                    data["country"],
+                    " ".join(data["downstream_ases"]),
+                    " ".join(data["ipv4_prefixes"]),
+                    " ".join(data["ipv4_downstream_prefixes"]),
+                    " ".join(data["ipv6_prefixes"]),
+                    " ".join(data["ipv6_downstream_prefixes"])
+                ])
+    if writes_long(layout):
+        create_long_datasets(ts, source, result, compression)
     print("- DONE!")
 
+def country_asn_rows(result):
+    for cc, values in result.countries.items():
+        for column, asns in values.items():
+            v, kind = column[0:4], column[5:-5]
+            for asn in asns:
+                yield [cc, v, kind, asn]
+
+def as_prefix_rows(result):
+    for a, data in result.as_items():
+        for v in ['ipv4', 'ipv6']:
+            for pfx in data[v + "_prefixes"]:
+                yield [a, v, 'origin', pfx]
+            for pfx in data[v + "_downstream_prefixes"]:
+                yield [a, v, 'downstream', pfx]
+
+def create_long_datasets(ts, source, result, compression='none'):
+    # one row per set member instead of space joined cells
+    write_table(source + "/country-asns-" + ts + ".csv", ["country", "family", "class", "asn"], country_asn_rows(result), compression)
+    write_table(source + "/ases-" + ts + ".csv", ["as", "cc"], ([a, data["country"]] for a, data in result.as_items()), compression)
+    write_table(
+        source + "/as-downstream-" + ts + ".csv", ["as", "downstream_as"],
+        ([a, ds] for a, data in result.as_items() for ds in data["downstream_ases"]), compression
+    )
+    write_table(source + "/as-prefixes-" + ts + ".csv", ["as", "family", "role", "prefix"], as_prefix_rows(result), compression)
+
 @click.command()
 @click.option('--date', default='00000000', help='date of calculation')
 @click.option('--collectors', default='rrc00', help='bgp collectors to use')
 @click.option('--source', default='data', help='directory where the data is stored')
-@click.option('--region', default='lacnic', help='region to analize. see regions.json')
-def main(date, collectors, source, region):
+@click.option('--region', default='lacnic', help='region to analize. see regions.json. all writes every region to <source>/<region>')
+@click.option('--country-summary/--no-country-summary', default=False, help='also write country-summary from memory')
+@click.option('--layout', type=click.Choice(LAYOUTS), default='wide', help='wide set columns, long edge tables or both')
+@click.option('--graph/--no-graph', default=False, help='also write the AS graph of every path to as-graph')
+@click.option('--dependency/--no-dependency', default=False, help='also write the ASes every path to each country goes through to country-dependency')
+@click.option('--path-stats/--no-path-stats', default=False, help='also write length, prepending and loop frequencies of the distinct paths to path-stats')
+@click.option('--anomaly-sample', default=20, help='anomalies of each kind sampled to anomalies')
+@click.option('--anomaly-log/--no-anomaly-log', default=False, help='also stream every anomaly to anomalies-<date>.txt.gz')
+@click.option('--compress', type=click.Choice(COMPRESSIONS), default='none', help='compression of the country, prefix and as tables')
+@click.option('--peers', type=click.Choice(['all', 'full']), default='all', help='process every peer, or only full-feed peers with distinct views')
+@click.option('--peer-profile', default=None, help='peer-profile file whose selected peers are used instead of profiling them again')
+@click.option('--full-feed', default=0.9, help='share of the largest table a full-feed peer has')
+@click.option('--peer-similarity', default=0.95, help='similarity above which a full-feed peer is redundant')
+@click.option('--sample', default=1.0, help='fraction of prefixes processed, chosen by hashing them. Below 1 also writes estimates with error bounds')
+@click.option('--sample-seed', default=0, help='seed of the prefix hash')
+@click.option('--ribs', default=None, help='comma separated local RIB dumps read instead of the collectors RIBs')
+@click.option('--delegated-src', default=None, help='directory of the delegated file. Default: source')
+@click.option('--memory-limit', default=None, type=int, help='MB of AS and prefix aggregates kept in memory before spilling them to disk')
+@click.option('--spill-dir', default=None, help='directory for spilled runs. Default: <source>/spill-<date>')
+def main(date, collectors, source, region, country_summary, layout, graph, dependency, path_stats, anomaly_sample, anomaly_log, compress, peers, peer_profile, full_feed, peer_similarity, sample, sample_seed, ribs, delegated_src, memory_limit, spill_dir):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
-    countries = load_countries(region)
-    catalog = load_delegated(source + '/delegated-' + date + '.csv')
-    result = process_ribs(date, collectors.split(','), countries, catalog)
-    create_datasets(date, source, result)
-    print("! " + str(len(result.anomalies)) + " anomalies found")
-    # for a in result.anomalies:
-    #     print(a)
+    report = RunReport('process-ribs', date, region=region)
+    regions = load_regions(region)
+    with report.stage('parse') as st:
+        catalog = load_delegated((delegated_src or source) + '/delegated-' + date + '.csv')
+        st.items = len(catalog)
+    builder = GraphBuilder() if graph else None
+    dependencies = DependencyBuilder() if dependency else None
+    paths = PathStore()
+    anomalies = AnomalyLog(anomaly_sample, source + "/anomalies-" + date + ".txt.gz" if anomaly_log else None)
+    budget = None
+    if memory_limit is not None:
+        budget = MemoryBudget(memory_limit, spill_dir or source + "/spill-" + date)
+    files = ribs.split(',') if ribs else None
+    selected = None
+    if peers == 'full':
+        if peer_profile:
+            selected = read_selection(peer_profile)
+        else:
+            rows = list(profile_peers(date, collectors.split(','), report, files).rows(full_feed, peer_similarity))
+            write_profile(source + "/peer-profile-" + date + ".csv", rows)
+            selected = selection(rows)
+        print("* {n} peer feeds selected".format(n=len(selected)))
+        report.get_stage('peers').count('selected', len(selected))
+    sampler = None
+    if sample < 1:
+        sampler = PrefixSampler(sample, sample_seed)
+        print("* Sampling {f:.2%} of the prefixes".format(f=sampler.fraction))
+    results = process_regions(date, collectors.split(','), regions, catalog, report, builder, dependencies, paths, anomalies, budget, selected, sampler, files, path_stats)
+    anomalies.close()
+    if budget is not None:
+        with report.stage('merge') as st:
+            for result in results.values():
+                result.finish()
+                st.items += sum(result.sizes())
+            st.count('spills', budget.spills)
+    if path_stats:
+        with report.stage('path_stats') as st:
+            st.items = write_table(source + "/path-stats-" + date + ".csv", ["stat", "value", "distinct_paths", "paths"], path_stat_rows(paths))
+    if builder is not None:
+        with report.stage('graph') as st:
+            asgraph = builder.build(catalog)
+            asgraph.save(graph_path(source, date))
+            st.items = asgraph.edge_count()
+            st.count('ases', len(asgraph))
+    with report.stage('write') as st:
+        for rir, result in results.items():
+            if region == 'all':
+                dst = source + "/" + rir
+                os.makedirs(dst, exist_ok=True)
+            else:
+                dst = source
+            create_datasets(date, dst, result, layout, compress)
+            if country_summary:
+                summary = summarize_countries(database_to_long(result.countries), list(result.countries))
+                write_country_summary(summary, dst + "/country-summary-" + date + ".csv")
+            if sampler is not None:
+                with report.stage('estimate') as est:
+                    countries = list(result.countries)
+                    support = support_frame(result.as_items(), result.pfx_values(), countries, catalog, sampler)
+                    write_estimates(asn_estimates(support, countries, sampler.fraction), dst + "/country-estimates-" + date + ".csv")
+                    write_estimates(prefix_estimates(result.pfx_values(), countries, sampler), dst + "/prefix-estimates-" + date + ".csv")
+                    est.items += len(support)
+            if dependencies is not None:
+                write_dependency(dependencies.table(list(result.countries), catalog), dst + "/country-dependency-" + date + ".csv")
+            st.items += sum(result.sizes()) + len(result.countries)
+        write_table(source + "/anomalies-" + date + ".csv", ["kind", "prefix", "path"], anomalies.sample_rows())
+    if budget is not None:
+        budget.cleanup()
+    ribs = report.get_stage('ribs')
+    ribs.count('anomalies', len(anomalies))
+    for kind in KINDS:
+        ribs.count('anomalies_' + kind, anomalies.counts[kind])
+    report.write(source)
+    print("! " + str(len(anomalies)) + " anomalies found")
+    for kind in KINDS:
+        if anomalies.counts[kind]:
+            print("  " + kind + ": " + str(anomalies.counts[kind]))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+
+import sys
+import click
+import json
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.instrumentation import RunReport
+from bgplac.rpki import is_ipv4, load_vrps, states, summarize, validate_routes, vrp_path
+from bgplac.tables import COMPRESSIONS, input_path, write_table
+
+
+def validate_prefixes(source, date, vrps, compress, report):
+    inpath = input_path(source + "/prefix-data-" + date + ".csv")
+    print("* Validating prefixes from " + inpath)
+    with report.stage('parse') as st:
+        # 'NA' is Namibia
+        df = pd.read_csv(inpath, dtype=str, keep_default_na=False, na_filter=False)
+        st.items = len(df)
+    with report.stage('validate') as st:
+        df['reason'] = validate_routes(vrps, (df['prefix'] + '/' + df['length']).to_numpy(), df['origin_asn'].to_numpy())
+        st.items = len(df)
+    with report.stage('write') as st:
+        validity = states(df['reason'].to_numpy())
+        rows = zip(df['prefix'], df['length'], df['country'], df['origin_asn'], validity)
+        st.items = write_table(
+            source + "/prefix-validity-" + date + ".csv",
+            ['prefix', 'length', 'country', 'origin_asn', 'validity'], rows, compress
+        )
+        summary = summarize(df.rename(columns={'version': 'family'}), ['country', 'family'])
+        summary.to_csv(source + "/rpki-summary-" + date + ".csv", index=False, float_format='%.2f')
+    return summary
+
+
+def validate_ixp(source, date, ixp, vrps, report):
+    # every route of the IXP table, with the last AS of its path as origin
+    inpath = input_path("{dir}/{ixp}/bgp-table-{ixp}-{date}.csv".format(dir=source, ixp=ixp, date=date))
+    if not os.path.exists(inpath):
+        return None
+    print("* Validating " + ixp + " routes from " + inpath)
+    with report.stage('parse_ixp') as st:
+        df = pd.read_csv(inpath, dtype=str, keep_default_na=False, na_filter=False, usecols=['prefix', 'as_path'])
+        st.items += len(df)
+    with report.stage('validate_ixp') as st:
+        origins = df['as_path'].str.rsplit(' ', n=1).str[-1].to_numpy()
+        df['reason'] = validate_routes(vrps, df['prefix'].to_numpy(), origins)
+        df['family'] = np.where(is_ipv4(df['prefix'].tolist()), 'ipv4', 'ipv6')
+        st.items += len(df)
+    summary = summarize(df, ['family'])
+    summary.insert(0, 'ixp', ixp)
+    summary.to_csv("{dir}/{ixp}/rpki-summary-{ixp}-{date}.csv".format(dir=source, ixp=ixp, date=date), index=False, float_format='%.2f')
+    return summary
+
+
+@click.command()
+@click.option('--date', default='00000000', help='date of calculation')
+@click.option('--source', default='data', help='directory where the data is stored')
+@click.option('--vrps', default=None, help='validator export (CSV or JSON). Default: <source>/vrps-<date>.csv or .json')
+@click.option('--ixps/--no-ixps', default=True, help='also validate the bgp tables of the IXPs in ixp-data')
+@click.option('--ixp-data', default='../ixp-data.json', help='directory where the ixp data is stored')
+@click.option('--compress', type=click.Choice(COMPRESSIONS), default='none', help='compression of prefix-validity')
+def main(date, source, vrps, ixps, ixp_data, compress):
+    if date == '00000000':
+        date = datetime.today().strftime('%Y%m%d')
+    report = RunReport('process-rpki', date)
+    if vrps is None:
+        vrps = vrp_path(source, date)
+    print("* Loading VRPs from " + vrps)
+    with report.stage('load_vrps') as st:
+        vrps = load_vrps(vrps)
+        st.items = sum(len(index) for index in vrps.values())
+    summary = validate_prefixes(source, date, vrps, compress, report)
+    for row in summary.itertuples():
+        print("  {c} {f}: {v} valid, {i} invalid, {u} unknown".format(c=row.country, f=row.family, v=row.valid, i=row.invalid, u=row.unknown))
+    if ixp_data.startswith('/'):
+        ixpdata_path = ixp_data
+    else:
+        ixpdata_path = os.path.join(sys.path[0], ixp_data)
+    if ixps and not os.path.exists(ixpdata_path):
+        print("! Skipping IXP tables, no " + ixpdata_path)
+        ixps = False
+    if ixps:
+        with open(ixpdata_path) as f:
+            ixpdata = json.load(f)
+        summaries = [s for s in (validate_ixp(source, date, ixp, vrps, report) for ixp in sorted(ixpdata)) if s is not None]
+        if summaries:
+            pd.concat(summaries).to_csv(source + "/rpki-ixp-summary-" + date + ".csv", index=False, float_format='%.2f')
+    report.write(source)
+    print("- DONE!")
+
+
+if __name__ == '__main__':
+    main()
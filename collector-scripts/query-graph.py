@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+
+import sys
+import click
+import csv
+import os
+from datetime import datetime
+
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.graph import ASGraph, graph_path
+
+
+@click.command()
+@click.option('--date', default='00000000', help='date of the graph')
+@click.option('--source', default='data', help='directory where the data is stored')
+@click.option('--cone', default=None, help='comma separated ASNs whose downstream cone size is listed')
+@click.option('--upstreams', default=None, help='country whose foreign upstreams are listed')
+@click.option('--spof', default=None, help='country whose single points of failure are listed')
+def main(date, source, cone, upstreams, spof):
+    if date == '00000000':
+        date = datetime.today().strftime('%Y%m%d')
+    path = graph_path(source, date)
+    if not os.path.exists(path):
+        raise click.UsageError(path + " not found, see process-ribs.py --graph")
+    graph = ASGraph.load(path)
+    writer = csv.writer(sys.stdout)
+    if cone:
+        writer.writerow(["asn", "cone_ases", "cone_prefixes"])
+        for asn in cone.split(','):
+            writer.writerow([asn] + list(graph.cone_size(asn)))
+    elif upstreams:
+        total, found = graph.country_upstreams(upstreams)
+        writer.writerow(["asn", "country", "prefixes", "share", "country_ases"])
+        for asn, (prefixes, ases) in sorted(found.items(), key=lambda x: -x[1][0]):
+            share = "{:.4f}".format(prefixes / total) if total else ''
+            writer.writerow([asn, graph.countries[graph.node(asn)], prefixes, share, ases])
+    elif spof:
+        writer.writerow(["asn", "country", "dependent_ases", "dependent_prefixes"])
+        for asn, (ases, prefixes) in sorted(graph.single_points_of_failure(spof).items(), key=lambda x: -x[1][1]):
+            writer.writerow([asn, graph.countries[graph.node(asn)], ases, prefixes])
+    else:
+        raise click.UsageError("--cone, --upstreams or --spof is required")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+
+import sys
+import click
+import os
+import re
+from datetime import datetime
+
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.history import DATASETS, TRENDS, append_day, history_dates, load_history, trends, window_start
+from bgplac.instrumentation import RunReport
+
+
+@click.command()
+@click.option('--date', default='00000000', help='date of calculation')
+@click.option('--source', default='data', help='directory where the data is stored')
+@click.option('--history', default=None, help='history directory. Default: <source>/history')
+@click.option('--window', default=7, help='days in the rolling window')
+@click.option('--backfill/--no-backfill', default=False, help='also append every earlier day found in source')
+@click.option('--force/--no-force', default=False, help='rewrite days already in the history')
+def main(date, source, history, window, backfill, force):
+    if date == '00000000':
+        date = datetime.today().strftime('%Y%m%d')
+    if history is None:
+        history = source + "/history"
+    report = RunReport('update-history', date)
+    dates = [date]
+    if backfill:
+        found = [re.match(r'^country-routing-stats-(\d{8})\.csv$', name) for name in os.listdir(source)]
+        dates = sorted({m.group(1) for m in found if m and m.group(1) <= date} | {date})
+    print("* Updating history in " + history)
+    with report.stage('append') as st:
+        for d in dates:
+            if append_day(history, source, d, force):
+                st.items += 1
+            else:
+                st.count('skipped')
+    with report.stage('aggregate') as st:
+        # only the chunks of the last <window> days (and the day before) are read
+        recent = [d for d in history_dates(history) if window_start(date, window) <= d <= date]
+        results = {}
+        for name in DATASETS:
+            stats = load_history(history, name, recent)
+            results[name] = trends(stats, window)
+            st.items += len(stats)
+    with report.stage('write'):
+        for name, result in results.items():
+            result.to_csv(source + "/" + TRENDS[name] + "-" + date + ".csv", index_label='country', float_format='%.2f')
+    report.write(source)
+    print("- DONE!")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,11 @@
 
 
 import click
-import urllib.request
+import shutil
 from datetime import datetime
+from bgplac.fetch import fetch
+from bgplac.instrumentation import RunReport
+from bgplac.sources import delegated_url
 
 
 @click.command()
@@ -12,9 +15,12 @@ from datetime import datetime
 def main(date, source):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
-    url = "https://ftp.ripe.net/pub/stats/ripencc/nro-stats/" + date + "/combined-stat"
+    url = delegated_url(date)
+    report = RunReport('download-delegated', date)
     print("* Downloading delegated from " + url)
-    urllib.request.urlretrieve(url, source + "/delegated-" + date + ".csv")
+    with report.stage('download'):
+        shutil.copyfile(fetch(url), source + "/delegated-" + date + ".csv")
+    report.write(source)
     print("- DONE!")
 
 
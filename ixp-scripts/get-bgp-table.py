@@ -7,58 +7,22 @@ import csv
 import gzip
 import json
 import os
-import pytricia
 import pybgpstream
 import re
-import urllib.request
+import shutil
 from datetime import datetime
 
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.delegated import load_delegated
+from bgplac.fetch import fetch
+from bgplac.instrumentation import RunReport
+from bgplac.peers import PeerProfile, peer_of, selection, write_profile
+from bgplac.sources import delegated_url, lacnic_url, pch_url
+from bgplac.tables import COMPRESSIONS, BackgroundWriter, family
+
+
+BATCH_SIZE = 50000
 
-class ResourceCatalog:
-
-    def __init__(self):
-        self.ptree = {
-            'ipv4': pytricia.PyTricia(32),
-            'ipv6': pytricia.PyTricia(128)
-        }
-        self.ases = {}
-
-    def add_pfx(self, v, address, length, data):
-        self.ptree[v].insert(address, length, data)
-
-    def get_pfx(self, v, address):
-        if address in self.ptree[v]:
-            return self.ptree[v].get(address)
-        # print("! WARNING! {v} {net} country not found".format(v=v, net=address))
-        return 'ZZ'
-
-    def add_asn(self, asn, cc):
-        self.ases[asn] = cc
-
-    def get_asn(self, asn):
-        if asn in self.ases:
-            return self.ases[asn]
-        else:
-            return 'ZZ'
-    
-    def load_delegated(self, path):
-        print("* Retrieving delegated from {path}".format(path=path))
-        with open(path, 'r', newline='') as content:
-            print("* Processing delegated")
-            for line in content:
-                row = line.split('|')
-                if row[0] not in ['afrinic', 'apnic', 'arin', 'lacnic', 'ripencc']:
-                    continue
-                if row[2] == 'asn':
-                    if row[1] != 'ZZ':
-                        count = int(row[4])
-                        start = int(row[3])
-                        for i in range(count):
-                            self.add_asn(str(start + i), row[1])
-                elif row[2] == 'ipv4':
-                    self.add_pfx('ipv4', row[3], 33 - int(row[4]).bit_length(), row[1])
-                elif row[2] == 'ipv6':
-                    self.add_pfx('ipv6', row[3], int(row[4]), row[1])
 
 def addprefix(ip):
     spl = ip.split('/')
@@ -86,14 +50,52 @@ def getpath(strpath):
             return False
     return path
 
-def process_pch(url, ipv, catalog, writer):
-    urllib.request.urlretrieve(url % (ipv, ipv), "{dir}/temp.gz".format(dir='.'))
+def write_rows(writer, catalog, v, batch, st):
+    st.lap('parse')
+    cc_prefixes = catalog.get_pfxs(v, [prefix for prefix, path in batch]).tolist()
+    cc_paths = [" ".join([catalog.get_asn(a) for a in path]) for prefix, path in batch]
+    st.lap('lookup')
+    writer.writerows([
+        [prefix, cc_prefix, " ".join(path), cc_path]
+        for (prefix, path), cc_prefix, cc_path in zip(batch, cc_prefixes, cc_paths)
+    ])
+    st.lap('write')
+    return len(batch)
+
+def rib_stream(rib):
+    stream = pybgpstream.BGPStream(data_interface="singlefile")
+    stream.set_data_interface_option("singlefile", "rib-file", rib)
+    return stream
+
+def select_peers(rib, full_feed, threshold, path, report):
+    # pre-pass over the route server RIB, see bgplac/peers.py
+    profile = PeerProfile()
+    with report.stage('peers') as st:
+        for rec in rib_stream(rib).records():
+            for elem in rec:
+                prefix = elem.fields["prefix"]
+                profile.add(peer_of(rec, elem), family(prefix), prefix, elem.fields["as-path"].split())
+                st.items += 1
+        rows = list(profile.rows(full_feed, threshold))
+        write_profile(path, rows)
+        selected = selection(rows)
+        st.count('peers', len(profile))
+        st.count('selected', len(selected))
+    print("* {n} of {m} peer feeds selected".format(n=len(selected), m=len(profile)))
+    return selected
+
+def process_pch(url, ipv, catalog, writer, report=None):
+    if report is None:
+        report = RunReport('get-bgp-table', '')
+    with report.stage('download'):
+        dump = fetch(url % (ipv, ipv))
     rows = 0
-    with gzip.open("{dir}/temp.gz".format(dir='.'),'rt') as fgzp:
+    with gzip.open(dump, 'rt') as fgzp, report.stage('pch') as st:
         is_header = True
         ipv46 = '[A-Za-z0-9:\.]+'
         netre = '^...(' + ipv46 + ')\/?(\d+)?\s*(.*)$'
         prefix = ''
+        batch = []
         for line in fgzp:
             if is_header:
                 if 'Network' in line:
@@ -113,10 +115,10 @@ def process_pch(url, ipv, catalog, writer):
                         else:
                             prefix = match.group(1) + '/' + match.group(2)
                     if path != False:
-                        cc_path = [catalog.get_asn(a) for a in path]
-                        cc_prefix = catalog.get_pfx('ipv' + ipv, prefix)
-                        writer.writerow([prefix, cc_prefix, " ".join(path), " ".join(cc_path)])
-                        rows += 1
+                        batch.append((prefix, path))
+                        if len(batch) >= BATCH_SIZE:
+                            rows += write_rows(writer, catalog, 'ipv' + ipv, batch, st)
+                            batch = []
                 else:
                     match = re.match(netre, line)
                     if match:
@@ -125,6 +127,8 @@ def process_pch(url, ipv, catalog, writer):
                             prefix = addprefix(match.group(1))
                         else:
                             prefix = match.group(1) + '/' + match.group(2)
+        rows += write_rows(writer, catalog, 'ipv' + ipv, batch, st)
+        st.items += rows
     return rows
 
 
@@ -133,28 +137,32 @@ def process_pch(url, ipv, catalog, writer):
 @click.option('--ixp', default='aep', help='ixp identifier')
 @click.option('--dst', default='data', help='directory where the data is stored')
 @click.option('--subfolder/--no-subfolder', default=True, help='creates subfolder for ixp')
-@click.option('--delegated-src', default=False, help='delegated file location')
+@click.option('--delegated-src', default=None, help='delegated file location')
 @click.option('--ixp-data', default='../ixp-data.json', help='directory where the ixp data is stored')
-def main(date, ixp, dst, subfolder, delegated_src, ixp_data):
+@click.option('--compress', type=click.Choice(COMPRESSIONS), default='none', help='compression of the bgp table')
+@click.option('--peers', type=click.Choice(['all', 'full']), default='all', help='route server peers to keep (lacnic source): all, or full-feed peers with distinct views')
+@click.option('--full-feed', default=0.9, help='share of the largest table a full-feed peer has')
+@click.option('--peer-similarity', default=0.95, help='similarity above which a full-feed peer is redundant')
+def main(date, ixp, dst, subfolder, delegated_src, ixp_data, compress, peers, full_feed, peer_similarity):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
+    report = RunReport('get-bgp-table', date, ixp=ixp)
 
     if not delegated_src:
-        url = "https://ftp.ripe.net/pub/stats/ripencc/nro-stats/{d}/combined-stat".format(d=date)
+        url = delegated_url(date)
         delpath = "{dir}/delegated-{date}.csv".format(dir=dst, date=date)
         print("* Downloading delegated from {url}".format(url=url))
-        urllib.request.urlretrieve(url, delpath)
+        with report.stage('download'):
+            shutil.copyfile(fetch(url), delpath)
         print("- DONE!")
     else:
         delpath = "{dir}/delegated-{date}.csv".format(dir=delegated_src, date=date)
 
-    year = date[0:4]
-    month = date[4:6]
-    day = date[6:8]
     rows = 0
 
-    catalog = ResourceCatalog()
-    catalog.load_delegated(delpath)
+    with report.stage('parse') as st:
+        catalog = load_delegated(delpath, default='ZZ')
+        st.items = len(catalog)
 
     if subfolder:
         outfile = "{dir}/{ixp}/bgp-table-{ixp}-{date}.csv".format(dir=dst, ixp=ixp, date=date)
@@ -166,7 +174,7 @@ def main(date, ixp, dst, subfolder, delegated_src, ixp_data):
         ixpdata_path = ixp_data
     else:
         ixpdata_path = os.path.join(sys.path[0], ixp_data)
-    with open(ixpdata_path) as json_file, open(outfile, 'w', newline='') as fcsv:
+    with open(ixpdata_path) as json_file, BackgroundWriter(outfile, compress) as fcsv:
         writer = csv.writer(fcsv)
         writer.writerow(["prefix", "prefix_cc", "as_path", "as_path_cc"])
         ixpdata = json.load(json_file)
@@ -175,26 +183,32 @@ def main(date, ixp, dst, subfolder, delegated_src, ixp_data):
             raise Exception("IXP not found")
         selected = ixpdata[ixp]
         if selected['source'] == 'pch':
-            url = "https://www.pch.net/resources/Routing_Data/IPv%s_daily_snapshots/{year}/{month}/route-collector.{ixp}.pch.net/route-collector.{ixp}.pch.net-ipv%s_bgp_routes.{year}.{month}.{day}.gz"
-            rows += process_pch(url.format(year=year, month=month, day=day, ixp=ixp), '4', catalog, writer)
-            rows += process_pch(url.format(year=year, month=month, day=day, ixp=ixp), '6', catalog, writer)
+            url = pch_url(ixp, date)
+            rows += process_pch(url, '4', catalog, writer, report)
+            rows += process_pch(url, '6', catalog, writer, report)
         elif selected['source'] == 'lacnic':
-            url = "https://ixpdata.labs.lacnic.net/raw-data/{path}/{y}/{m}/{d}/rib.{y}{m}{d}.{t}.bz2".format(path=selected['path'], y=year, m=month, d=day, t=selected['time'])
-            stream = pybgpstream.BGPStream(data_interface="singlefile")
-            stream.set_data_interface_option("singlefile", "rib-file", url)
-            for rec in stream.records():
-                for elem in rec:
-                    prefix = elem.fields["prefix"]
-                    if '.' in prefix:
-                        v = 'ipv4'
-                    else:
-                        v = 'ipv6'
-                    path = getpath(elem.fields["as-path"])
-                    if path != False:
-                        cc_path = [catalog.get_asn(a) for a in path]
-                        cc_prefix = catalog.get_pfx(v, prefix)
-                        writer.writerow([prefix, cc_prefix, " ".join(path), " ".join(cc_path)])
-                        rows += 1
+            with report.stage('download'):
+                rib = fetch(lacnic_url(selected, date))
+            selected = None
+            if peers == 'full':
+                profile = os.path.join(os.path.dirname(outfile), "peer-profile-{ixp}-{date}.csv".format(ixp=ixp, date=date))
+                selected = select_peers(rib, full_feed, peer_similarity, profile, report)
+            with report.stage('ribs') as st:
+                batch = []
+                for rec in rib_stream(rib).records():
+                    for elem in rec:
+                        if selected is not None and peer_of(rec, elem) + (family(elem.fields["prefix"]),) not in selected:
+                            st.count('skipped_paths')
+                            continue
+                        path = getpath(elem.fields["as-path"])
+                        if path != False:
+                            batch.append((elem.fields["prefix"], path))
+                            if len(batch) >= BATCH_SIZE:
+                                rows += write_rows(writer, catalog, None, batch, st)
+                                batch = []
+                rows += write_rows(writer, catalog, None, batch, st)
+                st.items = rows
+    report.write(os.path.dirname(outfile))
     if rows == 0:
         raise Exception("No rows found")
     print("* Processed rows: {rows}".format(rows=rows))
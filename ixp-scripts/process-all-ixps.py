@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+
+import sys
+import click
+import csv
+import json
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import combinations_with_replacement
+
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.instrumentation import RunReport
+from bgplac.ixps import country_regions, country_resources, coverage, ixp_resources, read_routes, summarize_ixp, write_coverage
+from bgplac.tables import LAYOUTS, input_path, write_table
+from bgplac.visibility import PrefixIndex, visibility
+
+csv.field_size_limit(sys.maxsize)
+
+# inputs shared by every IXP, loaded once by the parent and handed to the workers
+SHARED = {}
+
+
+def init_worker(shared):
+    SHARED.update(shared)
+
+
+def process_ixp(ixp):
+    date = SHARED['date']
+    layout = SHARED['layout']
+    selected = SHARED['ixpdata'][ixp]
+    src = "{dir}/{ixp}".format(dir=SHARED['src'], ixp=ixp)
+    if layout == 'long':
+        path = "{dir}/ixp-routes-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date)
+    else:
+        path = "{dir}/ixp-routing-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date)
+    if not os.path.exists(input_path(path)):
+        return ixp, None
+    report = RunReport('process-all-ixps', date, ixp=ixp)
+    with report.stage('parse') as st:
+        routes = list(read_routes(path, 'long' if layout == 'long' else 'wide'))
+        st.items = len(routes)
+    with report.stage('summary') as st:
+        aspath = "{dir}/aspath-freq-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date)
+        summary = summarize_ixp(routes, aspath, selected['region'], SHARED['cctorir'], st)
+        summary.to_csv("{dir}/ixp-summary-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date), index=False, float_format='%.2f')
+    with report.stage('coverage') as st:
+        ix = ixp_resources(routes, selected['country'], st)
+        write_coverage(src, ixp, date, coverage(ix, SHARED['resources'][selected['country']]), layout)
+    if SHARED['visibility'] is not None:
+        with report.stage('visibility') as st:
+            rows = []
+            for v, pos in [('ipv4', 4), ('ipv6', 5)]:
+                prefixes = list(set([p for r in routes for p in r[pos]]))
+                rows += visibility(SHARED['visibility'][v], prefixes)
+                st.items += len(prefixes)
+            write_table(
+                "{dir}/ixp-visibility-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date),
+                ["family", "class", "prefixes", "addresses"], rows
+            )
+    report.write(src)
+    peers = set([r[1] for r in routes])
+    origins = set([r[3] for r in routes])
+    prefixes = set([p for r in routes for p in r[4]] + [p for r in routes for p in r[5]])
+    return ixp, (peers, origins, prefixes)
+
+
+def load_visibility_index(path):
+    # 'NA' is Namibia
+    df = pd.read_csv(input_path(path), usecols=['prefix', 'length', 'version'], dtype=str, keep_default_na=False)
+    prefixes = df['prefix'] + '/' + df['length']
+    return {v: PrefixIndex.from_prefixes(v, prefixes[df['version'] == v].tolist()) for v in ['ipv4', 'ipv6']}
+
+
+def ixp_matrix(sets):
+    for a, b in combinations_with_replacement(sorted(sets), 2):
+        peers_a, origins_a, prefixes_a = sets[a]
+        peers_b, origins_b, prefixes_b = sets[b]
+        shared_prefixes = len(prefixes_a & prefixes_b)
+        union = len(prefixes_a) + len(prefixes_b) - shared_prefixes
+        yield [
+            a, b,
+            len(peers_a & peers_b),
+            len(origins_a & origins_b),
+            shared_prefixes,
+            "{:.4f}".format(shared_prefixes / union) if union else ''
+        ]
+
+
+@click.command()
+@click.option('--date', default='00000000', help='date of calculation')
+@click.option('--src', default='data', help='source directory to retrieve data')
+@click.option('--global-src', default=False, help='directory where the global tables data is stored')
+@click.option('--ixp-data', default='../ixp-data.json', help='directory where the ixp data is stored')
+@click.option('--ixps', default=None, help='comma separated ixps. Default: every active ixp')
+@click.option('--workers', default=os.cpu_count(), help='worker processes')
+@click.option('--layout', type=click.Choice(LAYOUTS), default='wide', help='read ixp-routing or ixp-routes (long), write country-coverage, country-coverage-items (long) or both')
+@click.option('--visibility/--no-visibility', default=True, help='classify ixp prefixes against the prefix-data routing view')
+def main(date, src, global_src, ixp_data, ixps, workers, layout, visibility):
+    if date == '00000000':
+        date = datetime.today().strftime('%Y%m%d')
+    if not global_src:
+        global_src = src
+    report = RunReport('process-all-ixps', date)
+    if ixp_data.startswith('/'):
+        ixpdata_path = ixp_data
+    else:
+        ixpdata_path = os.path.join(sys.path[0], ixp_data)
+    with report.stage('parse') as st:
+        with open(ixpdata_path) as ixpfile, open(os.path.join(sys.path[0], '../regions.json')) as rirfile:
+            ixpdata = json.load(ixpfile)
+            cctorir = country_regions(json.load(rirfile))
+        if ixps:
+            selected = ixps.split(',')
+        else:
+            selected = [ixp for ixp, values in ixpdata.items() if values['active']]
+        countries = set([ixpdata[ixp]['country'] for ixp in selected])
+        fcc = "{dir}/prefix-data-{date}.csv".format(dir=global_src, date=date)
+        resources = country_resources(fcc, countries, st)
+    index = None
+    if visibility:
+        with report.stage('index') as st:
+            index = load_visibility_index(fcc)
+            st.items = len(index['ipv4']) + len(index['ipv6'])
+    shared = {
+        'date': date, 'src': src, 'layout': layout, 'ixpdata': ixpdata,
+        'cctorir': cctorir, 'resources': resources, 'visibility': index
+    }
+    print("* Processing {n} IXPs with {w} workers".format(n=len(selected), w=workers))
+    sets = {}
+    with report.stage('ixps') as st, ProcessPoolExecutor(workers, initializer=init_worker, initargs=(shared,)) as pool:
+        for ixp, result in pool.map(process_ixp, selected):
+            if result is None:
+                print("! Skipping " + ixp)
+                st.count('skipped')
+                continue
+            sets[ixp] = result
+            st.items += 1
+    with report.stage('matrix') as st:
+        with open("{dir}/ixp-matrix-{date}.csv".format(dir=src, date=date), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["ixp_a", "ixp_b", "shared_peer_ases", "shared_origin_ases", "shared_prefixes", "prefix_jaccard"])
+            for row in ixp_matrix(sets):
+                writer.writerow(row)
+                st.items += 1
+    report.write(src)
+    print("- DONE!")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,10 @@ import json
 import os
 from datetime import datetime
 
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.instrumentation import RunReport
+from bgplac.tables import COMPRESSIONS, LAYOUTS, BackgroundWriter, open_input, write_table, writes_long, writes_wide
+
 
 class RoutingCountry:
 
@@ -24,6 +28,15 @@ class RoutingCountry:
             self.prefixes6.add(prefix)
 
 
+def route_rows(table):
+    for pasn, peer in table.items():
+        for oasn, origin in peer.branches.items():
+            for pfx in origin.prefixes4:
+                yield [peer.country, pasn, origin.country, oasn, pfx]
+            for pfx in origin.prefixes6:
+                yield [peer.country, pasn, origin.country, oasn, pfx]
+
+
 class RoutingTable:
 
     def __init__(self, region, countries):
@@ -73,10 +86,13 @@ class RoutingTable:
 @click.option('--src', default='data', help='source directory to retrieve data')
 @click.option('--dst', default=False, help='directory where the data is stored')
 @click.option('--subfolder/--no-subfolder', default=True, help='creates subfolder for ixp')
-def main(date, ixp, src, dst, subfolder):
+@click.option('--layout', type=click.Choice(LAYOUTS), default='wide', help='wide ixp-routing, long ixp-routes or both')
+@click.option('--compress', type=click.Choice(COMPRESSIONS), default='none', help='compression of ixp-routing and ixp-routes')
+def main(date, ixp, src, dst, subfolder, layout, compress):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
     
+    report = RunReport('process-bgp-table', date, ixp=ixp)
     if not dst:
         dst = src
     if subfolder:
@@ -86,7 +102,7 @@ def main(date, ixp, src, dst, subfolder):
     else:
         path = "{dir}/bgp-table-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date)
 
-    with open(path, newline='') as csvfile, open(os.path.join(sys.path[0], '../regions.json')) as rirfile:
+    with open_input(path) as csvfile, open(os.path.join(sys.path[0], '../regions.json')) as rirfile:
         regions = json.load(rirfile)
         cctorir = {}
         ixproutingtable = RoutingTable('lacnic', cctorir)
@@ -96,28 +112,39 @@ def main(date, ixp, src, dst, subfolder):
                 cctorir[cc] = rir
 
         reader = csv.DictReader(csvfile, delimiter=',', quoting=csv.QUOTE_NONE)
-        for row in reader:
-            pfx = row['prefix']
-            asn_path = row['as_path'].split()
-            cc_path = row['as_path_cc'].split()
-            ixproutingtable.add_path(pfx, asn_path, cc_path)
+        with report.stage('aggregate') as st:
+            for row in reader:
+                pfx = row['prefix']
+                asn_path = row['as_path'].split()
+                cc_path = row['as_path_cc'].split()
+                st.lap('parse')
+                ixproutingtable.add_path(pfx, asn_path, cc_path)
+                st.lap('aggregate')
+                st.items += 1
 
         outp1 = "{dir}/ixp-routing-{ixp}-{date}.csv".format(dir=dst, ixp=ixp, date=date)
         outp2 = "{dir}/aspath-freq-{ixp}-{date}.csv".format(dir=dst, ixp=ixp, date=date)
         outp3 = "{dir}/prepend-freq-{ixp}-{date}.csv".format(dir=dst, ixp=ixp, date=date)
-        with open(outp1, 'w', newline='') as f1, open(outp2, 'w', newline='') as f2, open(outp3, 'w', newline='') as f3:
-            w1 = csv.writer(f1)
-            w1.writerow(["peer_cc", "peer_asn", "origin_cc", "origin_asn", "prefixes_ipv4", "prefixes_ipv6"])
-            for pasn, peer in ixproutingtable.table.items():
-                for oasn, origin in peer.branches.items():
-                    w1.writerow([
-                        peer.country,
-                        pasn,
-                        origin.country,
-                        oasn,
-                        " ".join(origin.prefixes4),
-                        " ".join(origin.prefixes6)
-                    ])
+        with open(outp2, 'w', newline='') as f2, open(outp3, 'w', newline='') as f3, report.stage('write'):
+            if writes_wide(layout):
+                with BackgroundWriter(outp1, compress) as f1:
+                    w1 = csv.writer(f1)
+                    w1.writerow(["peer_cc", "peer_asn", "origin_cc", "origin_asn", "prefixes_ipv4", "prefixes_ipv6"])
+                    for pasn, peer in ixproutingtable.table.items():
+                        for oasn, origin in peer.branches.items():
+                            w1.writerow([
+                                peer.country,
+                                pasn,
+                                origin.country,
+                                oasn,
+                                " ".join(origin.prefixes4),
+                                " ".join(origin.prefixes6)
+                            ])
+            if writes_long(layout):
+                write_table(
+                    "{dir}/ixp-routes-{ixp}-{date}.csv".format(dir=dst, ixp=ixp, date=date),
+                    ["peer_cc", "peer_asn", "origin_cc", "origin_asn", "prefix"], route_rows(ixproutingtable.table), compress
+                )
             w2 = csv.writer(f2)
             w2.writerow(["country", "hops", "frequency"])
             for cc, freq in ixproutingtable.hopstable.items():
@@ -127,6 +154,7 @@ def main(date, ixp, src, dst, subfolder):
             w3.writerow(["prepend", "frequency"])
             for p in sorted(ixproutingtable.prependstable):
                 w3.writerow([p, ixproutingtable.prependstable[p]])
+    report.write(dst)
 
 
 if __name__ == '__main__':
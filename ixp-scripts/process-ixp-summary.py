@@ -5,11 +5,13 @@ import sys
 import click
 import csv
 import json
-import ipaddress
-import pandas as pd
 import os
 from datetime import datetime
 
+sys.path.append(os.path.join(sys.path[0], '..'))
+from bgplac.instrumentation import RunReport
+from bgplac.ixps import country_regions, read_routes, summarize_ixp
+
 csv.field_size_limit(sys.maxsize)
 
 @click.command()
@@ -19,10 +21,12 @@ csv.field_size_limit(sys.maxsize)
 @click.option('--dst', default=False, help='directory where the data is stored')
 @click.option('--subfolder/--no-subfolder', default=True, help='creates subfolder for ixp')
 @click.option('--ixp-data', default='../ixp-data.json', help='directory where the ixp data is stored')
-def main(date, ixp, src, dst, subfolder, ixp_data):
+@click.option('--layout', type=click.Choice(['wide', 'long']), default='wide', help='read ixp-routing or the long ixp-routes table')
+def main(date, ixp, src, dst, subfolder, ixp_data, layout):
     if date == '00000000':
         date = datetime.today().strftime('%Y%m%d')
-    
+    report = RunReport('process-ixp-summary', date, ixp=ixp)
+
     if subfolder:
         src =  "{dir}/{ixp}".format(dir=src, ixp=ixp)
         if not dst:
@@ -33,7 +37,10 @@ def main(date, ixp, src, dst, subfolder, ixp_data):
     elif not dst:
         dst = src
 
-    inpath1 = "{dir}/ixp-routing-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date)
+    if layout == 'long':
+        inpath1 = "{dir}/ixp-routes-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date)
+    else:
+        inpath1 = "{dir}/ixp-routing-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date)
     inpath2 = "{dir}/aspath-freq-{ixp}-{date}.csv".format(dir=src, ixp=ixp, date=date)
     outpath = "{dir}/ixp-summary-{ixp}-{date}.csv".format(dir=dst, ixp=ixp, date=date)
 
@@ -41,101 +48,18 @@ def main(date, ixp, src, dst, subfolder, ixp_data):
         ixpdata_path = ixp_data
     else:
         ixpdata_path = os.path.join(sys.path[0], ixp_data)
-    with open(os.path.join(sys.path[0], ixp_data)) as ixpfile, open(ixpdata_path) as rirfile, open(inpath1, newline='') as infile:
+    with open(ixpdata_path) as ixpfile, open(os.path.join(sys.path[0], '../regions.json')) as rirfile:
         ixpdata = json.load(ixpfile)
         if ixp not in ixpdata:
             raise Exception("IXP not found")
         selected = ixpdata[ixp]
+        cctorir = country_regions(json.load(rirfile))
 
-        regions = json.load(rirfile)
-        cctorir = {}
-        for rir, countries in regions.items():
-            for cc in countries:
-                cctorir[cc] = rir
-
-        table = {}
-        rdr = csv.DictReader(infile)
-        for row in rdr:
-            peercc = row["peer_cc"]
-            origcc = row["origin_cc"]
-            if peercc in cctorir:
-                if cctorir[peercc] != selected['region']:
-                    peercc = cctorir[peercc]
-            else:
-                peercc = 'other'
-            if peercc not in table:
-                table[peercc] = { 'peer_ases': set([]), 'origin_ases': set([]), 'origin_prefixes_ipv4': set([]), 'origin_prefixes_ipv6': set([]) }
-            if origcc not in table:
-                table[origcc] = { 'peer_ases': set([]), 'origin_ases': set([]), 'origin_prefixes_ipv4': set([]), 'origin_prefixes_ipv6': set([]) }
-            table[peercc]['peer_ases'].add(row['peer_asn'])
-            custom = table[origcc]
-            custom['origin_ases'].add(row['origin_asn'])
-            custom['origin_prefixes_ipv4'].update(row['prefixes_ipv4'].split())
-            custom['origin_prefixes_ipv6'].update(row['prefixes_ipv6'].split())
-        
-        dataset = []
-        for cc, row in table.items():
-            prefixes4 = []
-            pfxlen4_sum = 0
-            prefixes6 = []
-            pfxlen6_sum = 0
-            for p in row['origin_prefixes_ipv4']:
-                ipnet = ipaddress.IPv4Network(p)
-                pfxlen4_sum += ipnet.prefixlen
-                prefixes4.append(ipnet)
-            for p in row['origin_prefixes_ipv6']:
-                ipnet = ipaddress.IPv6Network(p)
-                pfxlen6_sum += ipnet.prefixlen
-                prefixes6.append(ipnet)
-            origin_collapsed_prefixes4 = ipaddress.collapse_addresses(prefixes4)
-            origin_collapsed_prefixes6 = ipaddress.collapse_addresses(prefixes6)
-            addresses4_count = 0
-            for net in origin_collapsed_prefixes4:
-                addresses4_count += net.num_addresses
-            addresses6_count = 0
-            for net in origin_collapsed_prefixes6:
-                addresses6_count += net.num_addresses
-            prefixes4_count = len(row['origin_prefixes_ipv4'])
-            if prefixes4_count > 0:
-                origin_pfxlen4_avg = "{:.2f}".format(pfxlen4_sum/prefixes4_count)
-            else:
-                origin_pfxlen4_avg = ''
-            prefixes6_count = len(row['origin_prefixes_ipv6'])
-            if prefixes6_count > 0:
-                origin_pfxlen6_avg = "{:.2f}".format(pfxlen6_sum/prefixes6_count)
-            else:
-                origin_pfxlen6_avg = ''
-            dataset.append({
-                "country": cc,
-                "peer_ases_count": len(row['peer_ases']),
-                "origin_ases_count": len(row['origin_ases']),
-                "origin_prefixes_ipv4_count": prefixes4_count,
-                "origin_prefixes_ipv6_count": prefixes6_count,
-                "origin_prefixes_count": prefixes4_count + prefixes6_count,
-                "origin_addresses_ipv4_count": addresses4_count,
-                "origin_addresses_ipv6_count": addresses6_count,
-                "origin_pfxlen_ipv4_avg": origin_pfxlen4_avg,
-                "origin_pfxlen_ipv6_avg": origin_pfxlen6_avg
-            })
-        df = pd.DataFrame(dataset)
-
-        data = pd.read_csv(inpath2)
-        g = data.groupby('country')
-        data['wa'] = data.frequency / g.frequency.transform("sum") * data.hops
-        aggregated = g.agg({
-            'wa': 'sum',
-            'hops': ['min', 'max'],
-            'frequency': 'sum'
-        })
-        aggregated.columns = ["_".join(x) for x in aggregated.columns.ravel()]
-        aggregated.rename(columns={
-            'wa_sum': 'aspath_len_avg',
-            'hops_min': 'aspath_len_min',
-            'hops_max': 'aspath_len_max',
-            'frequency_sum': 'total_paths'
-        }, inplace=True)
-        outer_merged = pd.merge(df, aggregated, how="outer", on='country')
-        outer_merged.to_csv(outpath, index=False, float_format='%.2f')
+    with report.stage('aggregate') as st:
+        summary = summarize_ixp(read_routes(inpath1, layout), inpath2, selected['region'], cctorir, st)
+    with report.stage('write'):
+        summary.to_csv(outpath, index=False, float_format='%.2f')
+    report.write(dst)
 
 
 if __name__ == '__main__':
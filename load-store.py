@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+
+import click
+import json
+import os
+from datetime import datetime
+from bgplac.instrumentation import RunReport
+from bgplac.store import STORE_PATH, connect, load_directory
+
+
+@click.command()
+@click.option('--date', default='00000000', help='date of calculation')
+@click.option('--source', default='data', help='directory where the data is stored')
+@click.option('--region', default='lacnic', help='region of the datasets stored directly in source')
+@click.option('--ixp-data', default='ixp-data.json', help='ixp data file')
+@click.option('--store', default=STORE_PATH, help='sqlite database to append to')
+def main(date, source, region, ixp_data, store):
+    if date == '00000000':
+        date = datetime.today().strftime('%Y%m%d')
+    with open('regions.json') as json_file:
+        regions = json.load(json_file)
+    with open(ixp_data) as json_file:
+        ixpdata = json.load(json_file)
+    report = RunReport('load-store', date)
+    print("* Loading datasets from " + date + " into " + store)
+    con = connect(store)
+    with con, report.stage('load') as st:
+        # <source>, <source>/<region> (--region all runs) and <source>/<ixp>
+        partitions = [(source, region, None)]
+        partitions += [(source + "/" + rir, rir, None) for rir in regions]
+        partitions += [(source + "/" + ixp, selected['region'], ixp) for ixp, selected in ixpdata.items()]
+        for directory, rir, ixp in partitions:
+            if not os.path.isdir(directory):
+                continue
+            for table, rows in load_directory(con, directory, date, rir, ixp).items():
+                print("* {t} ({r}{i}): {n} rows".format(t=table, r=rir, i='' if ixp is None else ', ' + ixp, n=rows))
+                st.count(table, rows)
+                st.items += rows
+    con.close()
+    report.write(source)
+    print("- DONE!")
+
+
+if __name__ == '__main__':
+    main()
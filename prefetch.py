@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+
+import click
+import json
+from datetime import datetime
+from bgplac.fetch import prefetch
+from bgplac.instrumentation import RunReport
+from bgplac.sources import caida_dsdate, caida_ixs_url, delegated_url, ixp_urls
+
+
+@click.command()
+@click.option('--date', default='00000000', help='date of calculation')
+@click.option('--source', default='data', help='directory where the data is stored')
+@click.option('--ixp-data', default='ixp-data.json', help='ixp data file')
+@click.option('--ixps/--no-ixps', default=True, help='also prefetch the tables of the active ixps')
+@click.option('--concurrency', default=8, help='maximum parallel downloads')
+@click.option('--retries', default=3, help='retries per download')
+def main(date, source, ixp_data, ixps, concurrency, retries):
+    if date == '00000000':
+        date = datetime.today().strftime('%Y%m%d')
+    urls = [delegated_url(date), caida_ixs_url(caida_dsdate(date))]
+    if ixps:
+        with open(ixp_data) as json_file:
+            ixpdata = json.load(json_file)
+        for ixp, selected in ixpdata.items():
+            if selected['active']:
+                urls += ixp_urls(ixp, selected, date)
+    report = RunReport('prefetch', date)
+    print("* Prefetching {n} files".format(n=len(urls)))
+    with report.stage('download') as st:
+        results = prefetch(urls, concurrency, retries)
+        st.items = len(urls)
+    failed = [url for url, path in results.items() if isinstance(path, BaseException)]
+    for url in failed:
+        print("! Failed {url}: {e}".format(url=url, e=results[url]))
+    report.get_stage('download').count('failed', len(failed))
+    report.write(source)
+    print("- DONE!")
+
+
+if __name__ == '__main__':
+    main()
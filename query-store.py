@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+
+import click
+import os
+import sys
+import pandas as pd
+from bgplac.store import STORE_PATH, connect
+
+
+@click.command()
+@click.argument('sql', required=False)
+@click.option('--store', default=STORE_PATH, help='sqlite database to query')
+@click.option('--tables', is_flag=True, help='list the tables and their row counts')
+@click.option('--history', default=None, help='country whose country-summary column is listed by date')
+@click.option('--column', default='total_transit_asns', help='country-summary column for --history')
+@click.option('--region', default='lacnic', help='region for --history')
+def main(sql, store, tables, history, column, region):
+    if not os.path.exists(store):
+        raise click.UsageError(store + " not found, see load-store.py")
+    con = connect(store)
+    if tables:
+        names = [row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        sql = " UNION ALL ".join('SELECT \'{t}\' AS "table", COUNT(*) AS "rows" FROM "{t}"'.format(t=t) for t in names)
+        params = []
+    elif history:
+        sql = 'SELECT date, "{c}" FROM country_summary WHERE country = ? AND region = ? AND ixp = \'\' ORDER BY date'.format(c=column)
+        params = [history, region]
+    elif sql:
+        params = []
+    else:
+        raise click.UsageError("an SQL query, --tables or --history is required")
+    df = pd.read_sql_query(sql, con, params=params)
+    df.to_csv(sys.stdout, index=False)
+    con.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+
+import click
+from bgplac.daemon import Daemon
+
+
+@click.command()
+@click.option('--drop', default='drop', help='directory watched for new delegated, RIB, PCH and LACNIC files')
+@click.option('--source', default='data', help='directory where the data is stored')
+@click.option('--region', default='lacnic', help='region processed from the RIBs. see regions.json')
+@click.option('--collectors', default='rrc00', help='comma separated collectors whose RIBs make a run')
+@click.option('--ixp-data', default='ixp-data.json', help='ixp data file')
+@click.option('--workers', default=2, help='worker processes')
+@click.option('--catalogs', default=2, help='delegated catalogs kept loaded')
+@click.option('--interval', default=30, help='seconds between scans of the drop directory')
+@click.option('--once/--no-once', default=False, help='process the files already dropped and exit')
+def main(drop, source, region, collectors, ixp_data, workers, catalogs, interval, once):
+    daemon = Daemon(drop, source, region, collectors.split(','), ixp_data, workers, catalogs)
+    print("* Watching " + drop)
+    try:
+        daemon.run(interval, once)
+    except KeyboardInterrupt:
+        print("- Stopped")
+
+
+if __name__ == '__main__':
+    main()
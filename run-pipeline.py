@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+
+import click
+import os
+from collections import Counter
+from datetime import datetime
+from bgplac.instrumentation import RunReport
+from bgplac.pipeline import Executor, daily_stages
+
+
+@click.command()
+@click.option('--date', default='00000000', help='date of calculation')
+@click.option('--source', default='data', help='directory where the data is stored')
+@click.option('--ixp-data', default='ixp-data.json', help='ixp data file')
+@click.option('--ixps/--no-ixps', default=True, help='also build the tables of the active ixps')
+@click.option('--force', default='', help='comma separated stages to rebuild anyway, or all')
+@click.option('--dry-run/--no-dry-run', default=False, help='only list the stages that would be rebuilt')
+def main(date, source, ixp_data, ixps, force, dry_run):
+    if date == '00000000':
+        date = datetime.today().strftime('%Y%m%d')
+    os.makedirs(source, exist_ok=True)
+    report = RunReport('run-pipeline', date)
+    stages = daily_stages(date, source, os.path.abspath(ixp_data), ixps)
+    executor = Executor("{dir}/manifest-{date}.json".format(dir=source, date=date), dry_run)
+    results = executor.run(stages, report, [s for s in force.split(',') if s])
+    if not dry_run:
+        report.write(source)
+    counts = Counter(results.values())
+    print("- " + ", ".join("{n} {r}".format(n=n, r=r) for r, n in sorted(counts.items())))
+    if counts['failed'] or counts['blocked']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,12 +4,14 @@ TODAY=$(date +"%Y%m%d")
 TS=${1:-$TODAY}
 SECONDS=0
 
+python prefetch.py --date $TS
 python download-delegated.py --date $TS
 python collector-scripts/process-ribs.py --date $TS
 python collector-scripts/process-ixp-data.py --date $TS
 python collector-scripts/process-country-data.py --date $TS
 python collector-scripts/process-prefix-data.py --date $TS
 python collector-scripts/get-routing-stats.py --date $TS
+python collector-scripts/update-history.py --date $TS
 python collector-scripts/process-as-data.py --date $TS
 
 IXPSSTR=$(python get-active-ixps.py)
@@ -21,12 +23,14 @@ do
   if [ $? -eq 0 ]
   then
     python ixp-scripts/process-bgp-table.py --date $TS --ixp $IX
-    python ixp-scripts/process-coverage.py --date $TS --ixp $IX
-    python ixp-scripts/process-ixp-summary.py --date $TS --ixp $IX
   else
     echo "! Skipping $IX"
     continue
   fi
 done
 
+python ixp-scripts/process-all-ixps.py --date $TS
+
+python -m bgplac.instrumentation data $TS
+
 echo "Elapsed time: $(($SECONDS / 60)) minutes"
\ No newline at end of file
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+
+import click
+import json
+from bgplac.query import DayCache, make_server
+
+
+@click.command()
+@click.option('--source', default='data', help='directory where the data is stored')
+@click.option('--ixp-data', default='ixp-data.json', help='ixp data file')
+@click.option('--host', default='127.0.0.1', help='address the service listens on')
+@click.option('--port', default=8080, help='port the service listens on')
+@click.option('--days', default=3, help='dates kept loaded, the least recently queried is dropped first')
+@click.option('--preload', default=None, help='comma separated dates loaded before serving (or latest)')
+@click.option('--log/--no-log', default=False, help='log every request')
+def main(source, ixp_data, host, port, days, preload, log):
+    with open(ixp_data) as f:
+        ixps = sorted(json.load(f))
+    cache = DayCache(source, ixps, days)
+    if preload:
+        for date in preload.split(','):
+            day = cache.get(date)
+            print("* Loaded {d} in {s:.1f}s".format(d=day.date, s=day.seconds))
+    server = make_server(host, port, cache, quiet=not log)
+    print("* Serving on http://{h}:{p}".format(h=host, p=port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("- Stopped")
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main()